@@ -0,0 +1,5 @@
+import sys
+
+from agenda_api.cli import main
+
+sys.exit(main())
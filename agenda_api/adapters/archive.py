@@ -0,0 +1,223 @@
+"""
+Archive of the finished appointments past a retention window.
+
+`archive_batch` moves completed and canceled appointments scheduled before
+a cutoff, and their services, from the hot tables to appointments_archive.
+The hot tables then only hold recent and pending bookings, which is what
+status and availability queries scan. `restore` moves appointments back
+when they are about to change, and `load` reads archived ones as domain
+objects, which the repositories merge with the hot ones.
+"""
+from datetime import date, datetime, timedelta
+from itertools import groupby
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy import select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+from agenda_api import domain
+from agenda_api.adapters.orm import (
+    appointment_services_table,
+    appointments_archive_table,
+    appointments_table,
+    employees_table,
+    services_table,
+)
+
+DEFAULT_BATCH_SIZE = 5000
+
+FINISHED = (domain.AppointmentStatus.COMPLETED, domain.AppointmentStatus.CANCELED)
+
+# Columns the hot and archived appointments have in common
+COLUMNS = [
+    column.name
+    for column in appointments_table.columns
+    if column.name in appointments_archive_table.c
+]
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def next_month(day: date) -> date:
+    return month_start(month_start(day) + timedelta(days=31))
+
+
+def ensure_partitions(connection: Connection, months: Iterable[date]):
+    """Create the monthly partitions of the archive rows are about to go to"""
+    if connection.dialect.name != "postgresql":
+        return
+    for month in sorted(set(map(month_start, months))):
+        connection.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS appointments_archive_{month:%Y_%m} "
+                "PARTITION OF appointments_archive "
+                f"FOR VALUES FROM ('{month}') TO ('{next_month(month)}')"
+            )
+        )
+
+
+def _service_snapshots(
+    connection: Connection, ids: List[int]
+) -> Dict[int, List[Dict[str, Any]]]:
+    rows = connection.execute(
+        select(
+            appointment_services_table.c.appointment_id,
+            services_table.c.id,
+            services_table.c.name,
+            services_table.c.price,
+            services_table.c.duration,
+        )
+        .join_from(
+            appointment_services_table,
+            services_table,
+            services_table.c.id == appointment_services_table.c.service_id,
+        )
+        .where(appointment_services_table.c.appointment_id.in_(ids))
+        .order_by(appointment_services_table.c.appointment_id, services_table.c.id)
+    )
+    return {
+        appointment_id: [
+            {
+                "id": row.id,
+                "name": row.name,
+                "price": row.price,
+                "duration": row.duration.total_seconds(),
+            }
+            for row in group
+        ]
+        for appointment_id, group in groupby(rows, key=lambda row: row.appointment_id)
+    }
+
+
+def archive_batch(
+    connection: Connection, before: datetime, batch_size: int = DEFAULT_BATCH_SIZE
+) -> int:
+    """
+    Move up to `batch_size` finished appointments scheduled before `before`
+    to the archive, returning how many were moved
+    """
+    column = appointments_table.c
+    rows = (
+        connection.execute(
+            select(*(column[name] for name in COLUMNS))
+            .where(column.status.in_(FINISHED), column.scheduled_at < before)
+            .order_by(column.id)
+            .limit(batch_size)
+        )
+        .mappings()
+        .all()
+    )
+    if not rows:
+        return 0
+    ids = [row["id"] for row in rows]
+    services = _service_snapshots(connection, ids)
+    ensure_partitions(connection, (row["scheduled_at"].date() for row in rows))
+    connection.execute(
+        appointments_archive_table.insert(),
+        [{**row, "services": services.get(row["id"], [])} for row in rows],
+    )
+    connection.execute(
+        appointment_services_table.delete().where(
+            appointment_services_table.c.appointment_id.in_(ids)
+        )
+    )
+    connection.execute(appointments_table.delete().where(column.id.in_(ids)))
+    return len(rows)
+
+
+def restore(session: Session, ids: Iterable[int]) -> int:
+    """
+    Move archived appointments back to the hot tables, in the transaction of
+    the session, returning how many were found in the archive
+    """
+    column = appointments_archive_table.c
+    ids = list(ids)
+    rows = session.execute(select(column).where(column.id.in_(ids))).mappings().all()
+    if not rows:
+        return 0
+    session.execute(
+        appointments_table.insert(),
+        [{name: row[name] for name in COLUMNS} for row in rows],
+    )
+    links = [
+        {"appointment_id": row["id"], "service_id": service["id"]}
+        for row in rows
+        for service in row["services"]
+    ]
+    if links:
+        session.execute(appointment_services_table.insert(), links)
+    session.execute(
+        appointments_archive_table.delete().where(
+            column.id.in_([row["id"] for row in rows])
+        )
+    )
+    return len(rows)
+
+
+def may_hold(status: Optional[domain.AppointmentStatus]) -> bool:
+    """Whether appointments with a status, any if None, can be archived"""
+    return status is None or status in FINISHED
+
+
+def select_archived(criteria: list) -> Select:
+    """Archived appointments matching criteria, with their last editor"""
+    employee = employees_table.alias("updated_by")
+    return (
+        select(
+            appointments_archive_table,
+            employee.c.first_name.label("updated_by_first_name"),
+            employee.c.last_name.label("updated_by_last_name"),
+        )
+        .outerjoin(
+            employee, employee.c.id == appointments_archive_table.c.updated_by_id
+        )
+        .where(*criteria)
+        .order_by(appointments_archive_table.c.id)
+    )
+
+
+def _appointment(row) -> domain.Appointment:
+    services = set()
+    for item in row.services:
+        service = domain.Service(
+            item["name"], item["price"], timedelta(seconds=item["duration"])
+        )
+        service.id = item["id"]
+        services.add(service)
+    updated_by = None
+    if row.updated_by_id is not None:
+        updated_by = domain.Employee(
+            row.updated_by_first_name, row.updated_by_last_name
+        )
+        updated_by.id = row.updated_by_id
+    appointment = domain.Appointment(
+        client_id=row.client_id,
+        services=services,
+        status=row.status,
+        updated_at=row.updated_at,
+        updated_by=updated_by,
+        employee_id=row.employee_id,
+        scheduled_at=row.scheduled_at,
+    )
+    appointment.id = row.id
+    appointment.ends_at = row.ends_at
+    appointment.total_price = row.total_price
+    appointment.total_duration = row.total_duration
+    appointment.version = row.version
+    return appointment
+
+
+def load(
+    connection: Connection, statement: Select, batch_size: Optional[int] = None
+) -> Iterator[domain.Appointment]:
+    """
+    Archived appointments as domain objects, which are never added to a
+    session. With a batch size the rows come from a server side cursor.
+    """
+    if batch_size:
+        statement = statement.execution_options(yield_per=batch_size)
+    return map(_appointment, connection.execute(statement))
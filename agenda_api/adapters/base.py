@@ -1,7 +1,36 @@
 import abc
-from typing import Dict, Optional, Type
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    ContextManager,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Type,
+)
 
+from sqlalchemy import insert, inspect, select
 from sqlalchemy.orm import Query, Session
+from sqlalchemy.sql import Select
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def paginate(
+    query, model: Type[Any], limit: Optional[int] = None, after: Optional[int] = None
+):
+    """Apply keyset pagination on the entity id to a Query or a select()"""
+    if limit is None and after is None:
+        return query
+    if after is not None:
+        query = query.filter(model.id > after)
+    query = query.order_by(model.id)
+    if limit is not None:
+        query = query.limit(limit)
+    return query
 
 
 class AbstractRepository(abc.ABC):
@@ -12,14 +41,53 @@ class AbstractRepository(abc.ABC):
         """Base method to save an entity"""
         self.session.add(entity)
 
-    def filter(self, **kwargs) -> Query:
+    def filter(
+        self, limit: Optional[int] = None, after: Optional[int] = None, **kwargs
+    ) -> Query:
         """Base method to filter entities"""
-        return self.session.query(self.model).filter_by(**kwargs)
+        query = self.session.query(self.model).filter_by(**kwargs)
+        return self.paginate(query, limit=limit, after=after)
+
+    def paginate(
+        self, query: Query, limit: Optional[int] = None, after: Optional[int] = None
+    ) -> Query:
+        """Apply keyset pagination on the entity id"""
+        return paginate(query, self.model, limit=limit, after=after)
+
+    def bulk_save(self, entities: List[Any]):
+        """
+        Insert new entities with a single Core executemany instead of adding
+        them to the session one by one, then assign their generated ids
+        """
+        if not entities:
+            return
+        mapper = inspect(self.model)
+        table = mapper.local_table
+        properties = [prop for prop in mapper.column_attrs if prop.key != "id"]
+        rows = [
+            {prop.columns[0].key: getattr(entity, prop.key) for prop in properties}
+            for entity in entities
+        ]
+        statement = insert(table)
+        if self.session.get_bind().dialect.insert_executemany_returning:
+            result = self.session.execute(statement.returning(table.c.id), rows)
+            ids = [row.id for row in result]
+        else:
+            ids = [
+                self.session.execute(statement, row).inserted_primary_key[0]
+                for row in rows
+            ]
+        for entity, entity_id in zip(entities, ids):
+            entity.id = entity_id
 
     def get(self, entity_id: int) -> Optional[any]:
         """Base method to get an entity"""
         return self.session.query(self.model).get(entity_id)
 
+    def get_many(self, ids: Iterable[int]) -> List[Any]:
+        """Base method to get the entities matching a set of ids"""
+        return self.session.query(self.model).filter(self.model.id.in_(ids)).all()
+
     def delete(self, model):
         """Base method to delete an entity"""
         self.session.delete(model)
@@ -57,3 +125,103 @@ class AbstractUnitOfWork(abc.ABC):
     def rollback(self):
         """Rollback changes to the database"""
         self.session.rollback()
+
+    @abc.abstractmethod
+    def flush(self):
+        """Write pending changes to the database without committing them"""
+        self.session.flush()
+
+    @abc.abstractmethod
+    def savepoint(self) -> ContextManager:
+        """
+        Scope whose changes are flushed on exit, and rolled back on their own
+        if it raises
+        """
+
+
+class AbstractAsyncRepository(abc.ABC):
+    """
+    Counterpart of AbstractRepository over an AsyncSession. Queries are
+    awaited and return lists, since nothing may lazy load once awaited.
+    """
+
+    session: "AsyncSession"
+    model: Type[any]
+
+    def save(self, entity):
+        """Base method to save an entity"""
+        self.session.add(entity)
+
+    async def filter(
+        self, limit: Optional[int] = None, after: Optional[int] = None, **kwargs
+    ) -> List[Any]:
+        """Base method to filter entities"""
+        statement = select(self.model).filter_by(**kwargs)
+        return await self.all(self.paginate(statement, limit=limit, after=after))
+
+    def paginate(
+        self,
+        statement: Select,
+        limit: Optional[int] = None,
+        after: Optional[int] = None,
+    ) -> Select:
+        """Apply keyset pagination on the entity id"""
+        return paginate(statement, self.model, limit=limit, after=after)
+
+    async def all(self, statement: Select) -> List[Any]:
+        """Run a select of entities"""
+        result = await self.session.execute(statement)
+        return result.scalars().unique().all()
+
+    async def get(self, entity_id: int) -> Optional[any]:
+        """Base method to get an entity"""
+        return await self.session.get(self.model, entity_id)
+
+    async def get_many(self, ids: Iterable[int]) -> List[Any]:
+        """Base method to get the entities matching a set of ids"""
+        return await self.all(select(self.model).filter(self.model.id.in_(ids)))
+
+    async def delete(self, model):
+        """Base method to delete an entity"""
+        await self.session.delete(model)
+
+    async def commit(self):
+        """Base method to commit db changes"""
+        await self.session.commit()
+
+    async def rollback(self):
+        """Base method to rollback db changes"""
+        await self.session.rollback()
+
+
+class AbstractAsyncUnitOfWork(abc.ABC):
+    session: "AsyncSession"
+    employees: AbstractAsyncRepository
+    clients: AbstractAsyncRepository
+    services: AbstractAsyncRepository
+    appointments: AbstractAsyncRepository
+
+    @abc.abstractmethod
+    async def __aenter__(self):
+        """Initialize the unit of work"""
+
+    @abc.abstractmethod
+    async def __aexit__(self, *args):
+        """Exit unit of work"""
+
+    @abc.abstractmethod
+    async def run(self, handler: Callable[..., Any], *args) -> Any:
+        """
+        Run a service handler, written against AbstractUnitOfWork, on the
+        connection of this unit of work
+        """
+
+    @abc.abstractmethod
+    async def commit(self):
+        """Commit changes to the database"""
+        await self.session.commit()
+
+    @abc.abstractmethod
+    async def rollback(self):
+        """Rollback changes to the database"""
+        await self.session.rollback()
@@ -0,0 +1,259 @@
+import csv
+import enum
+import io
+import json
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from itertools import groupby, islice
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import DateTime, Enum, Integer, Interval, Table, bindparam, select, text
+from sqlalchemy.engine import Connection
+
+from agenda_api.adapters import versions
+from agenda_api.adapters.orm import (
+    appointment_services_table,
+    appointments_table,
+    clients_table,
+    employees_table,
+    services_table,
+)
+from agenda_api.parsing import parse_duration
+
+TABLES: Dict[str, Table] = {
+    table.name: table
+    for table in (
+        clients_table,
+        employees_table,
+        services_table,
+        appointments_table,
+        appointment_services_table,
+    )
+}
+
+DEFAULT_BATCH_SIZE = 5000
+
+Record = Dict[str, Any]
+
+
+@dataclass
+class LoadReport:
+    table: str
+    rows: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def read_records(stream: IO[str], file_format: str) -> Iterator[Record]:
+    """Lazily read the records of a CSV or NDJSON stream"""
+    if file_format == "csv":
+        yield from csv.DictReader(stream)
+    elif file_format == "ndjson":
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        raise ValueError(f"Unsupported format {file_format}")
+
+
+def _coercer(column) -> Callable[[Any], Any]:
+    if isinstance(column.type, Enum):
+        enum_class = column.type.enum_class
+        return lambda value: (
+            enum_class[value] if value in enum_class.__members__ else enum_class(value)
+        )
+    if isinstance(column.type, Interval):
+        return parse_duration
+    if isinstance(column.type, DateTime):
+        return datetime.fromisoformat
+    if isinstance(column.type, Integer):
+        return int
+    return str
+
+
+def coerce_records(table: Table, records: Iterable[Record]) -> Iterator[Record]:
+    """
+    Convert raw values to the python types of the table columns, treating
+    empty values as NULL and ignoring unknown fields
+    """
+    coercers = {column.name: _coercer(column) for column in table.columns}
+    for record in records:
+        yield {
+            name: None if value in (None, "") else coercers[name](value)
+            for name, value in record.items()
+            if name in coercers
+        }
+
+
+def batched(records: Iterable[Record], size: int) -> Iterator[List[Record]]:
+    iterator = iter(records)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def runs_by_columns(
+    table: Table, batch: List[Record]
+) -> Iterator[Tuple[List[str], List[Record]]]:
+    """
+    Split a batch into runs of consecutive records giving the same columns,
+    so a field missing from some records is neither dropped from the others
+    nor written as NULL over the column default
+    """
+    names = [column.name for column in table.columns]
+    for columns, run in groupby(
+        batch, lambda record: [name for name in names if name in record]
+    ):
+        yield columns, list(run)
+
+
+def _copy_value(value) -> Any:
+    if isinstance(value, timedelta):
+        return f"{value.total_seconds()} seconds"
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.name
+    return value
+
+
+def copy_batch(
+    connection: Connection, table: Table, columns: List[str], batch: List[Record]
+):
+    """Stream a batch into the columns of a table through COPY ... FROM STDIN"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for record in batch:
+        writer.writerow([_copy_value(record[column]) for column in columns])
+    buffer.seek(0)
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+            buffer,
+        )
+    finally:
+        cursor.close()
+
+
+def insert_batch(
+    connection: Connection, table: Table, columns: List[str], batch: List[Record]
+):
+    """Insert a batch giving the same columns with a single executemany"""
+    connection.execute(table.insert(), batch)
+
+
+def load(
+    connection: Connection,
+    table: Table,
+    records: Iterable[Record],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    progress: Optional[Callable[[LoadReport], None]] = None,
+) -> LoadReport:
+    """
+    Load records into a table in batches, using COPY on Postgres and a
+    chunked executemany elsewhere. The COPY path is only tested when
+    AGENDA_TEST_POSTGRES_URL points the tests to a database.
+    """
+    postgres = connection.dialect.name == "postgresql"
+    write = copy_batch if postgres else insert_batch
+    report = LoadReport(table.name)
+    explicit_ids = False
+    started = time.perf_counter()
+    for batch in batched(coerce_records(table, records), batch_size):
+        for columns, run in runs_by_columns(table, batch):
+            write(connection, table, columns, run)
+            explicit_ids = explicit_ids or "id" in columns
+        report.rows += len(batch)
+        report.seconds = time.perf_counter() - started
+        if progress:
+            progress(report)
+    if postgres and explicit_ids:
+        connection.execute(
+            text(
+                f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                f"(SELECT MAX(id) FROM {table.name}))"
+            )
+        )
+    if report.rows:
+        versions.bump(connection, [table.name])
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def refresh_appointment_totals(connection: Connection, batch_size: int = 5000) -> int:
+    """
+    Fill the totals and end time of appointments loaded without them from
+    their services, returning how many appointments were updated.
+    Appointments that have no services yet are left untouched.
+    """
+    if connection.dialect.name == "postgresql":
+        result = connection.execute(
+            text(
+                "UPDATE appointments SET total_price = totals.price, "
+                "total_duration = totals.duration, "
+                "ends_at = appointments.scheduled_at + totals.duration, "
+                "version = appointments.version + 1 "
+                "FROM (SELECT appointment_id, SUM(price) AS price, "
+                "SUM(duration) AS duration FROM appointment_services "
+                "JOIN services ON services.id = appointment_services.service_id "
+                "GROUP BY appointment_id) AS totals "
+                "WHERE totals.appointment_id = appointments.id "
+                "AND appointments.total_price IS NULL"
+            )
+        )
+        updated = result.rowcount
+    else:
+        rows = connection.execute(
+            select(
+                appointments_table.c.id,
+                appointments_table.c.scheduled_at,
+                services_table.c.price,
+                services_table.c.duration,
+            )
+            .join_from(
+                appointments_table,
+                appointment_services_table,
+                appointment_services_table.c.appointment_id == appointments_table.c.id,
+            )
+            .join(
+                services_table,
+                services_table.c.id == appointment_services_table.c.service_id,
+            )
+            .where(appointments_table.c.total_price.is_(None))
+        )
+        totals: Dict[int, Record] = {}
+        for row in rows:
+            total = totals.setdefault(
+                row.id,
+                {
+                    "appointment_id": row.id,
+                    "price": 0,
+                    "duration": timedelta(0),
+                    "scheduled_at": row.scheduled_at,
+                },
+            )
+            total["price"] += row.price
+            total["duration"] += row.duration
+        for total in totals.values():
+            scheduled_at = total.pop("scheduled_at")
+            total["ends_at"] = (
+                scheduled_at + total["duration"] if scheduled_at else None
+            )
+        statement = (
+            appointments_table.update()
+            .where(appointments_table.c.id == bindparam("appointment_id"))
+            .values(
+                total_price=bindparam("price"),
+                total_duration=bindparam("duration"),
+                ends_at=bindparam("ends_at"),
+                version=appointments_table.c.version + 1,
+            )
+        )
+        for batch in batched(totals.values(), batch_size):
+            connection.execute(statement, batch)
+        updated = len(totals)
+    return updated
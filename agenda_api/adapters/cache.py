@@ -0,0 +1,175 @@
+import abc
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Type
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+
+from agenda_api.adapters.base import AbstractRepository
+
+
+class CacheBackend(abc.ABC):
+    @abc.abstractmethod
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value, or None when missing or expired"""
+
+    @abc.abstractmethod
+    def set(self, key: Hashable, value: Any):
+        """Store a value"""
+
+    @abc.abstractmethod
+    def delete(self, key: Hashable):
+        """Drop a value if present"""
+
+    @abc.abstractmethod
+    def clear(self):
+        """Drop every value"""
+
+
+class LRUCache(CacheBackend):
+    """In-process cache evicting the least recently used entries"""
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: float = 300.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class EntityCache:
+    """
+    Detached snapshots of a mapped model keyed by id. Snapshots are merged
+    into the caller's session without loading, so a hit costs no query.
+    """
+
+    def __init__(self, model: Type, backend: Optional[CacheBackend] = None):
+        self.model = model
+        self.backend = backend or LRUCache()
+        self.stats = CacheStats()
+
+    def _snapshot(self, entity: Any) -> Any:
+        mapper = inspect(self.model)
+        snapshot = mapper.class_manager.new_instance()
+        for prop in mapper.column_attrs:
+            set_committed_value(snapshot, prop.key, getattr(entity, prop.key))
+        make_transient_to_detached(snapshot)
+        return snapshot
+
+    def get(self, session: Session, entity_id: int) -> Optional[Any]:
+        snapshot = self.backend.get(entity_id)
+        if snapshot is None:
+            self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+        return session.merge(snapshot, load=False)
+
+    def put(self, entity: Any):
+        self.backend.set(entity.id, self._snapshot(entity))
+
+    def invalidate(self, entity_id: int):
+        self.backend.delete(entity_id)
+
+    def track(self, session: Session):
+        """Invalidate the entities of this model written by the session once it commits"""
+        written = set()
+
+        def collect(session, flush_context):
+            for entity in (*session.new, *session.dirty, *session.deleted):
+                if isinstance(entity, self.model):
+                    written.add(entity.id)
+
+        def invalidate(session):
+            for entity_id in written:
+                self.invalidate(entity_id)
+            written.clear()
+
+        def discard(session, *args):
+            written.clear()
+
+        event.listen(session, "after_flush", collect)
+        event.listen(session, "after_commit", invalidate)
+        event.listen(session, "after_rollback", discard)
+
+
+class CachedRepository:
+    """Read-through cache in front of a repository's lookups by id"""
+
+    def __init__(self, repository: AbstractRepository, cache: EntityCache):
+        self._repository = repository
+        self.cache = cache
+
+    def __getattr__(self, name: str):
+        return getattr(self._repository, name)
+
+    def get(self, entity_id: int) -> Optional[Any]:
+        entity = self.cache.get(self._repository.session, entity_id)
+        if entity is None:
+            entity = self._repository.get(entity_id)
+            if entity is not None:
+                self.cache.put(entity)
+        return entity
+
+    def get_many(self, ids: Iterable[int]) -> List[Any]:
+        session = self._repository.session
+        found: Dict[int, Any] = {}
+        for entity_id in set(ids):
+            entity = self.cache.get(session, entity_id)
+            if entity is not None:
+                found[entity_id] = entity
+        missing = set(ids) - set(found)
+        if missing:
+            for entity in self._repository.get_many(missing):
+                self.cache.put(entity)
+                found[entity.id] = entity
+        return list(found.values())
@@ -0,0 +1,398 @@
+import itertools
+import os
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, replace
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Sequence
+
+from sqlalchemy import create_engine, event, orm
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from agenda_api.instrumentation import observe_pool_checkout
+from agenda_api.settings import DatabaseSettings
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+
+# Async driver used for each backend when the url names none
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+
+def async_url(url: str) -> str:
+    """The url with its driver swapped for the asyncio one of its backend"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No asyncio driver known for {backend}")
+    driver = ASYNC_DRIVERS[backend]
+    if parsed.get_driver_name() == driver:
+        return url
+    return parsed.set(drivername=f"{backend}+{driver}").render_as_string(
+        hide_password=False
+    )
+
+
+class _TimedCheckout:
+    """Pool mixin recording how long each checkout waited for a connection"""
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            observe_pool_checkout(time.perf_counter() - started)
+
+
+class InstrumentedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class InstrumentedAsyncAdaptedQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+def _engine_options(settings: DatabaseSettings) -> dict:
+    options = {
+        "pool_pre_ping": settings.pool_pre_ping,
+        "pool_recycle": settings.pool_recycle,
+    }
+    if not settings.url.startswith("sqlite"):
+        options.update(
+            pool_size=settings.pool_size,
+            max_overflow=settings.max_overflow,
+            pool_timeout=settings.pool_timeout,
+        )
+    return options
+
+
+def enable_sqlite_savepoints(engine: Engine) -> Engine:
+    """
+    Let SQLAlchemy emit BEGIN itself on pysqlite connections. The driver
+    otherwise delays it to the first write, so a SAVEPOINT issued before
+    any write opens the transaction and releasing it commits everything.
+    """
+
+    @event.listens_for(engine, "connect")
+    def disable_driver_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def begin(connection):
+        # Straight on the driver, so statement counters do not see it. The
+        # connection may be shared, as with in-memory databases.
+        dbapi_connection = connection.connection
+        if not dbapi_connection.in_transaction:
+            dbapi_connection.execute("BEGIN")
+
+    return engine
+
+
+def create_engine_from_settings(settings: DatabaseSettings) -> Engine:
+    connect_args = {}
+    if settings.statement_timeout and settings.url.startswith("postgresql"):
+        connect_args["options"] = f"-c statement_timeout={settings.statement_timeout}"
+    options = _engine_options(settings)
+    if not settings.url.startswith("sqlite"):
+        options["poolclass"] = InstrumentedQueuePool
+    engine = create_engine(settings.url, connect_args=connect_args, **options)
+    if engine.dialect.name == "sqlite":
+        enable_sqlite_savepoints(engine)
+    return engine
+
+
+def create_async_engine_from_settings(settings: DatabaseSettings) -> "AsyncEngine":
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    connect_args = {}
+    if settings.statement_timeout and settings.url.startswith("postgresql"):
+        connect_args["server_settings"] = {
+            "statement_timeout": str(settings.statement_timeout)
+        }
+    options = _engine_options(settings)
+    if not settings.url.startswith("sqlite"):
+        options["poolclass"] = InstrumentedAsyncAdaptedQueuePool
+    return create_async_engine(
+        async_url(settings.url), connect_args=connect_args, **options
+    )
+
+
+BALANCING_POLICIES = ("round_robin", "least_connections")
+
+
+def _checked_out(engine) -> int:
+    pool = getattr(engine, "sync_engine", engine).pool
+    checked_out = getattr(pool, "checkedout", None)
+    return checked_out() if checked_out else 0
+
+
+class ReplicaSet:
+    """Engines of the read replicas and the policy picking one of them"""
+
+    def __init__(self, engines: Sequence[Any], balancing: str = "round_robin"):
+        if balancing not in BALANCING_POLICIES:
+            raise ValueError(f"Unknown replica balancing {balancing}")
+        self.engines = list(engines)
+        self.balancing = balancing
+        self._turns = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self.engines)
+
+    def pick(self) -> int:
+        """Index of the replica the next reads go to"""
+        if self.balancing == "least_connections":
+            return min(
+                range(len(self.engines)),
+                key=lambda index: _checked_out(self.engines[index]),
+            )
+        return next(self._turns) % len(self.engines)
+
+
+@dataclass
+class RequestRouting:
+    """Where the sessions of the current request read from"""
+
+    primary: bool = False
+    replica: Optional[int] = None
+
+
+_routing: ContextVar[Optional[RequestRouting]] = ContextVar(
+    "agenda_request_routing", default=None
+)
+
+
+def start_request_routing():
+    """
+    Route the read-only sessions of the request starting to a single
+    replica, until it writes to the primary
+    """
+    _routing.set(RequestRouting())
+
+
+def end_request_routing(error=None):
+    _routing.set(None)
+
+
+def pin_to_primary():
+    """Read from the primary for the rest of the request, which wrote to it"""
+    routing = _routing.get()
+    if routing is not None:
+        routing.primary = True
+
+
+def choose_replica(replicas: Optional[ReplicaSet]) -> Optional[int]:
+    """The replica a read-only session uses, None to use the primary"""
+    if not replicas:
+        return None
+    routing = _routing.get()
+    if routing is None:
+        return replicas.pick()
+    if routing.primary:
+        return None
+    if routing.replica is None:
+        routing.replica = replicas.pick()
+    return routing.replica
+
+
+class RoutingSession(Session):
+    """
+    Session reading from a replica. Its flushes and DML statements go to the
+    primary, and so do its reads once it wrote, as does the rest of the
+    request.
+    """
+
+    def __init__(self, primary: Engine, **kwargs):
+        super().__init__(**kwargs)
+        self.primary = primary
+        self.wrote = False
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self._flushing or getattr(clause, "is_dml", False):
+            self.wrote = True
+            pin_to_primary()
+        if self.wrote:
+            return self.primary
+        return super().get_bind(mapper, clause, **kwargs)
+
+
+class LazySessionFactory:
+    """
+    Session factory that builds its engine from the database settings on
+    first use, so importing the application never opens a connection
+    """
+
+    def __init__(
+        self,
+        settings_loader: Callable[[], DatabaseSettings] = DatabaseSettings.from_env,
+    ):
+        self._settings_loader = settings_loader
+        self._sessionmaker = orm.sessionmaker()
+        self._routing_sessionmaker = orm.sessionmaker(class_=RoutingSession)
+        self._engine: Optional[Engine] = None
+        self._replicas: Optional[ReplicaSet] = None
+        self._lock = threading.Lock()
+
+    def _create_engines(self):
+        settings = self._settings_loader()
+        self._replicas = ReplicaSet(
+            [
+                create_engine_from_settings(replace(settings, url=url))
+                for url in settings.replica_urls
+            ],
+            settings.replica_balancing,
+        )
+        self._engine = create_engine_from_settings(settings)
+
+    def _ensure_engines(self):
+        if self._engine is None:
+            with self._lock:
+                if self._engine is None:
+                    self._create_engines()
+
+    @property
+    def engine(self) -> Engine:
+        self._ensure_engines()
+        return self._engine
+
+    @property
+    def replicas(self) -> ReplicaSet:
+        self._ensure_engines()
+        return self._replicas
+
+    def _engines(self) -> List[Engine]:
+        if self._engine is None:
+            return []
+        return [self._engine, *self._replicas.engines]
+
+    def __call__(self) -> Session:
+        return self._sessionmaker(bind=self.engine)
+
+    def read_only(self) -> Session:
+        """
+        Session reading from a replica, or from the primary when there are
+        none or the request already wrote to it
+        """
+        index = choose_replica(self.replicas)
+        if index is None:
+            return self()
+        return self._routing_sessionmaker(
+            bind=self.replicas.engines[index], primary=self.engine
+        )
+
+    def dispose(self, close: bool = True):
+        """
+        Drop the pooled connections. A forked child passes close=False so it
+        leaves the sockets it inherited to its parent.
+        """
+        for engine in self._engines():
+            engine.dispose(close=close)
+
+    def pool_status(self) -> Dict[str, int]:
+        if self._engine is None:
+            return {}
+        pool = self._engine.pool
+        stats = {
+            "size": getattr(pool, "size", None),
+            "checked_in": getattr(pool, "checkedin", None),
+            "checked_out": getattr(pool, "checkedout", None),
+            "overflow": getattr(pool, "overflow", None),
+        }
+        return {name: stat() for name, stat in stats.items() if stat}
+
+
+class LazyAsyncSessionFactory:
+    """
+    Counterpart of LazySessionFactory handing out AsyncSessions. Sessions
+    keep their state after commit, as an expired attribute cannot be
+    refreshed outside an await.
+    """
+
+    def __init__(
+        self,
+        settings_loader: Callable[[], DatabaseSettings] = DatabaseSettings.from_env,
+    ):
+        self._settings_loader = settings_loader
+        self._engine: Optional["AsyncEngine"] = None
+        self._replicas: Optional[ReplicaSet] = None
+        self._lock = threading.Lock()
+
+    def _create_engines(self):
+        settings = self._settings_loader()
+        self._replicas = ReplicaSet(
+            [
+                create_async_engine_from_settings(replace(settings, url=url))
+                for url in settings.replica_urls
+            ],
+            settings.replica_balancing,
+        )
+        self._engine = create_async_engine_from_settings(settings)
+
+    def _ensure_engines(self):
+        if self._engine is None:
+            with self._lock:
+                if self._engine is None:
+                    self._create_engines()
+
+    @property
+    def engine(self) -> "AsyncEngine":
+        self._ensure_engines()
+        return self._engine
+
+    @property
+    def replicas(self) -> ReplicaSet:
+        self._ensure_engines()
+        return self._replicas
+
+    def _engines(self) -> List["AsyncEngine"]:
+        if self._engine is None:
+            return []
+        return [self._engine, *self._replicas.engines]
+
+    def __call__(self) -> "AsyncSession":
+        from sqlalchemy.ext.asyncio import AsyncSession
+
+        return AsyncSession(bind=self.engine, expire_on_commit=False)
+
+    def read_only(self) -> "AsyncSession":
+        """Counterpart of LazySessionFactory.read_only"""
+        from sqlalchemy.ext.asyncio import AsyncSession
+
+        index = choose_replica(self.replicas)
+        if index is None:
+            return self()
+        return AsyncSession(
+            bind=self.replicas.engines[index],
+            sync_session_class=RoutingSession,
+            primary=self.engine.sync_engine,
+            expire_on_commit=False,
+        )
+
+    async def dispose(self):
+        for engine in self._engines():
+            await engine.dispose()
+
+    def dispose_inherited(self):
+        """Forget the connections inherited from a parent process"""
+        for engine in self._engines():
+            engine.sync_engine.dispose(close=False)
+
+
+DEFAULT_SESSION_FACTORY = LazySessionFactory()
+DEFAULT_ASYNC_SESSION_FACTORY = LazyAsyncSessionFactory()
+
+
+def pool_status() -> Dict[str, int]:
+    return DEFAULT_SESSION_FACTORY.pool_status()
+
+
+if hasattr(os, "register_at_fork"):
+
+    def _after_fork():
+        DEFAULT_SESSION_FACTORY.dispose(close=False)
+        DEFAULT_ASYNC_SESSION_FACTORY.dispose_inherited()
+
+    os.register_at_fork(after_in_child=_after_fork)
@@ -1,40 +1,32 @@
-import os
-from datetime import datetime
-
 from sqlalchemy import (
+    DDL,
+    JSON,
     Boolean,
     Column,
+    Date,
     DateTime,
     Enum,
     ForeignKey,
+    Index,
     Integer,
     Interval,
     MetaData,
     String,
     Table,
-    create_engine,
+    event,
     orm,
+    text,
 )
-from sqlalchemy.orm import relationship
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Session, class_mapper, relationship
+from sqlalchemy.orm.attributes import get_history
+from sqlalchemy.orm.exc import UnmappedClassError
 
 from agenda_api import domain
 
 metadata = MetaData()
 
 
-def get_database_uri() -> str:
-    host = os.environ.get("POSTGRES_HOST", "agenda-db")
-    port = 5432
-    username = os.environ.get("POSTGRES_USER", "root")
-    password = os.environ.get("POSTGRES_PASSWORD", "root")
-    db_name = os.environ.get("POSTGRES_DB", "agenda")
-    return f"postgresql://{username}:{password}@{host}:{port}/{db_name}"
-
-
-DEFAULT_ENGINE = create_engine(get_database_uri())
-
-DEFAULT_SESSION_FACTORY = orm.sessionmaker(bind=DEFAULT_ENGINE)
-
 employees_table = Table(
     "employees",
     metadata,
@@ -51,6 +43,66 @@ clients_table = Table(
     Column("last_name", String, nullable=False),
 )
 
+# Client search: the lower cased names are indexed in code point order, so
+# a prefix is a range of the index. Postgres also indexes the trigrams of
+# the full name for fuzzy matching, SQLite those of an FTS5 table kept in
+# step by triggers, which matches substrings.
+CLIENT_SEARCH_TABLE = "clients_search"
+
+for column in ("first_name", "last_name"):
+    event.listen(
+        clients_table,
+        "after_create",
+        DDL(
+            f"CREATE INDEX ix_clients_{column}_key "
+            f'ON clients (lower({column}) COLLATE "C")'
+        ).execute_if(dialect="postgresql"),
+    )
+    event.listen(
+        clients_table,
+        "after_create",
+        DDL(
+            f"CREATE INDEX ix_clients_{column}_key ON clients (lower({column}))"
+        ).execute_if(dialect="sqlite"),
+    )
+event.listen(
+    clients_table,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+event.listen(
+    clients_table,
+    "after_create",
+    DDL(
+        "CREATE INDEX ix_clients_name_trgm ON clients "
+        "USING gin (lower(first_name || ' ' || last_name) gin_trgm_ops)"
+    ).execute_if(dialect="postgresql"),
+)
+for statement in (
+    f"CREATE VIRTUAL TABLE {CLIENT_SEARCH_TABLE} "
+    "USING fts5(name, content='', tokenize='trigram')",
+    f"CREATE TRIGGER {CLIENT_SEARCH_TABLE}_insert AFTER INSERT ON clients "
+    f"BEGIN INSERT INTO {CLIENT_SEARCH_TABLE} (rowid, name) "
+    "VALUES (NEW.id, NEW.first_name || ' ' || NEW.last_name); END",
+    f"CREATE TRIGGER {CLIENT_SEARCH_TABLE}_delete AFTER DELETE ON clients "
+    f"BEGIN INSERT INTO {CLIENT_SEARCH_TABLE} ({CLIENT_SEARCH_TABLE}, rowid, name) "
+    "VALUES ('delete', OLD.id, OLD.first_name || ' ' || OLD.last_name); END",
+    f"CREATE TRIGGER {CLIENT_SEARCH_TABLE}_update "
+    "AFTER UPDATE OF first_name, last_name ON clients "
+    f"BEGIN INSERT INTO {CLIENT_SEARCH_TABLE} ({CLIENT_SEARCH_TABLE}, rowid, name) "
+    "VALUES ('delete', OLD.id, OLD.first_name || ' ' || OLD.last_name); "
+    f"INSERT INTO {CLIENT_SEARCH_TABLE} (rowid, name) "
+    "VALUES (NEW.id, NEW.first_name || ' ' || NEW.last_name); END",
+):
+    event.listen(
+        clients_table, "after_create", DDL(statement).execute_if(dialect="sqlite")
+    )
+event.listen(
+    clients_table,
+    "after_drop",
+    DDL(f"DROP TABLE IF EXISTS {CLIENT_SEARCH_TABLE}").execute_if(dialect="sqlite"),
+)
+
 services_table = Table(
     "services",
     metadata,
@@ -68,8 +120,79 @@ appointments_table = Table(
     Column("status", Enum(domain.AppointmentStatus), nullable=False),
     Column("updated_at", DateTime),
     Column("updated_by_id", Integer, ForeignKey("employees.id")),
+    Column("employee_id", Integer, ForeignKey("employees.id")),
+    Column("scheduled_at", DateTime),
+    Column("ends_at", DateTime),
+    Column("total_price", Integer),
+    Column("total_duration", Interval),
+    Column("version", Integer, nullable=False, default=1, server_default=text("1")),
+    Index("ix_appointments_total_price", "total_price"),
+    # Ids are never reused, archived appointments keep theirs
+    sqlite_autoincrement=True,
+)
+
+# Bookings that still hold their time slot
+active_appointments = appointments_table.c.status != domain.AppointmentStatus.CANCELED
+
+Index(
+    "ix_appointments_employee_schedule",
+    appointments_table.c.employee_id,
+    appointments_table.c.scheduled_at,
+    sqlite_where=active_appointments,
+    postgresql_where=active_appointments,
 )
 
+APPOINTMENT_OVERLAP_CONSTRAINT = "appointments_no_overlap"
+
+# Postgres rejects overlapping bookings of an employee with an exclusion
+# constraint over the time range, checked against a GiST index. Bookings
+# without an end yet, as bulk loads insert them before their totals are
+# refreshed, get an empty range that overlaps nothing, like the SQLite
+# trigger below treats them.
+event.listen(
+    appointments_table,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS btree_gist").execute_if(dialect="postgresql"),
+)
+event.listen(
+    appointments_table,
+    "after_create",
+    DDL(
+        f"ALTER TABLE appointments ADD CONSTRAINT {APPOINTMENT_OVERLAP_CONSTRAINT} "
+        "EXCLUDE USING gist "
+        "(employee_id WITH =, "
+        "tsrange(scheduled_at, coalesce(ends_at, scheduled_at)) WITH &&) "
+        "WHERE (status <> 'CANCELED')"
+    ).execute_if(dialect="postgresql"),
+)
+
+# SQLite serializes writers, so a trigger probing the partial index above is
+# race free. Active bookings never overlap, which means only the latest one
+# starting before the new end can collide with it. Bookings without an end
+# take no time, like in the constraint above, and are skipped so they never
+# hide the booking they lie within.
+for suffix, trigger_event, exclude_self in (
+    ("insert", "INSERT", ""),
+    ("update", "UPDATE OF employee_id, scheduled_at, ends_at", "AND id != NEW.id"),
+):
+    event.listen(
+        appointments_table,
+        "after_create",
+        DDL(
+            f"CREATE TRIGGER {APPOINTMENT_OVERLAP_CONSTRAINT}_{suffix} "
+            f"BEFORE {trigger_event} ON appointments "
+            "WHEN NEW.employee_id IS NOT NULL AND NEW.scheduled_at IS NOT NULL "
+            "AND NEW.status != 'CANCELED' "
+            f"BEGIN SELECT RAISE(ABORT, '{APPOINTMENT_OVERLAP_CONSTRAINT}') "
+            "WHERE (SELECT ends_at FROM appointments "
+            "WHERE employee_id = NEW.employee_id AND status != 'CANCELED' "
+            "AND scheduled_at < NEW.ends_at AND ends_at IS NOT NULL "
+            f"{exclude_self} "
+            "ORDER BY scheduled_at DESC LIMIT 1) > NEW.scheduled_at; END"
+        ).execute_if(dialect="sqlite"),
+    )
+
+
 appointment_services_table = Table(
     "appointment_services",
     metadata,
@@ -78,8 +201,68 @@ appointment_services_table = Table(
     Column("service_id", Integer, ForeignKey("services.id"), nullable=False),
 )
 
+# Finished appointments past the retention window, moved out of the hot
+# tables by the archive command. A row also holds the services of the
+# appointment as they were, [{"id", "name", "price", "duration"}] with the
+# duration in seconds, instead of a row per service. Postgres partitions it
+# by month of the schedule, so date bounded queries only read the months
+# they cover. The appointments table itself is not partitioned: its
+# exclusion constraint on overlapping bookings, and the foreign keys to it,
+# cannot span partitions.
+appointments_archive_table = Table(
+    "appointments_archive",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=False),
+    Column("scheduled_at", DateTime, primary_key=True),
+    Column("client_id", Integer, ForeignKey("clients.id"), nullable=False),
+    Column("status", Enum(domain.AppointmentStatus), nullable=False),
+    Column("updated_at", DateTime),
+    Column("updated_by_id", Integer, ForeignKey("employees.id")),
+    Column("employee_id", Integer, ForeignKey("employees.id")),
+    Column("ends_at", DateTime),
+    Column("total_price", Integer),
+    Column("total_duration", Interval),
+    Column("version", Integer, nullable=False, default=1, server_default=text("1")),
+    Column("services", JSON().with_variant(JSONB(), "postgresql"), nullable=False),
+    Index("ix_appointments_archive_client_id", "client_id"),
+    postgresql_partition_by="RANGE (scheduled_at)",
+)
+
+# Rows of months without their own partition yet
+event.listen(
+    appointments_archive_table,
+    "after_create",
+    DDL(
+        "CREATE TABLE appointments_archive_default "
+        "PARTITION OF appointments_archive DEFAULT"
+    ).execute_if(dialect="postgresql"),
+)
+
+# Completed and canceled appointments and their revenue per employee and
+# day, kept up to date by the handlers changing the status of appointments
+daily_revenue_table = Table(
+    "daily_revenue",
+    metadata,
+    Column("employee_id", Integer, ForeignKey("employees.id"), primary_key=True),
+    Column("day", Date, primary_key=True),
+    Column("completed", Integer, nullable=False, default=0),
+    Column("canceled", Integer, nullable=False, default=0),
+    Column("revenue", Integer, nullable=False, default=0),
+    Index("ix_daily_revenue_day", "day"),
+)
+
+# Version counter of every table, bumped by the transactions changing it
+table_versions_table = Table(
+    "table_versions",
+    metadata,
+    Column("name", String, primary_key=True),
+    Column("version", Integer, nullable=False),
+)
+
 
 def start_mappers():
+    from agenda_api.adapters import versions
+
     employees_mapper = orm.mapper(domain.Employee, employees_table)
     orm.mapper(domain.Client, clients_table)
     services_mapper = orm.mapper(domain.Service, services_table)
@@ -94,6 +277,30 @@ def start_mappers():
             ),
             "updated_by": relationship(
                 employees_mapper,
+                foreign_keys=[appointments_table.c.updated_by_id],
             ),
         },
+        # Updates are compare-and-swap on the version: UPDATE ... WHERE id = :id
+        # AND version = :version, failing when another transaction got there first
+        version_id_col=appointments_table.c.version,
     )
+    if not event.contains(Session, "before_flush", refresh_appointment_totals):
+        event.listen(Session, "before_flush", refresh_appointment_totals)
+    versions.track_changes()
+
+
+def ensure_mappers():
+    """Map the domain classes unless that was already done"""
+    try:
+        class_mapper(domain.Appointment)
+    except UnmappedClassError:
+        start_mappers()
+
+
+def refresh_appointment_totals(session: Session, flush_context, instances):
+    """Keep the stored totals in step when the services of an appointment change"""
+    for entity in (*session.new, *session.dirty):
+        if not isinstance(entity, domain.Appointment):
+            continue
+        if entity in session.new or get_history(entity, "services").has_changes():
+            entity.recalculate_totals()
@@ -1,10 +1,27 @@
+import heapq
 from dataclasses import dataclass
-from typing import Set, Type
+from datetime import date, datetime, time, timedelta
+from itertools import islice
+from operator import attrgetter
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Type
 
-from sqlalchemy.orm import Query, Session
+from sqlalchemy import bindparam, func, select, text, tuple_, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Query, Session, aliased, joinedload, selectinload
+from sqlalchemy.sql import Select, Subquery
 
 from agenda_api import domain
-from agenda_api.adapters.base import AbstractRepository
+from agenda_api.adapters import archive
+from agenda_api.adapters.base import (
+    AbstractAsyncRepository,
+    AbstractRepository,
+    paginate,
+)
+from agenda_api.adapters.orm import (
+    CLIENT_SEARCH_TABLE,
+    appointments_archive_table,
+    clients_table,
+)
 
 
 @dataclass
@@ -13,26 +30,414 @@ class EmployeeRepository(AbstractRepository):
     model: Type[domain.Employee] = domain.Employee
 
 
+SEARCH_LIMIT = 20
+
+# Collations of the name indexes, ordering by code point on both backends
+NAME_COLLATIONS = {"postgresql": "C", "sqlite": "BINARY"}
+
+# Sorts after every character, so names starting with a prefix are those
+# between the prefix and the prefix followed by it
+_LAST_CHARACTER = "\U0010ffff"
+
+
+def _prefix_search(dialect: str, term: str, limit: int) -> Tuple[Subquery, list]:
+    """
+    Clients whose first or last name starts with the term, or whose first
+    name is everything before its last space and whose last name starts
+    with the rest. Each range is read from its index in name order.
+    """
+    column = clients_table.c
+
+    def key(expression):
+        return func.lower(expression).collate(NAME_COLLATIONS[dialect])
+
+    def starting_with(expression, prefix: str) -> list:
+        return [
+            expression >= func.lower(prefix),
+            expression < func.lower(prefix) + _LAST_CHARACTER,
+        ]
+
+    def matches(order, *criteria) -> Select:
+        ranked = (
+            select(*column, order.label("rank"))
+            .where(*criteria)
+            .order_by(order)
+            .limit(limit)
+            .subquery()
+        )
+        return select(ranked)
+
+    first_name, last_name = key(column.first_name), key(column.last_name)
+    candidates = [
+        matches(first_name, *starting_with(first_name, term)),
+        matches(last_name, *starting_with(last_name, term)),
+    ]
+    head, _, tail = term.rpartition(" ")
+    if head:
+        candidates.append(
+            matches(
+                key(column.first_name + " " + column.last_name),
+                first_name == func.lower(head),
+                *starting_with(last_name, tail),
+            )
+        )
+    found = union_all(*candidates).subquery()
+    return found, [found.c.rank, found.c.id]
+
+
+def _fuzzy_search(dialect: str, term: str, limit: int) -> Tuple[Subquery, list]:
+    """
+    On Postgres, clients whose full name holds a word similar to the term,
+    most similar first. SQLite has no similarity, the trigrams there find
+    the names containing the term.
+    """
+    column = clients_table.c
+    if dialect == "postgresql":
+        name = func.lower(column.first_name + " " + column.last_name)
+        rank = func.word_similarity(func.lower(term), name)
+        found = (
+            select(*column, rank.label("rank"))
+            .where(name.op("%>")(func.lower(term)))
+            .order_by(rank.desc(), column.id)
+            .limit(limit)
+            .subquery()
+        )
+        return found, [found.c.rank.desc(), found.c.id]
+    phrase = '"' + term.replace('"', '""') + '"'
+    matching = text(
+        f"SELECT rowid FROM {CLIENT_SEARCH_TABLE} "
+        f"WHERE {CLIENT_SEARCH_TABLE} MATCH :phrase LIMIT :limit"
+    ).bindparams(phrase=phrase, limit=limit)
+    found = select(*column).where(column.id.in_(matching)).subquery()
+    return found, [found.c.id]
+
+
 @dataclass
 class ClientRepository(AbstractRepository):
     session: Session
     model: Type[domain.Client] = domain.Client
 
+    def search(
+        self, term: str, fuzzy: bool = False, limit: int = SEARCH_LIMIT
+    ) -> List[domain.Client]:
+        """
+        Clients by the start of their names, ordered by name. `fuzzy` also
+        finds misspelled names on Postgres and names containing the term on
+        SQLite, whose trigrams need a term of 3 characters or more.
+        """
+        term = " ".join(term.split())
+        if not term:
+            return []
+        dialect = self.session.get_bind().dialect.name
+        if fuzzy and (dialect == "postgresql" or len(term) >= 3):
+            found, order = _fuzzy_search(dialect, term, limit)
+        else:
+            found, order = _prefix_search(dialect, term, limit)
+        clients = self.session.query(aliased(self.model, found)).order_by(*order)
+        # A client can match both by first and last name
+        unique = {}
+        for client in clients:
+            unique.setdefault(client.id, client)
+        return list(unique.values())[:limit]
+
 
 @dataclass
 class ServiceRepository(AbstractRepository):
     session: Session
     model: Type[domain.Service] = domain.Service
 
-    def filter(self, ids: Set[int] = None, **kwargs) -> Query:
+    def filter(
+        self,
+        ids: Set[int] = None,
+        limit: Optional[int] = None,
+        after: Optional[int] = None,
+        **kwargs,
+    ) -> Query:
         query = self.session.query(self.model)
         if ids:
             query = query.filter(self.model.id.in_(ids))
         query = query.filter_by(**kwargs)
-        return query
+        return self.paginate(query, limit=limit, after=after)
+
+
+def _appointment_loaders():
+    return (
+        selectinload(domain.Appointment.services),
+        joinedload(domain.Appointment.updated_by),
+    )
+
+
+def _appointment_criteria(
+    model,
+    status: Optional[domain.AppointmentStatus] = None,
+    client_id: Optional[int] = None,
+    day: Optional[date] = None,
+    min_price: Optional[int] = None,
+    max_price: Optional[int] = None,
+) -> list:
+    """Filters of `find` on the mapped class or the columns of the archive"""
+    criteria = []
+    if status is not None:
+        criteria.append(model.status == status)
+    if client_id is not None:
+        criteria.append(model.client_id == client_id)
+    if day is not None:
+        start = datetime.combine(day, time.min)
+        criteria.append(model.scheduled_at >= start)
+        criteria.append(model.scheduled_at < start + timedelta(days=1))
+    if min_price is not None:
+        criteria.append(model.total_price >= min_price)
+    if max_price is not None:
+        criteria.append(model.total_price <= max_price)
+    return criteria
+
+
+def _in_id_order(query, model, limit: Optional[int], after: Optional[int]):
+    """Keyset paginate a query, or order all of it by id, for merging"""
+    if limit is None and after is None:
+        return query.order_by(model.id)
+    return paginate(query, model, limit=limit, after=after)
 
 
 @dataclass
 class AppointmentRepository(AbstractRepository):
+    """
+    Appointments of the hot tables, and through `get` and `find` those moved
+    to the archive as well
+    """
+
     session: Session
     model: Type[domain.Appointment] = domain.Appointment
+
+    def get(self, entity_id: int) -> Optional[domain.Appointment]:
+        """
+        An appointment, brought back from the archive first if it was moved
+        there, since the caller may change it
+        """
+        appointment = super().get(entity_id)
+        if appointment is None and archive.restore(self.session, [entity_id]):
+            appointment = super().get(entity_id)
+        return appointment
+
+    def states(self, ids: Iterable[int]) -> List[Tuple]:
+        """
+        Id, version, status, last editor, schedule and price of appointments,
+        read in one query without loading them. Archived ones are brought back
+        first.
+        """
+        ids = set(ids)
+        model = self.model
+        query = self.session.query(
+            model.id,
+            model.version,
+            model.status,
+            model.updated_by_id,
+            model.scheduled_at,
+            model.updated_at,
+            model.total_price,
+        )
+        rows = query.filter(model.id.in_(ids)).all()
+        missing = ids.difference(row.id for row in rows)
+        if missing and archive.restore(self.session, missing):
+            rows += query.filter(model.id.in_(missing)).all()
+        return rows
+
+    def change_status(
+        self,
+        versions: Dict[int, int],
+        status: domain.AppointmentStatus,
+        employee_id: int,
+        updated_at: datetime,
+    ) -> int:
+        """
+        Move appointments, given by id with the version they were validated
+        at, to `status` in a single UPDATE, returning how many changed. Those
+        another transaction changed since are left out.
+        """
+        ids = set(versions)
+        model = self.model
+        changed = (
+            self.session.query(model)
+            .filter(
+                tuple_(model.id, model.version).in_(list(versions.items())),
+                model.status.in_(domain.TRANSITIONS[status]),
+            )
+            .update(
+                {
+                    model.status: status,
+                    model.updated_by_id: employee_id,
+                    model.updated_at: updated_at,
+                    model.version: model.version + 1,
+                },
+                synchronize_session=False,
+            )
+        )
+        # Appointments already loaded by the session are outdated now
+        for entity in list(self.session.identity_map.values()):
+            if isinstance(entity, model) and entity.id in ids:
+                self.session.expire(entity)
+        return changed
+
+    @property
+    def _active(self):
+        # Compared against an inlined literal so the planner can match the
+        # partial index on active bookings
+        canceled = bindparam(
+            "canceled",
+            domain.AppointmentStatus.CANCELED,
+            type_=self.model.status.type,
+            literal_execute=True,
+        )
+        return self.model.status != canceled
+
+    def find(
+        self,
+        status: Optional[domain.AppointmentStatus] = None,
+        client_id: Optional[int] = None,
+        day: Optional[date] = None,
+        min_price: Optional[int] = None,
+        max_price: Optional[int] = None,
+        limit: Optional[int] = None,
+        after: Optional[int] = None,
+        batch_size: Optional[int] = None,
+    ) -> Iterator[domain.Appointment]:
+        """
+        Appointments in id order with their services and last editor eagerly
+        loaded, so a page costs the same number of queries whatever its size.
+        Unless the status excludes them, archived appointments are read too,
+        in one more query, and merged with the hot ones. With a batch size,
+        rows are fetched in batches of that size as they are consumed.
+        """
+        filters = (status, client_id, day, min_price, max_price)
+        query = (
+            self.session.query(self.model)
+            .options(*_appointment_loaders())
+            .filter(*_appointment_criteria(self.model, *filters))
+        )
+        query = _in_id_order(query, self.model, limit, after)
+        if batch_size:
+            query = query.yield_per(batch_size)
+        if not archive.may_hold(status):
+            return iter(query)
+        columns = appointments_archive_table.c
+        statement = archive.select_archived(_appointment_criteria(columns, *filters))
+        archived = archive.load(
+            self.session.connection(),
+            _in_id_order(statement, columns, limit, after),
+            batch_size,
+        )
+        return islice(heapq.merge(query, archived, key=attrgetter("id")), limit)
+
+    def overlapping(
+        self,
+        start: datetime,
+        end: datetime,
+        employee_ids: Optional[Iterable[int]] = None,
+    ) -> Query:
+        """Active appointments assigned to an employee overlapping a window"""
+        query = self.session.query(self.model).filter(
+            self.model.employee_id.isnot(None),
+            self._active,
+            self.model.scheduled_at < end,
+            self.model.ends_at > start,
+        )
+        if employee_ids is not None:
+            query = query.filter(self.model.employee_id.in_(employee_ids))
+        return query
+
+    def find_conflict(
+        self, employee_id: int, start: datetime, end: datetime
+    ) -> Optional[domain.Appointment]:
+        """
+        Active booking of the employee overlapping [start, end).
+
+        Active bookings never overlap each other, so only the latest one
+        starting before `end` can collide, which costs a single index probe.
+        Bookings without an end take no time and are skipped, or one could
+        hide an earlier booking it lies within.
+        """
+        latest = (
+            self.session.query(self.model)
+            .filter(
+                self.model.employee_id == employee_id,
+                self._active,
+                self.model.scheduled_at < end,
+                self.model.ends_at.isnot(None),
+            )
+            .order_by(self.model.scheduled_at.desc())
+            .first()
+        )
+        if latest and latest.overlaps(start, end):
+            return latest
+        return None
+
+
+@dataclass
+class AsyncEmployeeRepository(AbstractAsyncRepository):
+    session: AsyncSession
+    model: Type[domain.Employee] = domain.Employee
+
+
+@dataclass
+class AsyncClientRepository(AbstractAsyncRepository):
+    session: AsyncSession
+    model: Type[domain.Client] = domain.Client
+
+
+@dataclass
+class AsyncServiceRepository(AbstractAsyncRepository):
+    session: AsyncSession
+    model: Type[domain.Service] = domain.Service
+
+    async def filter(
+        self,
+        ids: Set[int] = None,
+        limit: Optional[int] = None,
+        after: Optional[int] = None,
+        **kwargs,
+    ) -> List[domain.Service]:
+        statement = select(self.model)
+        if ids:
+            statement = statement.filter(self.model.id.in_(ids))
+        statement = statement.filter_by(**kwargs)
+        return await self.all(self.paginate(statement, limit=limit, after=after))
+
+
+@dataclass
+class AsyncAppointmentRepository(AbstractAsyncRepository):
+    session: AsyncSession
+    model: Type[domain.Appointment] = domain.Appointment
+
+    async def get(self, entity_id: int) -> Optional[domain.Appointment]:
+        """Same as AppointmentRepository.get"""
+        appointment = await self.session.get(
+            self.model, entity_id, options=_appointment_loaders()
+        )
+        if appointment is None and await self.session.run_sync(
+            archive.restore, [entity_id]
+        ):
+            appointment = await self.session.get(
+                self.model, entity_id, options=_appointment_loaders()
+            )
+        return appointment
+
+    async def find(
+        self,
+        status: Optional[domain.AppointmentStatus] = None,
+        client_id: Optional[int] = None,
+        day: Optional[date] = None,
+        min_price: Optional[int] = None,
+        max_price: Optional[int] = None,
+        limit: Optional[int] = None,
+        after: Optional[int] = None,
+    ) -> List[domain.Appointment]:
+        """Same as AppointmentRepository.find, sharing its merge of the archive"""
+
+        def find(session: Session) -> List[domain.Appointment]:
+            return list(
+                AppointmentRepository(session).find(
+                    status, client_id, day, min_price, max_price, limit, after
+                )
+            )
+
+        return await self.session.run_sync(find)
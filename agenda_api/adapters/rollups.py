@@ -0,0 +1,193 @@
+"""
+Daily revenue rollup: completed and canceled appointments, and the revenue
+of the completed ones, per employee and day.
+
+An appointment counts for the employee who last changed its status, on the
+day it was scheduled for, or the day of the change when it had no schedule.
+The handlers completing and canceling appointments add the difference they
+make to the rollup in their own transaction, so reports read a row per
+employee and day whatever the size of the history. `rebuild` recomputes it
+from the appointments, to backfill it or repair it.
+"""
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import and_, func, insert, or_, select, union_all
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from agenda_api import domain
+from agenda_api.adapters.orm import (
+    appointments_archive_table,
+    appointments_table,
+    daily_revenue_table,
+)
+from agenda_api.adapters.versions import UPSERTS
+
+Key = Tuple[int, date]
+
+COUNTERS = ("completed", "canceled", "revenue")
+
+
+class DailyRevenue(NamedTuple):
+    """A row of the rollup, or what an appointment adds to one"""
+
+    employee_id: int
+    day: date
+    completed: int
+    canceled: int
+    revenue: int
+
+
+def contribution(appointment: domain.Appointment) -> Optional[DailyRevenue]:
+    """What an appointment adds to the rollup in its current state"""
+    employee = appointment.updated_by
+    return contribution_of(
+        employee.id if employee is not None else None,
+        appointment.status,
+        appointment.scheduled_at or appointment.updated_at,
+        appointment.total_price,
+    )
+
+
+def contribution_of(
+    employee_id: Optional[int],
+    status: domain.AppointmentStatus,
+    moment: Optional[datetime],
+    total_price: Optional[int],
+) -> Optional[DailyRevenue]:
+    """
+    Same as `contribution`, from the columns of an appointment: the employee
+    who last changed it, its status, when it happens and its price
+    """
+    if employee_id is None or moment is None:
+        return None
+    if status == domain.AppointmentStatus.COMPLETED:
+        return DailyRevenue(employee_id, moment.date(), 1, 0, total_price or 0)
+    if status == domain.AppointmentStatus.CANCELED:
+        return DailyRevenue(employee_id, moment.date(), 0, 1, 0)
+    return None
+
+
+Change = Tuple[Optional[DailyRevenue], Optional[DailyRevenue]]
+
+
+def deltas(
+    before: Optional[DailyRevenue], after: Optional[DailyRevenue]
+) -> List[DailyRevenue]:
+    """The changes turning the contribution `before` into `after`"""
+    return merged_deltas([(before, after)])
+
+
+def merged_deltas(changes: Iterable[Change]) -> List[DailyRevenue]:
+    """The changes of several appointments, summed per employee and day"""
+    totals_by_key: Dict[Key, List[int]] = defaultdict(lambda: [0, 0, 0])
+    for before, after in changes:
+        for sign, item in ((-1, before), (1, after)):
+            if item is not None:
+                totals = totals_by_key[item.employee_id, item.day]
+                for index, name in enumerate(COUNTERS):
+                    totals[index] += sign * getattr(item, name)
+    return [
+        DailyRevenue(employee_id, day, *totals)
+        for (employee_id, day), totals in totals_by_key.items()
+        if any(totals)
+    ]
+
+
+def record(
+    session: Session, before: Optional[DailyRevenue], after: Optional[DailyRevenue]
+):
+    """
+    Add the change of an appointment from `before` to `after` to the rollup
+    rows, creating them as needed
+    """
+    record_all(session, [(before, after)])
+
+
+def record_all(session: Session, changes: Iterable[Change]):
+    """
+    Add the changes of several appointments to the rollup, in one statement.
+    The rows are written in key order so concurrent transactions do not
+    deadlock.
+    """
+    rows = [change._asdict() for change in sorted(merged_deltas(changes))]
+    if not rows:
+        return
+    statement = UPSERTS[session.get_bind().dialect.name](daily_revenue_table)
+    statement = statement.on_conflict_do_update(
+        index_elements=[daily_revenue_table.c.employee_id, daily_revenue_table.c.day],
+        set_={
+            name: daily_revenue_table.c[name] + statement.excluded[name]
+            for name in COUNTERS
+        },
+    )
+    session.execute(statement, rows)
+
+
+def rebuild(connection: Connection) -> int:
+    """
+    Recompute the whole rollup from the appointments, archived ones
+    included, in one statement, returning the number of rows written
+    """
+    names = ("updated_by_id", "status", "scheduled_at", "updated_at", "total_price")
+    column = (
+        union_all(
+            *(
+                select(*(table.c[name] for name in names))
+                for table in (appointments_table, appointments_archive_table)
+            )
+        )
+        .subquery("appointments")
+        .c
+    )
+    statuses = domain.AppointmentStatus
+    completed = column.status == statuses.COMPLETED
+    canceled = column.status == statuses.CANCELED
+    day = func.date(func.coalesce(column.scheduled_at, column.updated_at))
+    totals = (
+        select(
+            column.updated_by_id,
+            day,
+            func.count().filter(completed),
+            func.count().filter(canceled),
+            func.coalesce(
+                func.sum(func.coalesce(column.total_price, 0)).filter(completed), 0
+            ),
+        )
+        .where(
+            column.updated_by_id.is_not(None),
+            or_(column.scheduled_at.is_not(None), column.updated_at.is_not(None)),
+            or_(completed, canceled),
+        )
+        .group_by(column.updated_by_id, day)
+    )
+    connection.execute(daily_revenue_table.delete())
+    result = connection.execute(
+        insert(daily_revenue_table).from_select(
+            ["employee_id", "day", *COUNTERS], totals
+        )
+    )
+    return result.rowcount
+
+
+def report(
+    connection: Connection,
+    start: date,
+    end: date,
+    employee_id: Optional[int] = None,
+) -> List[DailyRevenue]:
+    """The rollup rows from `start` to `end` included, by day and employee"""
+    column = daily_revenue_table.c
+    statement = (
+        select(column.employee_id, column.day, *(column[name] for name in COUNTERS))
+        .where(
+            and_(column.day >= start, column.day <= end),
+            or_(column.completed != 0, column.canceled != 0),
+        )
+        .order_by(column.day, column.employee_id)
+    )
+    if employee_id is not None:
+        statement = statement.where(column.employee_id == employee_id)
+    return list(map(DailyRevenue._make, connection.execute(statement)))
@@ -0,0 +1,103 @@
+"""
+Version counters of the tables, bumped in the same transaction as the
+changes they track. A response built from some tables is identified by
+their versions, which is what the ETags of the list endpoints are made of.
+
+Only the tables clients poll are versioned. They are rarely written, while
+a counter row of the appointments would be locked by every booking until
+it commits, making all of them wait on each other.
+
+The tables written by a session, through its flushes or Core statements,
+are collected as it goes and their counters incremented when it commits.
+"""
+from typing import Dict, Iterable
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from agenda_api.adapters.orm import table_versions_table
+
+CHANGED_TABLES_KEY = "agenda_changed_tables"
+
+UPSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+WATCHED_TABLES = frozenset(["employees", "services"])
+
+
+def get(connection: Connection, tables: Iterable[str]) -> Dict[str, int]:
+    """The version of each table, 0 for a table never changed"""
+    tables = sorted(set(tables))
+    unwatched = set(tables) - WATCHED_TABLES
+    if unwatched:
+        raise ValueError(f"Tables {', '.join(sorted(unwatched))} are not versioned")
+    column = table_versions_table.c
+    rows = connection.execute(
+        select(column.name, column.version).where(column.name.in_(tables))
+    )
+    versions = dict.fromkeys(tables, 0)
+    versions.update((row.name, row.version) for row in rows)
+    return versions
+
+
+def bump(connection: Connection, tables: Iterable[str]):
+    """
+    Increment the versions of the watched tables among `tables`, in name
+    order to avoid deadlocks
+    """
+    watched = sorted(set(tables) & WATCHED_TABLES)
+    rows = [{"name": name, "version": 1} for name in watched]
+    if not rows:
+        return
+    statement = UPSERTS[connection.dialect.name](table_versions_table)
+    statement = statement.on_conflict_do_update(
+        index_elements=[table_versions_table.c.name],
+        set_={"version": table_versions_table.c.version + 1},
+    )
+    connection.execute(statement, rows)
+
+
+def _changed(session: Session) -> set:
+    return session.info.setdefault(CHANGED_TABLES_KEY, set())
+
+
+def _collect_flushed(session: Session, flush_context, instances):
+    changed = _changed(session)
+    for entity in session.new | session.deleted:
+        changed.update(table.name for table in inspect(entity).mapper.tables)
+    for entity in session.dirty:
+        if session.is_modified(entity):
+            changed.update(table.name for table in inspect(entity).mapper.tables)
+
+
+def _collect_executed(orm_execute_state: ORMExecuteState):
+    state = orm_execute_state
+    if state.is_insert or state.is_update or state.is_delete:
+        _changed(state.session).add(state.statement.table.name)
+
+
+def _bump_changed(session: Session):
+    if session.in_nested_transaction():
+        return
+    # The last flush only happens after this hook, do it first so its tables
+    # are bumped too
+    session.flush()
+    changed = session.info.pop(CHANGED_TABLES_KEY, None)
+    if changed:
+        bump(session.connection(), changed)
+
+
+def _discard_changed(session: Session, previous_transaction):
+    if not session.in_transaction():
+        session.info.pop(CHANGED_TABLES_KEY, None)
+
+
+def track_changes():
+    """Bump the versions of the tables every session commits changes to"""
+    if event.contains(Session, "before_flush", _collect_flushed):
+        return
+    event.listen(Session, "before_flush", _collect_flushed)
+    event.listen(Session, "do_orm_execute", _collect_executed)
+    event.listen(Session, "before_commit", _bump_changed)
+    event.listen(Session, "after_soft_rollback", _discard_changed)
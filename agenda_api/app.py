@@ -1,23 +1,93 @@
 import importlib
-import os
+import threading
+from typing import Iterable
 
-from flask import Flask
+from flask import Flask, jsonify
 
+from agenda_api import instrumentation
+from agenda_api.domain import errors as domain_errors
+from agenda_api.services.errors import EntityNotFound
+from agenda_api.settings import MetricsSettings
 
-def create_app(debug=False) -> Flask:
+# Modules exposing a `blueprint`, registered in this order
+RESOURCES = (
+    "agenda_api.resources.clients",
+    "agenda_api.resources.employees",
+    "agenda_api.resources.services",
+    "agenda_api.resources.appointments",
+    "agenda_api.resources.reports",
+    "agenda_api.resources.commands",
+)
+
+
+def create_app(debug=False, resources: Iterable[str] = RESOURCES, lazy=True) -> Flask:
     app = Flask(__name__)
     app.config["DEBUG"] = debug
-    register_resources(app)
+    register_error_handlers(app)
+    instrumentation.instrument_app(
+        app, query_count_header=MetricsSettings.from_env().query_count_header
+    )
+    setup = DeferredSetup(app, resources)
+    app.wsgi_app = setup
+    if not lazy:
+        setup.run()
     return app
 
 
-def register_resources(app):
-    current_file_path = os.path.dirname(__file__)
-    resources_dir = f"{current_file_path}/resources"
-    for resource in os.listdir(resources_dir):
-        if resource.startswith("__"):
-            continue
-        module = importlib.import_module(
-            f"agenda_api.resources.{resource.replace('.py', '')}"
-        )
+def register_resources(app, resources: Iterable[str] = RESOURCES):
+    for name in resources:
+        module = importlib.import_module(name)
         app.register_blueprint(module.blueprint)
+
+
+class DeferredSetup:
+    """
+    WSGI middleware that imports the resources, and with them SQLAlchemy,
+    and configures the mappers when the first request comes in, keeping
+    create_app cheap for cold starts
+    """
+
+    def __init__(self, app: Flask, resources: Iterable[str]):
+        self.app = app
+        self.resources = tuple(resources)
+        self.wsgi_app = app.wsgi_app
+        self.done = False
+        self._lock = threading.Lock()
+
+    def run(self):
+        if self.done:
+            return
+        with self._lock:
+            if self.done:
+                return
+            orm = importlib.import_module("agenda_api.adapters.orm")
+            orm.ensure_mappers()
+            database = importlib.import_module("agenda_api.adapters.database")
+            self.app.before_request(database.start_request_routing)
+            self.app.teardown_request(database.end_request_routing)
+            scope = importlib.import_module("agenda_api.resources._uow")
+            self.app.after_request(scope.finish_request_uow)
+            self.app.teardown_appcontext(scope.end_request_uow)
+            instrumentation.install_query_hooks()
+            register_resources(self.app, self.resources)
+            self.done = True
+
+    def __call__(self, environ, start_response):
+        self.run()
+        return self.wsgi_app(environ, start_response)
+
+
+def register_error_handlers(app):
+    @app.errorhandler(EntityNotFound)
+    def entity_not_found(error):
+        return jsonify({"message": error.message}), 404
+
+    @app.errorhandler(domain_errors.AppointmentConflict)
+    @app.errorhandler(domain_errors.StaleAppointment)
+    def appointment_conflict(error):
+        return jsonify({"message": error.message}), 409
+
+    @app.errorhandler(domain_errors.ServiceError)
+    @app.errorhandler(domain_errors.AppointmentError)
+    def domain_error(error):
+        return jsonify({"message": error.message}), 400
@@ -0,0 +1,434 @@
+"""
+ASGI version of the resource endpoints, running on the async unit of work
+so one process keeps many requests in flight while they wait on the
+database. Serve it with any ASGI server:
+
+    uvicorn agenda_api.asgi:app
+"""
+import json
+import re
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from functools import wraps
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Pattern,
+    Tuple,
+)
+from urllib.parse import parse_qsl, urlencode
+
+from werkzeug.exceptions import BadRequest, HTTPException
+from werkzeug.http import quote_etag
+
+from agenda_api import domain
+from agenda_api.adapters import versions
+from agenda_api.adapters.database import (
+    DEFAULT_ASYNC_SESSION_FACTORY,
+    start_request_routing,
+)
+from agenda_api.adapters.orm import ensure_mappers
+from agenda_api.adapters.repositories import SEARCH_LIMIT
+from agenda_api.domain import errors as domain_errors
+from agenda_api.resources._batch import (
+    batch_body,
+    build_batch,
+    build_status_change,
+    status_change_body,
+)
+from agenda_api.resources._conditional import etag_matches, make_etag
+from agenda_api.resources._pagination import MAX_PAGE_SIZE, NEXT_CURSOR_HEADER
+from agenda_api.resources.clients import MAX_SEARCH_LIMIT
+from agenda_api.resources.employees import MAX_SLOT_SEARCH_DAYS
+from agenda_api.resources.reports import report_period, revenue_report
+from agenda_api.serializers import (
+    SERIALIZERS,
+    dumps,
+    serialize_appointment,
+    serialize_client,
+    serialize_employee,
+    serialize_service,
+)
+from agenda_api.services import commands, handlers, unitofwork, views
+from agenda_api.services.availability import find_next_slot
+from agenda_api.services.errors import EntityNotFound
+
+
+@dataclass
+class Request:
+    method: str
+    path: str
+    args: Dict[str, str] = field(default_factory=dict)
+    body: bytes = b""
+    # Lower cased names
+    headers: Dict[str, str] = field(default_factory=dict)
+
+    def arg(self, name: str, convert: Callable[[str], Any] = str, default=None):
+        value = self.args.get(name)
+        if not value:
+            return default
+        try:
+            return convert(value)
+        except ValueError as error:
+            raise BadRequest(f"Invalid {name}: {error}")
+
+    def json(self) -> Any:
+        try:
+            return json.loads(self.body or b"null")
+        except ValueError:
+            raise BadRequest("The body is not valid JSON")
+
+
+@dataclass
+class Response:
+    # None for an empty body
+    body: Any
+    status: int = 200
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+Endpoint = Callable[..., Awaitable[Response]]
+
+ROUTES: List[Tuple[str, Pattern, Endpoint]] = []
+
+
+def route(method: str, path: str):
+    """Register an endpoint, `path` being a regex whose groups are int ids"""
+
+    def register(endpoint: Endpoint) -> Endpoint:
+        ROUTES.append((method, re.compile(f"^{path}$"), endpoint))
+        return endpoint
+
+    return register
+
+
+def pagination_args(request: Request) -> Tuple[Optional[int], Optional[int]]:
+    limit = request.arg("limit", int)
+    if limit is not None:
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+    return limit, request.arg("after", int)
+
+
+def page_response(items: List[Dict[str, Any]], limit: Optional[int]) -> Response:
+    response = Response(items)
+    if limit is not None and len(items) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = str(items[-1]["id"])
+    return response
+
+
+def conditional(tables: Iterable[str]):
+    """Same as the conditional decorator of the Flask resources, without the cache"""
+    tables = tuple(tables)
+
+    def decorate(endpoint: Endpoint) -> Endpoint:
+        @wraps(endpoint)
+        async def wrapper(request: Request, **params) -> Response:
+            uow = unitofwork.get_default_async_uow(read_only=True)
+            async with uow:
+                table_versions = await uow.run(
+                    lambda inner: versions.get(inner.session.connection(), tables)
+                )
+            query = urlencode(sorted(request.args.items()))
+            etag = make_etag(f"{request.path}?{query}", table_versions)
+            if etag_matches(request.headers.get("if-none-match"), etag):
+                response = Response(None, 304)
+            else:
+                response = await endpoint(request, **params)
+                if response.status != 200:
+                    return response
+            response.headers["ETag"] = quote_etag(etag)
+            response.headers["Cache-Control"] = "no-cache"
+            return response
+
+        return wrapper
+
+    return decorate
+
+
+def build_command(command_type, payload: Any) -> commands.Command:
+    if not isinstance(payload, dict):
+        raise BadRequest("Expected a JSON object")
+    try:
+        return command_type(**payload)
+    except TypeError as error:
+        raise BadRequest(str(error))
+
+
+def reference_routes(
+    name: str,
+    command_type,
+    batch_command_type,
+    create,
+    create_batch,
+    serialize: Callable[[Any], Dict[str, Any]],
+    view,
+):
+    """
+    List, create and batch create endpoints of clients, employees and
+    services, which only differ by their read model and handlers
+    """
+    serialize_view = SERIALIZERS.register(view)
+
+    async def list_entities(request: Request) -> Response:
+        limit, after = pagination_args(request)
+        uow = unitofwork.get_default_async_uow(read_only=True)
+        async with uow:
+            rows = await uow.run(views.page, view, limit, after)
+            items = [serialize_view(row) for row in rows]
+        return page_response(items, limit)
+
+    if name in versions.WATCHED_TABLES:
+        list_entities = conditional([name])(list_entities)
+    route("GET", f"/api/{name}")(list_entities)
+
+    @route("POST", f"/api/{name}")
+    async def create_entity(request: Request) -> Response:
+        cmd = build_command(command_type, request.json())
+        uow = unitofwork.get_default_async_uow()
+        async with uow:
+            entity = await uow.run(create, cmd)
+            await uow.commit()
+            return Response(serialize(entity), 201)
+
+    @route("POST", f"/api/{name}:batch")
+    async def create_entities(request: Request) -> Response:
+        items, positions, errors = build_batch(request.json(), command_type)
+        uow = unitofwork.get_default_async_uow()
+        async with uow:
+            result = await uow.run(create_batch, batch_command_type(tuple(items)))
+            await uow.commit()
+            body, status = batch_body(result, positions, errors, serialize)
+        return Response(body, status)
+
+
+reference_routes(
+    "clients",
+    commands.CreateClient,
+    commands.CreateClients,
+    handlers.create_client,
+    handlers.create_clients,
+    serialize_client,
+    views.ClientView,
+)
+reference_routes(
+    "employees",
+    commands.CreateEmployee,
+    commands.CreateEmployees,
+    handlers.create_employee,
+    handlers.create_employees,
+    serialize_employee,
+    views.EmployeeView,
+)
+reference_routes(
+    "services",
+    commands.CreateService,
+    commands.CreateServices,
+    handlers.create_service,
+    handlers.create_services,
+    serialize_service,
+    views.ServiceView,
+)
+
+
+@route("GET", "/api/appointments")
+async def list_appointments(request: Request) -> Response:
+    limit, after = pagination_args(request)
+    uow = unitofwork.get_default_async_uow(read_only=True)
+    async with uow:
+        appointments = await uow.appointments.find(
+            status=request.arg("status", domain.AppointmentStatus),
+            client_id=request.arg("client_id", int),
+            day=request.arg("date", date.fromisoformat),
+            min_price=request.arg("min_price", int),
+            max_price=request.arg("max_price", int),
+            limit=limit,
+            after=after,
+        )
+        items = [serialize_appointment(appointment) for appointment in appointments]
+    return page_response(items, limit)
+
+
+def status_change_route(action: str, command_type, handler):
+    """Endpoint applying a status change to many appointments at once"""
+
+    @route("POST", f"/api/appointments:{action}")
+    async def change_statuses(request: Request) -> Response:
+        cmd = build_status_change(request.json(), command_type)
+        uow = unitofwork.get_default_async_uow()
+        async with uow:
+            result = await uow.run(handler, cmd)
+            await uow.commit()
+        return Response(*status_change_body(result))
+
+
+status_change_route(
+    "complete", commands.CompleteAppointments, handlers.complete_appointments
+)
+status_change_route("cancel", commands.CancelAppointments, handlers.cancel_appointments)
+
+
+@route("GET", "/api/clients/search")
+async def search_clients(request: Request) -> Response:
+    term = request.arg("q", str, "").strip()
+    if not term:
+        raise BadRequest("Expected a name to search in q")
+    fuzzy = request.arg("fuzzy", str, "").lower() in ("1", "true", "yes")
+    limit = max(1, min(request.arg("limit", int, SEARCH_LIMIT), MAX_SEARCH_LIMIT))
+    uow = unitofwork.get_default_async_uow(read_only=True)
+    async with uow:
+        clients = await uow.run(
+            lambda inner: inner.clients.search(term, fuzzy=fuzzy, limit=limit)
+        )
+        return Response([serialize_client(client) for client in clients])
+
+
+@route("GET", "/api/reports/revenue")
+async def revenue(request: Request) -> Response:
+    start, end = report_period(request.arg("start", str), request.arg("end", str))
+    employee_id = request.arg("employee_id", int)
+    uow = unitofwork.get_default_async_uow(read_only=True)
+    async with uow:
+        return Response(await uow.run(revenue_report, start, end, employee_id))
+
+
+@route("GET", "/api/employees/next-slot")
+@route("GET", r"/api/employees/(?P<employee_id>\d+)/next-slot")
+async def next_slot(request: Request, employee_id: Optional[int] = None) -> Response:
+    duration = timedelta(minutes=request.arg("duration", int, 60))
+    after = request.arg("after", datetime.fromisoformat) or datetime.now()
+    days = max(1, min(request.arg("days", int, 7), MAX_SLOT_SEARCH_DAYS))
+    uow = unitofwork.get_default_async_uow(read_only=True)
+    async with uow:
+        slot = await uow.run(find_next_slot, duration, after, employee_id, days)
+    if not slot:
+        return Response({"message": "No free slot found"}, 404)
+    return Response(
+        {
+            "employee_id": slot.employee_id,
+            "start": slot.start.isoformat(),
+            "end": slot.end.isoformat(),
+        }
+    )
+
+
+def error_response(error: Exception) -> Optional[Response]:
+    """Same mapping as the error handlers of the Flask app"""
+    if isinstance(error, EntityNotFound):
+        return Response({"message": error.message}, 404)
+    if isinstance(
+        error, (domain_errors.AppointmentConflict, domain_errors.StaleAppointment)
+    ):
+        return Response({"message": error.message}, 409)
+    if isinstance(error, (domain_errors.ServiceError, domain_errors.AppointmentError)):
+        return Response({"message": error.message}, 400)
+    if isinstance(error, HTTPException):
+        return Response({"message": error.description}, error.code)
+    return None
+
+
+class AgendaApp:
+    def __init__(self, routes: List[Tuple[str, Pattern, Endpoint]] = ROUTES):
+        self.routes = routes
+        self.ready = False
+
+    def setup(self):
+        if not self.ready:
+            ensure_mappers()
+            self.ready = True
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+            return
+        if scope["type"] == "websocket":
+            await reject_websocket(receive, send)
+            return
+        if scope["type"] != "http":
+            # Servers only open http, websocket and lifespan scopes, the ASGI
+            # spec asks applications to raise on any other
+            raise NotImplementedError(f"Unsupported scope {scope['type']}")
+        self.setup()
+        request = Request(
+            method=scope["method"],
+            path=scope["path"],
+            args=dict(parse_qsl(scope.get("query_string", b"").decode())),
+            body=await read_body(receive),
+            headers={
+                name.decode().lower(): value.decode()
+                for name, value in scope.get("headers", [])
+            },
+        )
+        start_request_routing()
+        response = await self.dispatch(request)
+        if response.body is None:
+            body, headers = b"", response.headers
+        else:
+            body = dumps(response.body)
+            headers = {**response.headers, "content-type": "application/json"}
+        await send(
+            {
+                "type": "http.response.start",
+                "status": response.status,
+                "headers": [
+                    (name.lower().encode(), value.encode())
+                    for name, value in headers.items()
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+    async def dispatch(self, request: Request) -> Response:
+        path_found = False
+        for method, pattern, endpoint in self.routes:
+            match = pattern.match(request.path)
+            if not match:
+                continue
+            path_found = True
+            if method != request.method:
+                continue
+            params = {name: int(value) for name, value in match.groupdict().items()}
+            try:
+                return await endpoint(request, **params)
+            except Exception as error:
+                response = error_response(error)
+                if response is None:
+                    raise
+                return response
+        if path_found:
+            return Response({"message": "Method not allowed"}, 405)
+        return Response({"message": "Not found"}, 404)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self.setup()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await DEFAULT_ASYNC_SESSION_FACTORY.dispose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+async def reject_websocket(receive, send):
+    """Close a WebSocket before accepting it, which servers answer with a 403"""
+    message = await receive()
+    if message["type"] == "websocket.connect":
+        await send({"type": "websocket.close", "code": 1008})
+
+
+async def read_body(receive) -> bytes:
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+
+app = AgendaApp()
@@ -0,0 +1,142 @@
+import argparse
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import create_engine
+
+from agenda_api.adapters import archive, bulkload, rollups
+from agenda_api.settings import get_database_uri
+
+FORMATS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+
+DEFAULT_RETENTION_DAYS = 365
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="agenda_api")
+    parser.add_argument(
+        "--database-url",
+        default=None,
+        help="Database to connect to, defaults to the POSTGRES_* settings",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    importer = subparsers.add_parser(
+        "import", help="Stream a CSV or NDJSON file into a table"
+    )
+    importer.add_argument("table", choices=sorted(bulkload.TABLES))
+    importer.add_argument("path", help="File to load, - to read from stdin")
+    importer.add_argument("--format", choices=sorted(set(FORMATS.values())))
+    importer.add_argument("--batch-size", type=int, default=bulkload.DEFAULT_BATCH_SIZE)
+    importer.set_defaults(handler=import_file)
+
+    rebuild = subparsers.add_parser(
+        "rebuild-revenue", help="Recompute the daily revenue rollup from history"
+    )
+    rebuild.set_defaults(handler=rebuild_revenue)
+
+    archiver = subparsers.add_parser(
+        "archive", help="Move finished appointments past retention to the archive"
+    )
+    archiver.add_argument(
+        "--retention-days",
+        type=int,
+        default=DEFAULT_RETENTION_DAYS,
+        help="Keep the appointments scheduled in that many last days",
+    )
+    archiver.add_argument("--batch-size", type=int, default=archive.DEFAULT_BATCH_SIZE)
+    archiver.set_defaults(handler=archive_appointments)
+    return parser
+
+
+def import_file(args: argparse.Namespace) -> int:
+    file_format = args.format or FORMATS.get(os.path.splitext(args.path)[1])
+    if not file_format:
+        print(f"Cannot guess the format of {args.path}, use --format", file=sys.stderr)
+        return 2
+
+    def progress(report: bulkload.LoadReport):
+        print(
+            f"\r{report.table}: {report.rows} rows, "
+            f"{report.rows_per_second:.0f} rows/s",
+            end="",
+            file=sys.stderr,
+        )
+
+    engine = create_engine(args.database_url or get_database_uri())
+    stream = sys.stdin if args.path == "-" else open(args.path, newline="")
+    try:
+        with engine.begin() as connection:
+            report = bulkload.load(
+                connection,
+                bulkload.TABLES[args.table],
+                bulkload.read_records(stream, file_format),
+                batch_size=args.batch_size,
+                progress=progress,
+            )
+            if args.table == "appointment_services":
+                bulkload.refresh_appointment_totals(connection)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+        engine.dispose()
+    print(
+        f"\rLoaded {report.rows} rows into {report.table} in "
+        f"{report.seconds:.2f}s ({report.rows_per_second:.0f} rows/s)",
+        file=sys.stderr,
+    )
+    return 0
+
+
+def rebuild_revenue(args: argparse.Namespace) -> int:
+    engine = create_engine(args.database_url or get_database_uri())
+    started = time.perf_counter()
+    try:
+        with engine.begin() as connection:
+            rows = rollups.rebuild(connection)
+    finally:
+        engine.dispose()
+    print(
+        f"Rebuilt {rows} daily revenue rows in {time.perf_counter() - started:.2f}s",
+        file=sys.stderr,
+    )
+    return 0
+
+
+def archive_appointments(args: argparse.Namespace) -> int:
+    before = datetime.combine(
+        date.today() - timedelta(days=args.retention_days), datetime.min.time()
+    )
+    engine = create_engine(args.database_url or get_database_uri())
+    moved = 0
+    started = time.perf_counter()
+    try:
+        with engine.connect() as connection:
+            # A transaction per batch, so locks are held briefly
+            while True:
+                with connection.begin():
+                    batch = archive.archive_batch(connection, before, args.batch_size)
+                if not batch:
+                    break
+                moved += batch
+                print(f"\rArchived {moved} appointments", end="", file=sys.stderr)
+    finally:
+        engine.dispose()
+    print(
+        f"\rArchived {moved} appointments scheduled before {before.date()} "
+        f"in {time.perf_counter() - started:.2f}s",
+        file=sys.stderr,
+    )
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,19 @@
-from .models import Appointment, AppointmentStatus, Client, Employee, Service
+from .models import (
+    TRANSITIONS,
+    Appointment,
+    AppointmentStatus,
+    Client,
+    Employee,
+    Service,
+    check_transition,
+)
 
-__all__ = [Employee, Client, Service, Appointment, AppointmentStatus]
+__all__ = [
+    Employee,
+    Client,
+    Service,
+    Appointment,
+    AppointmentStatus,
+    TRANSITIONS,
+    check_transition,
+]
@@ -9,3 +9,13 @@ class ServiceError(Exception):
 @dataclass
 class AppointmentError(Exception):
     message: str = "Appointment error"
+
+
+@dataclass
+class AppointmentConflict(AppointmentError):
+    message: str = "Appointment overlaps another booking of the employee"
+
+
+@dataclass
+class StaleAppointment(AppointmentError):
+    message: str = "Appointment was changed by another request, reload it and retry"
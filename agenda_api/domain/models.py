@@ -53,6 +53,40 @@ class AppointmentStatus(enum.Enum):
     CANCELED = "canceled"
 
 
+# The statuses an appointment can be moved to each status from
+TRANSITIONS = {
+    AppointmentStatus.STARTED: frozenset({AppointmentStatus.PENDING}),
+    AppointmentStatus.COMPLETED: frozenset(
+        {
+            AppointmentStatus.PENDING,
+            AppointmentStatus.STARTED,
+            AppointmentStatus.COMPLETED,
+        }
+    ),
+    AppointmentStatus.CANCELED: frozenset(
+        {
+            AppointmentStatus.PENDING,
+            AppointmentStatus.STARTED,
+            AppointmentStatus.CANCELED,
+        }
+    ),
+}
+
+_ACTIONS = {
+    AppointmentStatus.STARTED: "start",
+    AppointmentStatus.COMPLETED: "complete",
+    AppointmentStatus.CANCELED: "cancel",
+}
+
+
+def check_transition(current: AppointmentStatus, target: AppointmentStatus):
+    """Raise an AppointmentError unless an appointment can go from current to target"""
+    if current not in TRANSITIONS[target]:
+        raise errors.AppointmentError(
+            f"Cannot {_ACTIONS[target]} an appointment with status {current.value}"
+        )
+
+
 @dataclass(unsafe_hash=True)
 class Appointment:
     client_id: int
@@ -60,38 +94,53 @@ class Appointment:
     status: AppointmentStatus = AppointmentStatus.PENDING
     updated_at: Optional[datetime] = None
     updated_by: Optional[Employee] = None
+    employee_id: Optional[int] = None
+    scheduled_at: Optional[datetime] = None
+    ends_at: Optional[datetime] = field(init=False, default=None)
+    total_price: int = field(init=False, default=0)
+    total_duration: timedelta = field(init=False, default=timedelta(0))
+    # Bumped by every write, which only applies to the version it was read at
+    version: int = field(init=False, default_factory=int)
     id: int = field(init=False)
 
-    @property
-    def total_price(self) -> int:
-        return sum(service.price for service in self.services)
+    def __post_init__(self):
+        self.recalculate_totals()
 
-    @property
-    def total_duration(self) -> timedelta:
-        duration = timedelta(hours=0)
-        for service in self.services:
-            duration += service.duration
-        return duration
+    def recalculate_totals(self):
+        """Refresh the totals kept alongside the services and the end time"""
+        self.total_price = sum(service.price for service in self.services)
+        self.total_duration = sum(
+            (service.duration for service in self.services), timedelta(0)
+        )
+        if self.scheduled_at:
+            self.ends_at = self.scheduled_at + self.total_duration
+
+    def add_service(self, service: Service):
+        self.services.add(service)
+        self.recalculate_totals()
+
+    def remove_service(self, service: Service):
+        self.services.discard(service)
+        self.recalculate_totals()
+
+    def overlaps(self, start: datetime, end: datetime) -> bool:
+        if not self.scheduled_at or self.status == AppointmentStatus.CANCELED:
+            return False
+        # Imported without services, a booking has no end and takes no time
+        return self.scheduled_at < end and (self.ends_at or self.scheduled_at) > start
 
     def start(self):
-        if self.status != AppointmentStatus.PENDING:
-            raise errors.AppointmentError(
-                f"Cannot start an appointment with status {self.status.value}"
-            )
+        check_transition(self.status, AppointmentStatus.STARTED)
         self.status = AppointmentStatus.STARTED
 
     def complete(self, employee: Employee):
-        if self.status == AppointmentStatus.CANCELED:
-            raise errors.AppointmentError(
-                f"Cannot complete an appointment with status {self.status.value}"
-            )
+        check_transition(self.status, AppointmentStatus.COMPLETED)
         self.status = AppointmentStatus.COMPLETED
         self.updated_by = employee
+        self.updated_at = datetime.now()
 
     def cancel(self, employee: Employee):
-        if self.status == AppointmentStatus.COMPLETED:
-            raise errors.AppointmentError(
-                f"Cannot cancel an appointment with status {self.status.value}"
-            )
+        check_transition(self.status, AppointmentStatus.CANCELED)
         self.status = AppointmentStatus.CANCELED
         self.updated_by = employee
+        self.updated_at = datetime.now()
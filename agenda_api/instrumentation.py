@@ -0,0 +1,289 @@
+"""
+Per request metrics in the Prometheus text format: latency, SQL statements
+and the time spent in them by route, and the wait for pooled connections.
+
+Only the standard library is imported here so create_app stays cheap, the
+SQLAlchemy hooks are installed with the deferred setup.
+"""
+import math
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from flask import Flask, Response, g, request
+
+METRICS_PATH = "/metrics"
+QUERY_COUNT_HEADER = "X-Query-Count"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in labels
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    return "+Inf" if math.isinf(value) else str(value)
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: Sequence[float]):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        # Per label set: the count of each bucket, then the sum and count
+        self._series: Dict[Labels, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.setdefault(key, [0] * (len(self.buckets) + 2))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def snapshot(self, **labels: str) -> Optional[Dict[str, float]]:
+        series = self._series.get(tuple(sorted(labels.items())))
+        if series is None:
+            return None
+        return {"sum": series[-2], "count": series[-1]}
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        for labels, values in sorted(series.items()):
+            for bound, count in zip(
+                self.buckets + (math.inf,), values[:-2] + [values[-1]]
+            ):
+                bucket = _format_labels(labels + (("le", _format_value(bound)),))
+                yield f"{self.name}_bucket{bucket} {count}"
+            yield f"{self.name}_sum{_format_labels(labels)} {values[-2]}"
+            yield f"{self.name}_count{_format_labels(labels)} {values[-1]}"
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+class Gauge:
+    """Gauge whose values are collected when the metrics are rendered"""
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        collect: Callable[[], Dict[Labels, float]],
+    ):
+        self.name = name
+        self.help = help
+        self.collect = collect
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} gauge"
+        for labels, value in sorted(self.collect().items()):
+            yield f"{self.name}{_format_labels(labels)} {value}"
+
+    def reset(self):
+        pass
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = []
+
+    def histogram(self, name: str, help: str, buckets: Sequence[float]) -> Histogram:
+        metric = Histogram(name, help, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def gauge(
+        self, name: str, help: str, collect: Callable[[], Dict[Labels, float]]
+    ) -> Gauge:
+        metric = Gauge(name, help, collect)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return (
+            "\n".join(line for metric in self.metrics for line in metric.render())
+            + "\n"
+        )
+
+    def reset(self):
+        for metric in self.metrics:
+            metric.reset()
+
+
+def _pool_connections() -> Dict[Labels, float]:
+    # Only rendered once the deferred setup imported the database module
+    from agenda_api.adapters.database import pool_status
+
+    return {(("state", state),): value for state, value in pool_status().items()}
+
+
+METRICS = MetricsRegistry()
+REQUEST_DURATION = METRICS.histogram(
+    "agenda_http_request_duration_seconds",
+    "Time to handle a request, serialization included",
+    LATENCY_BUCKETS,
+)
+REQUEST_QUERIES = METRICS.histogram(
+    "agenda_http_request_queries",
+    "SQL statements issued by a request",
+    QUERY_COUNT_BUCKETS,
+)
+REQUEST_DB_SECONDS = METRICS.histogram(
+    "agenda_http_request_db_seconds",
+    "Time a request spent executing SQL statements",
+    LATENCY_BUCKETS,
+)
+POOL_CHECKOUT_SECONDS = METRICS.histogram(
+    "agenda_db_pool_checkout_seconds",
+    "Time waited for a connection from the pool",
+    LATENCY_BUCKETS,
+)
+POOL_CONNECTIONS = METRICS.gauge(
+    "agenda_db_pool_connections",
+    "Connections of the default engine pool by state",
+    _pool_connections,
+)
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    seconds: float = 0.0
+    pool_wait_seconds: float = 0.0
+    statements: List[str] = field(default_factory=list)
+
+    def record(self, statement: str, seconds: float):
+        self.count += 1
+        self.seconds += seconds
+        self.statements.append(statement)
+
+    def repeated(self, threshold: int) -> Dict[str, int]:
+        """Statements executed more than `threshold` times"""
+        return {
+            statement: count
+            for statement, count in Counter(self.statements).most_common()
+            if count > threshold
+        }
+
+
+# Recordings are nested, a budget inside a request, and all of them see
+# every statement
+_active_stats: ContextVar[Tuple[QueryStats, ...]] = ContextVar(
+    "query_stats", default=()
+)
+
+
+def current_stats() -> Optional[QueryStats]:
+    active = _active_stats.get()
+    return active[-1] if active else None
+
+
+@contextmanager
+def recording() -> Iterator[QueryStats]:
+    """Record the statements executed in the block"""
+    stats = QueryStats()
+    token = _active_stats.set(_active_stats.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _active_stats.reset(token)
+
+
+_STARTED_KEY = "agenda_query_started"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _active_stats.get():
+        conn.info.setdefault(_STARTED_KEY, []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get(_STARTED_KEY)
+    active = _active_stats.get()
+    if active and started:
+        elapsed = time.perf_counter() - started.pop()
+        for stats in active:
+            stats.record(statement, elapsed)
+
+
+def _handle_error(exception_context):
+    connection = exception_context.connection
+    started = connection.info.get(_STARTED_KEY) if connection is not None else None
+    if started:
+        started.pop()
+
+
+def install_query_hooks():
+    """Time the statements of every engine while a recording is active"""
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    if event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(Engine, "handle_error", _handle_error)
+
+
+def observe_pool_checkout(seconds: float):
+    POOL_CHECKOUT_SECONDS.observe(seconds)
+    for stats in _active_stats.get():
+        stats.pool_wait_seconds += seconds
+
+
+def instrument_app(app: Flask, query_count_header: bool = False):
+    """Record the metrics of every request and serve them on /metrics"""
+
+    @app.before_request
+    def start_recording():
+        g.request_started = time.perf_counter()
+        _active_stats.set((QueryStats(),))
+
+    @app.after_request
+    def record_request(response: Response) -> Response:
+        stats = current_stats()
+        if stats is None or request.path == METRICS_PATH:
+            return response
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        REQUEST_DURATION.observe(
+            time.perf_counter() - g.request_started,
+            method=request.method,
+            route=route,
+            status=str(response.status_code),
+        )
+        REQUEST_QUERIES.observe(stats.count, method=request.method, route=route)
+        REQUEST_DB_SECONDS.observe(stats.seconds, method=request.method, route=route)
+        if query_count_header:
+            response.headers[QUERY_COUNT_HEADER] = str(stats.count)
+        return response
+
+    @app.teardown_request
+    def stop_recording(error=None):
+        _active_stats.set(())
+
+    @app.route(METRICS_PATH, methods=["GET"])
+    def metrics():
+        return Response(METRICS.render(), mimetype="text/plain; version=0.0.4")
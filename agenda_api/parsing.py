@@ -0,0 +1,64 @@
+"""
+Parsing of the values the API and the bulk importer receive as text or
+JSON, shared by both so they accept the same formats.
+
+Commands are built from JSON fields by converting each value to the type
+its field is annotated with. Values of the wrong type, and nulls given
+for required fields, raise a TypeError or ValueError naming the field.
+"""
+import re
+from datetime import datetime, timedelta
+from typing import Any, Type, Union, get_args, get_origin, get_type_hints
+
+from agenda_api.services.commands import Command
+
+DURATION_PATTERN = re.compile(r"^(?:(\d+) days?, )?(\d+):(\d{2}):(\d{2})$")
+
+
+def parse_duration(value) -> timedelta:
+    """Read a duration given in seconds or as [D days, ]HH:MM:SS"""
+    if isinstance(value, (int, float)):
+        return timedelta(seconds=value)
+    match = DURATION_PATTERN.match(value)
+    if not match:
+        return timedelta(seconds=float(value))
+    days, hours, minutes, seconds = (int(part or 0) for part in match.groups())
+    return timedelta(days=days, hours=hours, minutes=minutes, seconds=seconds)
+
+
+def build_command(command_type: Type[Command], fields: Any) -> Command:
+    """A command of the given type from the fields of a JSON object"""
+    if not isinstance(fields, dict):
+        raise ValueError(f"Expected the fields of {command_type.__name__}")
+    hints = get_type_hints(command_type)
+    return command_type(
+        **{name: coerce(name, hints.get(name), value) for name, value in fields.items()}
+    )
+
+
+def coerce(name: str, hint, value):
+    """Convert the JSON value of a field to the type it is annotated with"""
+    origin, args = get_origin(hint), get_args(hint)
+    if value is None:
+        if hint is None or type(None) in args:
+            return None
+        raise ValueError(f"{name} is required")
+    if origin is Union:
+        return coerce(name, next(arg for arg in args if arg is not type(None)), value)
+    if hint is datetime:
+        return datetime.fromisoformat(value)
+    if hint is timedelta:
+        return parse_duration(value)
+    if origin is set:
+        return {coerce(name, args[0], item) for item in _list(name, value)}
+    if origin is tuple:
+        return tuple(build_command(args[0], item) for item in _list(name, value))
+    if hint in (int, str) and (not isinstance(value, hint) or isinstance(value, bool)):
+        raise TypeError(f"{name} must be {'an integer' if hint is int else 'a string'}")
+    return value
+
+
+def _list(name: str, value) -> list:
+    if not isinstance(value, list):
+        raise TypeError(f"{name} must be a list")
+    return value
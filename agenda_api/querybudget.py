@@ -0,0 +1,105 @@
+"""
+Query budgets: a block, unit of work or route declares how many SQL
+statements it may issue, and repeated identical statements are reported
+as the N+1 pattern lazy relationships produce.
+
+    with QueryBudget(3, name="list appointments"), uow:
+        ...
+
+    @blueprint.route("/appointments")
+    @QueryBudget(3)
+    def list_appointments():
+        ...
+
+Exceeding a budget raises QueryBudgetExceeded when QUERY_BUDGET_STRICT is
+set, as in the tests, and logs a warning otherwise.
+
+A decorated view is checked when it returns, so the queries of a streamed
+response, run while its body is sent, are not counted. Streams are exempt
+by design: they fetch one batch per query, as many as the table needs, and
+those repeated statements would read as an N+1.
+"""
+import functools
+import logging
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+from agenda_api import instrumentation
+from agenda_api.instrumentation import QueryStats
+from agenda_api.settings import QueryBudgetSettings
+
+logger = logging.getLogger(__name__)
+
+# Characters of each statement quoted in a report
+STATEMENT_PREVIEW = 200
+
+
+@dataclass
+class QueryBudgetExceeded(AssertionError):
+    message: str = "Query budget exceeded"
+
+
+class QueryBudget:
+    def __init__(
+        self,
+        max_queries: Optional[int] = None,
+        name: Optional[str] = None,
+        max_repeats: Optional[int] = None,
+    ):
+        self.max_queries = max_queries
+        self.name = name
+        self.max_repeats = max_repeats
+        self._recording = None
+
+    def __call__(self, func: Callable) -> Callable:
+        name = self.name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with QueryBudget(self.max_queries, name, self.max_repeats):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    def __enter__(self) -> QueryStats:
+        instrumentation.install_query_hooks()
+        self._recording = instrumentation.recording()
+        self.stats = self._recording.__enter__()
+        return self.stats
+
+    def __exit__(self, *exc_info):
+        self._recording.__exit__(*exc_info)
+        if exc_info[0] is None:
+            self.check(self.stats)
+
+    def violations(self, stats: QueryStats, max_repeats: int) -> List[str]:
+        problems = []
+        if self.max_queries is not None and stats.count > self.max_queries:
+            problems.append(
+                f"issued {stats.count} queries, its budget is {self.max_queries}"
+            )
+        for statement, count in stats.repeated(max_repeats).items():
+            problems.append(
+                f"repeated {count} times, a lazy load in a loop? "
+                f"{statement[:STATEMENT_PREVIEW]}"
+            )
+        return problems
+
+    def check(self, stats: QueryStats):
+        settings = QueryBudgetSettings.from_env()
+        max_repeats = (
+            settings.max_repeats if self.max_repeats is None else self.max_repeats
+        )
+        problems = self.violations(stats, max_repeats)
+        if not problems:
+            return
+        statements = "\n".join(
+            f"  {statement[:STATEMENT_PREVIEW]}" for statement in stats.statements
+        )
+        message = (
+            f"{self.name or 'Query budget'}: {'; '.join(problems)}\n"
+            f"Statements:\n{statements}"
+        )
+        if settings.strict:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
@@ -0,0 +1,111 @@
+from typing import Any, Callable, Dict, List, Tuple, Type
+
+from flask import Response, request
+from werkzeug.exceptions import BadRequest
+
+from agenda_api.parsing import build_command
+from agenda_api.serializers import json_response, serialize_status_changes
+from agenda_api.services import commands
+from agenda_api.services.results import BatchResult, ItemError, StatusChanges
+
+MAX_BATCH_SIZE = 10000
+
+
+def parse_batch(
+    command_type: Type[commands.Command],
+) -> Tuple[List[commands.Command], List[int], List[ItemError]]:
+    """
+    Build one command per item of the JSON array in the request body.
+
+    Returns the commands, the position of each one in the request and the
+    errors of the items that could not be parsed.
+    """
+    return build_batch(request.get_json(), command_type)
+
+
+def build_batch(
+    payload: Any, command_type: Type[commands.Command]
+) -> Tuple[List[commands.Command], List[int], List[ItemError]]:
+    """Same as parse_batch, from an already decoded body"""
+    if not isinstance(payload, list) or len(payload) > MAX_BATCH_SIZE:
+        raise BadRequest(f"Expected a JSON array of up to {MAX_BATCH_SIZE} items")
+    items, positions, errors = [], [], []
+    for index, item in enumerate(payload):
+        try:
+            items.append(build_command(command_type, item))
+            positions.append(index)
+        except (TypeError, ValueError) as error:
+            errors.append(ItemError(index, str(error)))
+    return items, positions, errors
+
+
+def batch_response(
+    result: BatchResult,
+    positions: List[int],
+    errors: List[ItemError],
+    serialize: Callable[[Any], Dict[str, Any]],
+) -> Tuple[Response, int]:
+    """
+    Report the created entities along with every failed item, indexed by
+    its position in the request
+    """
+    body, status = batch_body(result, positions, errors, serialize)
+    return json_response(body, status), status
+
+
+def batch_body(
+    result: BatchResult,
+    positions: List[int],
+    errors: List[ItemError],
+    serialize: Callable[[Any], Dict[str, Any]],
+) -> Tuple[Dict[str, Any], int]:
+    """The payload and status code of batch_response"""
+    errors = errors + [
+        ItemError(positions[error.index], error.message) for error in result.errors
+    ]
+    errors.sort(key=lambda error: error.index)
+    body = {
+        "created": [serialize(entity) for entity in result.created],
+        "errors": [
+            {"index": error.index, "message": error.message} for error in errors
+        ],
+    }
+    if not errors:
+        status = 201
+    elif result.created:
+        status = 207
+    else:
+        status = 400
+    return body, status
+
+
+def build_status_change(
+    payload: Any, command_type: Type[commands.Command]
+) -> commands.Command:
+    """A command changing the status of the `appointment_ids` of a body"""
+    if not isinstance(payload, dict):
+        raise BadRequest("Expected a JSON object")
+    ids, employee_id = payload.get("appointment_ids"), payload.get("employee_id")
+    if (
+        not isinstance(ids, list)
+        or len(ids) > MAX_BATCH_SIZE
+        or not all(isinstance(item, int) for item in ids)
+    ):
+        raise BadRequest(f"Expected appointment_ids, up to {MAX_BATCH_SIZE} ids")
+    if not isinstance(employee_id, int):
+        raise BadRequest("Expected the employee_id making the change")
+    return command_type(set(ids), employee_id)
+
+
+def status_change_body(result: StatusChanges) -> Tuple[Dict[str, Any], int]:
+    """
+    The changed and rejected appointment ids, with why each was rejected,
+    and the status code of the response
+    """
+    if not result.rejected:
+        status = 200
+    elif result.changed:
+        status = 207
+    else:
+        status = 400
+    return serialize_status_changes(result), status
@@ -0,0 +1,80 @@
+import hashlib
+from functools import wraps
+from typing import Dict, Iterable, Optional
+
+from flask import Response, current_app, make_response, request
+from werkzeug.http import parse_etags
+
+from agenda_api.adapters import versions
+from agenda_api.adapters.cache import LRUCache
+from agenda_api.resources._pagination import wants_stream
+from agenda_api.resources._uow import request_uow
+from agenda_api.settings import ResponseCacheSettings
+
+RESPONSE_CACHE_KEY = "agenda_response_cache"
+
+
+def make_etag(path: str, table_versions: Dict[str, int]) -> str:
+    """Identify the response of a path while the tables it reads are unchanged"""
+    key = repr((path, sorted(table_versions.items()))).encode()
+    return hashlib.blake2b(key, digest_size=12).hexdigest()
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    return parse_etags(if_none_match).contains(etag)
+
+
+def response_cache() -> Optional[LRUCache]:
+    """In memory responses of the application, keyed by their ETag"""
+    if RESPONSE_CACHE_KEY not in current_app.extensions:
+        settings = ResponseCacheSettings.from_env()
+        current_app.extensions[RESPONSE_CACHE_KEY] = (
+            LRUCache(settings.maxsize, settings.ttl) if settings.enabled else None
+        )
+    return current_app.extensions[RESPONSE_CACHE_KEY]
+
+
+def conditional(tables: Iterable[str]):
+    """
+    Give the responses of a list endpoint an ETag made of the versions of
+    the tables it reads. A request whose If-None-Match holds the current
+    one is answered with a 304, other requests for an unchanged list are
+    served from memory, neither running the view.
+    """
+    tables = tuple(tables)
+
+    def decorate(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if wants_stream():
+                return view(*args, **kwargs)
+            uow = request_uow()
+            table_versions = versions.get(uow.session.connection(), tables)
+            etag = make_etag(request.full_path, table_versions)
+            if etag_matches(request.headers.get("If-None-Match"), etag):
+                response = Response(status=304)
+            else:
+                cache = response_cache()
+                cached = cache.get(etag) if cache is not None else None
+                if cached is not None:
+                    body, headers = cached
+                    response = Response(body, headers=headers)
+                else:
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                    if cache is not None:
+                        headers = [
+                            (name, value)
+                            for name, value in response.headers
+                            if name != "Content-Length"
+                        ]
+                        cache.set(etag, (response.get_data(), headers))
+            response.set_etag(etag)
+            # Stored by the clients but revalidated on every use
+            response.headers["Cache-Control"] = "no-cache"
+            return response
+
+        return wrapper
+
+    return decorate
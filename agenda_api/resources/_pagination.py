@@ -0,0 +1,62 @@
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from flask import Response, request, stream_with_context
+from sqlalchemy.orm import Query
+
+from agenda_api.adapters.base import AbstractUnitOfWork
+from agenda_api.serializers import dumps, json_response
+from agenda_api.services.views import STREAM_BATCH_SIZE
+
+MAX_PAGE_SIZE = 1000
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def pagination_args() -> Tuple[Optional[int], Optional[int]]:
+    """
+    Read the keyset pagination parameters from the query string
+    """
+    limit = request.args.get("limit", type=int)
+    after = request.args.get("after", type=int)
+    if limit is not None:
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+    return limit, after
+
+
+def wants_stream() -> bool:
+    return request.args.get("stream", "").lower() in ("1", "true", "yes")
+
+
+def page_response(items: List[Dict[str, Any]], limit: Optional[int]) -> Response:
+    """
+    Build a JSON array response, advertising the cursor of the next page
+    when the current one is full
+    """
+    response = json_response(items)
+    if limit is not None and len(items) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = str(items[-1]["id"])
+    return response
+
+
+def stream_response(
+    uow: AbstractUnitOfWork,
+    query_factory: Callable[[], Union[Query, Iterable[Any]]],
+    serialize: Callable[[Any], Dict[str, Any]],
+) -> Response:
+    """
+    Stream a JSON array built from a query, fetching rows in batches so the
+    memory used does not grow with the size of the table. The factory may
+    also return rows it already fetches in batches, like views.stream. The
+    request, and with it its unit of work, lasts until the array is sent.
+    """
+
+    def generate():
+        yield b"["
+        rows = query_factory()
+        if isinstance(rows, Query):
+            rows = rows.yield_per(STREAM_BATCH_SIZE)
+        for index, entity in enumerate(rows):
+            separator = b"," if index else b""
+            yield separator + dumps(serialize(entity))
+        yield b"]"
+
+    return Response(stream_with_context(generate()), mimetype="application/json")
@@ -0,0 +1,60 @@
+"""
+Unit of work of a Flask request, kept on `flask.g` for the endpoints and
+decorators handling the request to share.
+
+Its session is only opened when a repository or the session itself is
+first used, so requests answered without the database never check out a
+connection. Safe methods get a read-only one. It is rolled back when the
+response is an error and committed otherwise, before the response is sent
+so a commit that fails is answered with its error. The session is closed
+when the app context is torn down.
+"""
+from typing import Optional
+
+from flask import Response, current_app, g, request
+
+from agenda_api.services.unitofwork import UnitOfWork, get_default_uow
+
+UOW_KEY = "agenda_uow"
+
+READ_ONLY_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+def request_uow() -> UnitOfWork:
+    """The unit of work of the current request, created on first use"""
+    uow = g.get(UOW_KEY)
+    if uow is None:
+        uow = get_default_uow(read_only=request.method in READ_ONLY_METHODS)
+        uow.__enter__()
+        setattr(g, UOW_KEY, uow)
+    return uow
+
+
+def finish_request_uow(response: Response) -> Response:
+    """
+    Commit what a successful request wrote, undo what a failed one did.
+    The error a commit raises replaces the response, through the error
+    handlers of the app.
+    """
+    uow = g.get(UOW_KEY)
+    if uow is None:
+        return response
+    if response.status_code >= 400:
+        uow.rollback()
+        return response
+    try:
+        uow.commit()
+    except Exception as error:
+        return current_app.make_response(current_app.handle_user_exception(error))
+    return response
+
+
+def end_request_uow(error: Optional[BaseException] = None):
+    """Close the unit of work, undoing writes a raised error left behind"""
+    uow = g.pop(UOW_KEY, None)
+    if uow is None:
+        return
+    try:
+        uow.rollback()
+    finally:
+        uow.__exit__(None, None, None)
@@ -0,0 +1,83 @@
+from datetime import date
+
+from flask import Blueprint, request
+from werkzeug.exceptions import BadRequest
+
+from agenda_api import domain
+from agenda_api.querybudget import QueryBudget
+from agenda_api.resources._batch import build_status_change, status_change_body
+from agenda_api.resources._pagination import (
+    page_response,
+    pagination_args,
+    stream_response,
+    wants_stream,
+)
+from agenda_api.resources._uow import request_uow
+from agenda_api.serializers import json_response, serialize_appointment
+from agenda_api.services import commands
+from agenda_api.services.handlers import cancel_appointments, complete_appointments
+from agenda_api.services.views import STREAM_BATCH_SIZE
+
+blueprint = Blueprint("appointments", __name__, url_prefix="/api")
+
+
+@blueprint.route("/appointments", methods=["GET"])
+@QueryBudget(3)
+def list_appointments():
+    """
+    List appointments filtered by `status`, `client_id`, scheduled `date` and
+    total price (`min_price`, `max_price`), paginated by id with the `limit`
+    and `after` parameters
+    """
+    status, day = request.args.get("status"), request.args.get("date")
+    try:
+        filters = {
+            "status": domain.AppointmentStatus(status) if status else None,
+            "client_id": request.args.get("client_id", type=int),
+            "day": date.fromisoformat(day) if day else None,
+            "min_price": request.args.get("min_price", type=int),
+            "max_price": request.args.get("max_price", type=int),
+        }
+    except ValueError as error:
+        raise BadRequest(str(error))
+    limit, after = pagination_args()
+    uow = request_uow()
+    if wants_stream():
+        return stream_response(
+            uow,
+            lambda: uow.appointments.find(
+                **filters, limit=limit, after=after, batch_size=STREAM_BATCH_SIZE
+            ),
+            serialize_appointment,
+        )
+    appointments = uow.appointments.find(**filters, limit=limit, after=after)
+    items = [serialize_appointment(appointment) for appointment in appointments]
+    return page_response(items, limit), 200
+
+
+@blueprint.route("/appointments:complete", methods=["POST"])
+def complete_appointments_endpoint():
+    """
+    Complete the appointments of `appointment_ids` on behalf of
+    `employee_id`, reporting those that could not be and why
+    """
+    cmd = build_status_change(request.get_json(), commands.CompleteAppointments)
+    return _change_statuses(complete_appointments, cmd)
+
+
+@blueprint.route("/appointments:cancel", methods=["POST"])
+def cancel_appointments_endpoint():
+    """
+    Cancel the appointments of `appointment_ids` on behalf of `employee_id`,
+    reporting those that could not be and why
+    """
+    cmd = build_status_change(request.get_json(), commands.CancelAppointments)
+    return _change_statuses(cancel_appointments, cmd)
+
+
+def _change_statuses(handler, cmd: commands.Command):
+    uow = request_uow()
+    result = handler(uow, cmd)
+    uow.commit()
+    body, status = status_change_body(result)
+    return json_response(body, status), status
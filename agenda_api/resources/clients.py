@@ -1,24 +1,65 @@
-from dataclasses import asdict
+from flask import Blueprint, request
+from werkzeug.exceptions import BadRequest
 
-from flask import Blueprint, jsonify, request
-
-from agenda_api.services import commands
-from agenda_api.services.handlers import create_client
-from agenda_api.services.unitofwork import get_default_uow
+from agenda_api.adapters.repositories import SEARCH_LIMIT
+from agenda_api.querybudget import QueryBudget
+from agenda_api.resources._batch import batch_response, parse_batch
+from agenda_api.resources._pagination import (
+    page_response,
+    pagination_args,
+    stream_response,
+    wants_stream,
+)
+from agenda_api.resources._uow import request_uow
+from agenda_api.serializers import (
+    json_response,
+    serialize_client,
+    serialize_client_view,
+)
+from agenda_api.services import commands, views
+from agenda_api.services.handlers import create_client, create_clients
 
 blueprint = Blueprint("clients", __name__, url_prefix="/api")
 
+MAX_SEARCH_LIMIT = 100
+
 
 @blueprint.route("/clients", methods=["GET"])
+@QueryBudget(1)
 def list_clients():
     """
-    List all clients
+    List clients, paginated by id with the `limit` and `after` parameters
+    """
+    limit, after = pagination_args()
+    uow = request_uow()
+    if wants_stream():
+        return stream_response(
+            uow,
+            lambda: views.stream(uow, views.ClientView, limit=limit, after=after),
+            serialize_client_view,
+        )
+    rows = views.page(uow, views.ClientView, limit=limit, after=after)
+    items = [serialize_client_view(row) for row in rows]
+    return page_response(items, limit), 200
+
+
+@blueprint.route("/clients/search", methods=["GET"])
+@QueryBudget(1)
+def search_clients():
+    """
+    Find clients by the start of their first, last or full name given in
+    `q`. With `fuzzy`, misspelled names or names containing `q` match too
     """
-    uow = get_default_uow()
-    with uow:
-        clients = uow.clients.filter()
-        items = [asdict(client) for client in clients]
-    return jsonify(items), 200
+    term = request.args.get("q", "").strip()
+    if not term:
+        raise BadRequest("Expected a name to search in q")
+    fuzzy = request.args.get("fuzzy", "").lower() in ("1", "true", "yes")
+    limit = request.args.get("limit", SEARCH_LIMIT, type=int)
+    uow = request_uow()
+    clients = uow.clients.search(
+        term, fuzzy=fuzzy, limit=max(1, min(limit, MAX_SEARCH_LIMIT))
+    )
+    return json_response([serialize_client(client) for client in clients])
 
 
 @blueprint.route("/clients", methods=["POST"])
@@ -26,9 +67,20 @@ def create_client_endpoint():
     """
     Create a new client
     """
-    uow = get_default_uow()
-    with uow:
-        cmd = commands.CreateClient(**request.json)
-        client = create_client(uow, cmd)
-        uow.commit()
-        return jsonify(client), 201
+    uow = request_uow()
+    cmd = commands.CreateClient(**request.json)
+    client = create_client(uow, cmd)
+    uow.commit()
+    return json_response(serialize_client(client), 201)
+
+
+@blueprint.route("/clients:batch", methods=["POST"])
+def create_clients_endpoint():
+    """
+    Create clients in bulk, reporting the items that failed
+    """
+    items, positions, errors = parse_batch(commands.CreateClient)
+    uow = request_uow()
+    result = create_clients(uow, commands.CreateClients(tuple(items)))
+    uow.commit()
+    return batch_response(result, positions, errors, serialize_client)
@@ -0,0 +1,86 @@
+from typing import Any, Dict
+
+from flask import Blueprint, request
+from werkzeug.exceptions import BadRequest
+
+from agenda_api.parsing import build_command
+from agenda_api.resources._batch import MAX_BATCH_SIZE
+from agenda_api.resources._uow import request_uow
+from agenda_api.serializers import SERIALIZERS, json_response
+from agenda_api.services import commands, messagebus
+from agenda_api.services.results import BatchResult, DispatchResult
+
+blueprint = Blueprint("commands", __name__, url_prefix="/api")
+
+COMMAND_TYPES = {command.__name__: command for command in messagebus.HANDLERS}
+
+
+@blueprint.route("/commands", methods=["POST"])
+def dispatch_commands():
+    """
+    Run a list of commands in a single transaction. The body holds the
+    `commands`, each with its `type` and fields, and the `mode`: `atomic`
+    (the default) or `best_effort`
+    """
+    payload = request.get_json()
+    if not isinstance(payload, dict) or not isinstance(payload.get("commands"), list):
+        raise BadRequest("Expected a JSON object with a list of commands")
+    if len(payload["commands"]) > MAX_BATCH_SIZE:
+        raise BadRequest(f"Expected up to {MAX_BATCH_SIZE} commands")
+    try:
+        mode = messagebus.Mode(payload.get("mode", messagebus.Mode.ATOMIC))
+    except ValueError as error:
+        raise BadRequest(str(error))
+    cmds = []
+    for index, item in enumerate(payload["commands"]):
+        try:
+            cmds.append(parse_command(item))
+        except (TypeError, ValueError) as error:
+            raise BadRequest(f"Invalid command {index}: {error}")
+    uow = request_uow()
+    outcome = messagebus.dispatch(uow, cmds, mode)
+    status = outcome_status(outcome)
+    return json_response(serialize_outcome(outcome), status), status
+
+
+def parse_command(item: Any) -> commands.Command:
+    if not isinstance(item, dict) or item.get("type") not in COMMAND_TYPES:
+        raise ValueError(f"type must be one of {', '.join(sorted(COMMAND_TYPES))}")
+    fields = dict(item)
+    return build_command(COMMAND_TYPES[fields.pop("type")], fields)
+
+
+def serialize_result(value: Any) -> Any:
+    if isinstance(value, BatchResult):
+        return {
+            "created": [serialize_result(entity) for entity in value.created],
+            "errors": [
+                {"index": error.index, "message": error.message}
+                for error in value.errors
+            ],
+        }
+    if type(value) in SERIALIZERS:
+        return SERIALIZERS.serialize(value)
+    return None
+
+
+def serialize_outcome(outcome: DispatchResult) -> Dict[str, Any]:
+    return {
+        "committed": outcome.committed,
+        "results": [
+            {
+                "index": index,
+                "type": type(result.command).__name__,
+                "status": result.status.value,
+                "result": serialize_result(result.result),
+                "error": result.error,
+            }
+            for index, result in enumerate(outcome.results)
+        ],
+    }
+
+
+def outcome_status(outcome: DispatchResult) -> int:
+    if not outcome.committed:
+        return 400
+    return 207 if outcome.failed else 200
@@ -1,24 +1,49 @@
-from dataclasses import asdict
+from datetime import datetime, timedelta
 
 from flask import Blueprint, jsonify, request
 
-from agenda_api.services import commands
-from agenda_api.services.handlers import create_employee
-from agenda_api.services.unitofwork import get_default_uow
+from agenda_api.querybudget import QueryBudget
+from agenda_api.resources._batch import batch_response, parse_batch
+from agenda_api.resources._conditional import conditional
+from agenda_api.resources._pagination import (
+    page_response,
+    pagination_args,
+    stream_response,
+    wants_stream,
+)
+from agenda_api.resources._uow import request_uow
+from agenda_api.serializers import (
+    json_response,
+    serialize_employee,
+    serialize_employee_view,
+)
+from agenda_api.services import commands, views
+from agenda_api.services.availability import find_next_slot
+from agenda_api.services.handlers import create_employee, create_employees
 
 blueprint = Blueprint("employees", __name__, url_prefix="/api")
 
+MAX_SLOT_SEARCH_DAYS = 31
+
 
 @blueprint.route("/employees", methods=["GET"])
+@conditional(["employees"])
+@QueryBudget(1)
 def list_employees():
     """
-    List all employees
+    List employees, paginated by id with the `limit` and `after` parameters
     """
-    uow = get_default_uow()
-    with uow:
-        employees = uow.employees.filter()
-        items = [asdict(employee) for employee in employees]
-    return jsonify(items), 200
+    limit, after = pagination_args()
+    uow = request_uow()
+    if wants_stream():
+        return stream_response(
+            uow,
+            lambda: views.stream(uow, views.EmployeeView, limit=limit, after=after),
+            serialize_employee_view,
+        )
+    rows = views.page(uow, views.EmployeeView, limit=limit, after=after)
+    items = [serialize_employee_view(row) for row in rows]
+    return page_response(items, limit), 200
 
 
 @blueprint.route("/employees", methods=["POST"])
@@ -26,9 +51,46 @@ def create_employee_endpoint():
     """
     Create a new employee
     """
-    uow = get_default_uow()
-    with uow:
-        cmd = commands.CreateEmployee(**request.json)
-        employee = create_employee(uow, cmd)
-        uow.commit()
-        return jsonify(employee), 201
+    uow = request_uow()
+    cmd = commands.CreateEmployee(**request.json)
+    employee = create_employee(uow, cmd)
+    uow.commit()
+    return json_response(serialize_employee(employee), 201)
+
+
+@blueprint.route("/employees:batch", methods=["POST"])
+def create_employees_endpoint():
+    """
+    Create employees in bulk, reporting the items that failed
+    """
+    items, positions, errors = parse_batch(commands.CreateEmployee)
+    uow = request_uow()
+    result = create_employees(uow, commands.CreateEmployees(tuple(items)))
+    uow.commit()
+    return batch_response(result, positions, errors, serialize_employee)
+
+
+@blueprint.route("/employees/next-slot", methods=["GET"])
+@blueprint.route("/employees/<int:employee_id>/next-slot", methods=["GET"])
+def next_slot_endpoint(employee_id=None):
+    """
+    Find the next free slot lasting `duration` minutes, starting from `after`
+    and searching up to `days` days
+    """
+    duration = timedelta(minutes=request.args.get("duration", 60, type=int))
+    after = request.args.get("after", type=datetime.fromisoformat) or datetime.now()
+    days = max(1, min(request.args.get("days", 7, type=int), MAX_SLOT_SEARCH_DAYS))
+    uow = request_uow()
+    slot = find_next_slot(uow, duration, after, employee_id=employee_id, days=days)
+    if not slot:
+        return jsonify({"message": "No free slot found"}), 404
+    return (
+        jsonify(
+            {
+                "employee_id": slot.employee_id,
+                "start": slot.start.isoformat(),
+                "end": slot.end.isoformat(),
+            }
+        ),
+        200,
+    )
@@ -0,0 +1,61 @@
+from datetime import date
+from typing import Any, Dict, Optional
+
+from flask import Blueprint, request
+from werkzeug.exceptions import BadRequest
+
+from agenda_api.adapters import rollups
+from agenda_api.adapters.base import AbstractUnitOfWork
+from agenda_api.querybudget import QueryBudget
+from agenda_api.resources._uow import request_uow
+from agenda_api.serializers import json_response, serialize_daily_revenue
+
+blueprint = Blueprint("reports", __name__, url_prefix="/api")
+
+MAX_REPORT_DAYS = 366
+
+
+def report_period(start: Optional[str], end: Optional[str]):
+    """The first and last days of a report, both required and included"""
+    if not start or not end:
+        raise BadRequest("Expected the start and end dates of the report")
+    try:
+        first, last = date.fromisoformat(start), date.fromisoformat(end)
+    except ValueError as error:
+        raise BadRequest(str(error))
+    if first > last:
+        raise BadRequest("The start of the report must not be after its end")
+    if (last - first).days >= MAX_REPORT_DAYS:
+        raise BadRequest(f"Reports cover at most {MAX_REPORT_DAYS} days")
+    return first, last
+
+
+def revenue_report(
+    uow: AbstractUnitOfWork,
+    start: date,
+    end: date,
+    employee_id: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Body of the revenue report, read from the daily rollup only"""
+    rows = rollups.report(uow.session.connection(), start, end, employee_id)
+    return {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "days": [serialize_daily_revenue(row) for row in rows],
+        "total": {
+            name: sum(getattr(row, name) for row in rows) for name in rollups.COUNTERS
+        },
+    }
+
+
+@blueprint.route("/reports/revenue", methods=["GET"])
+@QueryBudget(1)
+def revenue_report_endpoint():
+    """
+    Completed and canceled appointments and revenue per employee and day,
+    from `start` to `end`, optionally for a single `employee_id`
+    """
+    start, end = report_period(request.args.get("start"), request.args.get("end"))
+    employee_id = request.args.get("employee_id", type=int)
+    uow = request_uow()
+    return json_response(revenue_report(uow, start, end, employee_id))
@@ -1,26 +1,48 @@
-from dataclasses import asdict
-from typing import TypedDict
+from flask import Blueprint, request
 
-from flask import Blueprint, jsonify, request
-
-from agenda_api import domain
-from agenda_api.services import commands
-from agenda_api.services.handlers import create_employee, create_service
-from agenda_api.services.unitofwork import get_default_uow
+from agenda_api.querybudget import QueryBudget
+from agenda_api.resources._batch import batch_response, parse_batch
+from agenda_api.resources._conditional import conditional
+from agenda_api.resources._pagination import (
+    page_response,
+    pagination_args,
+    stream_response,
+    wants_stream,
+)
+from agenda_api.resources._uow import request_uow
+from agenda_api.serializers import (
+    json_response,
+    serialize_service,
+    serialize_service_view,
+)
+from agenda_api.services import commands, views
+from agenda_api.services.handlers import (
+    create_employee,
+    create_service,
+    create_services,
+)
 
 blueprint = Blueprint("services", __name__, url_prefix="/api")
 
 
 @blueprint.route("/services", methods=["GET"])
+@conditional(["services"])
+@QueryBudget(1)
 def list_services():
     """
-    List all services
+    List services, paginated by id with the `limit` and `after` parameters
     """
-    uow = get_default_uow()
-    with uow:
-        services = uow.services.filter()
-        items = [serialize_service(s) for s in services]
-    return jsonify(items), 200
+    limit, after = pagination_args()
+    uow = request_uow()
+    if wants_stream():
+        return stream_response(
+            uow,
+            lambda: views.stream(uow, views.ServiceView, limit=limit, after=after),
+            serialize_service_view,
+        )
+    rows = views.page(uow, views.ServiceView, limit=limit, after=after)
+    items = [serialize_service_view(row) for row in rows]
+    return page_response(items, limit), 200
 
 
 @blueprint.route("/services", methods=["POST"])
@@ -28,24 +50,20 @@ def create_service_endpoint():
     """
     Create a new service
     """
-    uow = get_default_uow()
-    with uow:
-        cmd = commands.CreateService(**request.json)
-        svc = create_service(uow, cmd)
-        uow.commit()
-        return jsonify(serialize_service(svc)), 201
-
-
-class ServiceResponse(TypedDict):
-    id: str
-    name: str
-    duration: str
-
-
-def serialize_service(service: domain.Service) -> ServiceResponse:
-    return {
-        "id": service.id,
-        "name": service.name,
-        "price": service.price,
-        "duration": str(service.duration),
-    }
+    uow = request_uow()
+    cmd = commands.CreateService(**request.json)
+    svc = create_service(uow, cmd)
+    uow.commit()
+    return json_response(serialize_service(svc), 201)
+
+
+@blueprint.route("/services:batch", methods=["POST"])
+def create_services_endpoint():
+    """
+    Create services in bulk, reporting the items that failed
+    """
+    items, positions, errors = parse_batch(commands.CreateService)
+    uow = request_uow()
+    result = create_services(uow, commands.CreateServices(tuple(items)))
+    uow.commit()
+    return batch_response(result, positions, errors, serialize_service)
@@ -0,0 +1,148 @@
+"""
+Response serializers of the domain classes.
+
+The fields of a class are inspected once, when it is registered, and turned
+into a flat function building its dictionary, rather than walking the
+fields of every object as dataclasses.asdict does. Dataclasses and the
+named tuples of the read models are supported. Datetimes are written in
+ISO format, durations as strings, enums by value and sets of entities are
+ordered by id.
+
+The bodies are encoded with orjson when it is installed, the standard json
+module otherwise.
+"""
+import enum
+import json
+import re
+from dataclasses import fields, is_dataclass
+from datetime import date, datetime, timedelta
+from operator import attrgetter
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Tuple,
+    Union,
+    get_args,
+    get_origin,
+    get_type_hints,
+)
+
+from flask import Response
+
+from agenda_api import domain
+from agenda_api.adapters import rollups
+from agenda_api.services import results, views
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+JSON_BACKEND = "orjson" if orjson is not None else "json"
+
+Serializer = Callable[[Any], Dict[str, Any]]
+
+_COLLECTIONS = (list, set, frozenset, tuple)
+
+
+def _field_names(cls: type) -> Tuple[str, ...]:
+    if is_dataclass(cls):
+        return tuple(field.name for field in fields(cls))
+    if issubclass(cls, tuple) and hasattr(cls, "_fields"):
+        return cls._fields
+    raise TypeError(f"Cannot compile a serializer for {cls.__name__}")
+
+
+def _unwrap_optional(hint) -> Tuple[Any, bool]:
+    if get_origin(hint) is Union:
+        args = [arg for arg in get_args(hint) if arg is not type(None)]
+        if len(args) == 1:
+            return args[0], True
+    return hint, False
+
+
+class SerializerRegistry:
+    def __init__(self):
+        self._serializers: Dict[type, Serializer] = {}
+
+    def register(self, cls: type) -> Serializer:
+        """Compile the serializer of a dataclass or named tuple, once"""
+        if cls not in self._serializers:
+            self._serializers[cls] = self._compile(cls)
+        return self._serializers[cls]
+
+    def __contains__(self, cls: type) -> bool:
+        return cls in self._serializers
+
+    def serialize(self, obj: Any) -> Dict[str, Any]:
+        return self.register(type(obj))(obj)
+
+    def _compile(self, cls: type) -> Serializer:
+        names = _field_names(cls)
+        hints = get_type_hints(cls)
+        namespace: Dict[str, Any] = {}
+        entries = [
+            f"{name!r}: " + self._expression(name, hints[name], namespace)
+            for name in names
+        ]
+        name = "serialize_" + re.sub(r"(?<!^)(?=[A-Z])", "_", cls.__name__).lower()
+        source = f"def {name}(obj):\n    return {{{', '.join(entries)}}}\n"
+        exec(compile(source, f"<serializer {cls.__qualname__}>", "exec"), namespace)
+        serializer = namespace[name]
+        serializer.__source__ = source
+        return serializer
+
+    def _expression(self, name: str, hint, namespace: Dict[str, Any]) -> str:
+        """The Python expression converting field `name` of `obj`"""
+        hint, optional = _unwrap_optional(hint)
+        value = f"obj.{name}"
+        origin = get_origin(hint)
+        if isinstance(hint, type) and issubclass(hint, (datetime, date)):
+            converted = "{}.isoformat()"
+        elif hint is timedelta:
+            converted = "str({})"
+        elif isinstance(hint, type) and issubclass(hint, enum.Enum):
+            converted = "{}.value"
+        elif is_dataclass(hint):
+            namespace[f"_{name}"] = self.register(hint)
+            converted = f"_{name}({{}})"
+        elif origin in _COLLECTIONS and is_dataclass(get_args(hint)[0]):
+            item_type = get_args(hint)[0]
+            namespace[f"_{name}"] = self.register(item_type)
+            items = "{}"
+            if origin in (set, frozenset) and "id" in _field_names(item_type):
+                # Sets have no order of their own, keep the responses stable
+                namespace["_by_id"] = attrgetter("id")
+                items = "sorted({}, key=_by_id)"
+            converted = f"[_{name}(item) for item in {items}]"
+        else:
+            return value
+        if optional:
+            return (
+                f"(None if (value := {value}) is None else {converted.format('value')})"
+            )
+        return converted.format(value)
+
+
+SERIALIZERS = SerializerRegistry()
+
+serialize_employee = SERIALIZERS.register(domain.Employee)
+serialize_client = SERIALIZERS.register(domain.Client)
+serialize_service = SERIALIZERS.register(domain.Service)
+serialize_appointment = SERIALIZERS.register(domain.Appointment)
+serialize_employee_view = SERIALIZERS.register(views.EmployeeView)
+serialize_client_view = SERIALIZERS.register(views.ClientView)
+serialize_service_view = SERIALIZERS.register(views.ServiceView)
+serialize_daily_revenue = SERIALIZERS.register(rollups.DailyRevenue)
+serialize_status_changes = SERIALIZERS.register(results.StatusChanges)
+
+
+def dumps(data: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(",", ":")).encode()
+
+
+def json_response(data: Any, status: int = 200) -> Response:
+    return Response(dumps(data), status, mimetype="application/json")
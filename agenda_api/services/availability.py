@@ -0,0 +1,201 @@
+from bisect import bisect_right
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from agenda_api.adapters.base import AbstractUnitOfWork
+from agenda_api.services.errors import EntityNotFound
+
+Interval = Tuple[datetime, datetime]
+
+
+@dataclass(frozen=True)
+class Slot:
+    employee_id: int
+    start: datetime
+    end: datetime
+
+
+class EmployeeSchedule:
+    """
+    Free gaps left between the busy intervals of one employee in a window.
+
+    Gap lengths are kept in a max segment tree, so the first gap that fits
+    a duration is found in O(log n) instead of walking every appointment.
+    """
+
+    def __init__(
+        self, window_start: datetime, window_end: datetime, busy: Iterable[Interval]
+    ):
+        self.window_start = window_start
+        self.window_end = window_end
+        self._starts: List[datetime] = []
+        self._ends: List[datetime] = []
+        cursor = window_start
+        for start, end in sorted(busy):
+            if start > cursor:
+                self._add_gap(cursor, min(start, window_end))
+            cursor = max(cursor, end)
+            if cursor >= window_end:
+                break
+        if cursor < window_end:
+            self._add_gap(cursor, window_end)
+        self._build_tree()
+
+    def _add_gap(self, start: datetime, end: datetime):
+        if end > start:
+            self._starts.append(start)
+            self._ends.append(end)
+
+    def _build_tree(self):
+        self._size = 1
+        while self._size < len(self._starts):
+            self._size *= 2
+        self._tree = [timedelta.min] * (2 * self._size)
+        for index, (start, end) in enumerate(zip(self._starts, self._ends)):
+            self._tree[self._size + index] = end - start
+        for node in range(self._size - 1, 0, -1):
+            self._tree[node] = max(self._tree[2 * node], self._tree[2 * node + 1])
+
+    def _first_fitting(
+        self,
+        lower: int,
+        duration: timedelta,
+        node: int = 1,
+        left: int = 0,
+        right: Optional[int] = None,
+    ) -> Optional[int]:
+        """Index of the first gap at or after `lower` lasting at least `duration`"""
+        right = self._size if right is None else right
+        if right <= lower or self._tree[node] < duration:
+            return None
+        if right - left == 1:
+            return left
+        middle = (left + right) // 2
+        found = self._first_fitting(lower, duration, 2 * node, left, middle)
+        if found is None:
+            found = self._first_fitting(lower, duration, 2 * node + 1, middle, right)
+        return found
+
+    @property
+    def gaps(self) -> List[Interval]:
+        return list(zip(self._starts, self._ends))
+
+    def next_slot(
+        self, duration: timedelta, not_before: Optional[datetime] = None
+    ) -> Optional[datetime]:
+        """Start of the earliest free slot lasting `duration`"""
+        not_before = max(not_before or self.window_start, self.window_start)
+        index = bisect_right(self._ends, not_before)
+        if index == len(self._ends):
+            return None
+        start = max(self._starts[index], not_before)
+        if self._ends[index] - start >= duration:
+            return start
+        found = self._first_fitting(index + 1, duration)
+        return None if found is None else self._starts[found]
+
+
+class AvailabilityIndex:
+    """
+    Schedules of every employee for a single window, built once from the
+    appointments booked in it and then queried as many times as needed.
+
+    Indexes are not kept between searches: bookings change with every
+    write, so each search loads the bookings of the days it looks at.
+    """
+
+    def __init__(
+        self,
+        window_start: datetime,
+        window_end: datetime,
+        employee_ids: Iterable[int],
+        bookings: Iterable[Tuple[int, datetime, datetime]] = (),
+    ):
+        self.window_start = window_start
+        self.window_end = window_end
+        busy: Dict[int, List[Interval]] = defaultdict(list)
+        for employee_id, start, end in bookings:
+            busy[employee_id].append((start, end))
+        self._schedules = {
+            employee_id: EmployeeSchedule(window_start, window_end, busy[employee_id])
+            for employee_id in employee_ids
+        }
+
+    @classmethod
+    def for_day(
+        cls,
+        uow: AbstractUnitOfWork,
+        day: date,
+        employee_ids: Optional[Iterable[int]] = None,
+        opens_at: time = time.min,
+        closes_at: Optional[time] = None,
+    ) -> "AvailabilityIndex":
+        window_start = datetime.combine(day, opens_at)
+        window_end = (
+            datetime.combine(day, closes_at)
+            if closes_at
+            else datetime.combine(day + timedelta(days=1), time.min)
+        )
+        if employee_ids is None:
+            employee_ids = [employee.id for employee in uow.employees.filter()]
+        appointments = uow.appointments.overlapping(
+            window_start, window_end, employee_ids
+        )
+        bookings = [
+            (appointment.employee_id, appointment.scheduled_at, appointment.ends_at)
+            for appointment in appointments
+        ]
+        return cls(window_start, window_end, employee_ids, bookings)
+
+    def schedule(self, employee_id: int) -> EmployeeSchedule:
+        return self._schedules[employee_id]
+
+    def next_slot(
+        self,
+        employee_id: int,
+        duration: timedelta,
+        not_before: Optional[datetime] = None,
+    ) -> Optional[Slot]:
+        start = self._schedules[employee_id].next_slot(duration, not_before)
+        if start is None:
+            return None
+        return Slot(employee_id=employee_id, start=start, end=start + duration)
+
+    def first_available(
+        self, duration: timedelta, not_before: Optional[datetime] = None
+    ) -> Optional[Slot]:
+        """Earliest slot across every employee in the index"""
+        slots = [
+            self.next_slot(employee_id, duration, not_before)
+            for employee_id in self._schedules
+        ]
+        slots = [slot for slot in slots if slot]
+        return min(slots, key=lambda slot: slot.start, default=None)
+
+
+def find_next_slot(
+    uow: AbstractUnitOfWork,
+    duration: timedelta,
+    not_before: datetime,
+    employee_id: Optional[int] = None,
+    days: int = 7,
+) -> Optional[Slot]:
+    """
+    Search day by day for the next free slot of an employee, or of any
+    employee when none is given. Every day searched costs a query and an
+    index build, so callers should bound `days`.
+    """
+    employee_ids = None
+    if employee_id is not None:
+        if not uow.employees.get(employee_id):
+            raise EntityNotFound(f"Employee with id {employee_id} not found")
+        employee_ids = [employee_id]
+    for offset in range(days):
+        day = not_before.date() + timedelta(days=offset)
+        index = AvailabilityIndex.for_day(uow, day, employee_ids)
+        slot = index.first_available(duration, not_before)
+        if slot:
+            return slot
+    return None
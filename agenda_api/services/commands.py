@@ -1,6 +1,6 @@
 from dataclasses import dataclass
-from datetime import timedelta
-from typing import Optional, Set
+from datetime import datetime, timedelta
+from typing import Optional, Set, Tuple
 
 
 @dataclass(frozen=True)
@@ -27,19 +27,52 @@ class CreateService(Command):
     duration: Optional[timedelta] = None
 
 
+@dataclass(frozen=True)
+class CreateEmployees(Command):
+    items: Tuple[CreateEmployee, ...]
+
+
+@dataclass(frozen=True)
+class CreateClients(Command):
+    items: Tuple[CreateClient, ...]
+
+
+@dataclass(frozen=True)
+class CreateServices(Command):
+    items: Tuple[CreateService, ...]
+
+
 @dataclass(frozen=True)
 class CreateAppointment(Command):
     client_id: int
     service_ids: Set[int]
+    employee_id: Optional[int] = None
+    scheduled_at: Optional[datetime] = None
 
 
 @dataclass(frozen=True)
 class CompleteAppointment(Command):
     appointment_id: int
     employee_id: int
+    # The version the caller last saw, rejected when it is no longer current
+    version: Optional[int] = None
 
 
 @dataclass(frozen=True)
 class CancelAppointment(Command):
     appointment_id: int
     employee_id: int
+    # The version the caller last saw, rejected when it is no longer current
+    version: Optional[int] = None
+
+
+@dataclass(frozen=True)
+class CompleteAppointments(Command):
+    appointment_ids: Set[int]
+    employee_id: int
+
+
+@dataclass(frozen=True)
+class CancelAppointments(Command):
+    appointment_ids: Set[int]
+    employee_id: int
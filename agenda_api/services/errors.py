@@ -4,3 +4,8 @@ from dataclasses import dataclass
 @dataclass
 class EntityNotFound(Exception):
     message: str = "Entity not found"
+
+
+@dataclass
+class UnknownCommand(Exception):
+    message: str = "Unknown command"
@@ -1,9 +1,19 @@
 from dataclasses import asdict
+from datetime import datetime
+from typing import Iterable, Optional, Type
 
 from agenda_api import domain
-from agenda_api.adapters.base import AbstractUnitOfWork
+from agenda_api.adapters import rollups
+from agenda_api.adapters.base import AbstractRepository, AbstractUnitOfWork
+from agenda_api.domain.errors import (
+    AppointmentConflict,
+    AppointmentError,
+    ServiceError,
+    StaleAppointment,
+)
 from agenda_api.services import commands
 from agenda_api.services.errors import EntityNotFound
+from agenda_api.services.results import BatchResult, ItemError, Rejection, StatusChanges
 
 
 def create_employee(uow: AbstractUnitOfWork, cmd: commands.Command):
@@ -24,15 +34,59 @@ def create_service(uow: AbstractUnitOfWork, cmd: commands.Command):
     return service
 
 
+def create_employees(uow: AbstractUnitOfWork, cmd: commands.CreateEmployees):
+    return _create_batch(uow.employees, domain.Employee, cmd.items)
+
+
+def create_clients(uow: AbstractUnitOfWork, cmd: commands.CreateClients):
+    return _create_batch(uow.clients, domain.Client, cmd.items)
+
+
+def create_services(uow: AbstractUnitOfWork, cmd: commands.CreateServices):
+    return _create_batch(uow.services, domain.Service, cmd.items)
+
+
+def _create_batch(
+    repository: AbstractRepository, model: Type, items: Iterable[commands.Command]
+) -> BatchResult:
+    result = BatchResult()
+    for index, item in enumerate(items):
+        try:
+            result.created.append(model(**asdict(item)))
+        except ServiceError as error:
+            result.errors.append(ItemError(index, error.message))
+        except (TypeError, ValueError) as error:
+            result.errors.append(ItemError(index, str(error)))
+    repository.bulk_save(result.created)
+    return result
+
+
 def create_appointment(uow: AbstractUnitOfWork, cmd: commands.CreateAppointment):
     client = uow.clients.filter(id=cmd.client_id).first()
     if not client:
         raise EntityNotFound(f"Client with id {cmd.client_id} not found")
-    services = uow.services.filter(ids=cmd.service_ids).all()
+    services = uow.services.get_many(cmd.service_ids)
     if len(services) < len(cmd.service_ids):
         raise EntityNotFound("Services not found")
-    appointment = domain.Appointment(client_id=cmd.client_id, services=set(services))
+    if cmd.employee_id is not None and not uow.employees.get(cmd.employee_id):
+        raise EntityNotFound(f"Employee with id {cmd.employee_id} not found")
+    appointment = domain.Appointment(
+        client_id=cmd.client_id,
+        services=set(services),
+        employee_id=cmd.employee_id,
+        scheduled_at=cmd.scheduled_at,
+    )
+    if appointment.employee_id is not None and appointment.scheduled_at:
+        conflict = uow.appointments.find_conflict(
+            appointment.employee_id, appointment.scheduled_at, appointment.ends_at
+        )
+        if conflict:
+            raise AppointmentConflict(
+                f"Employee with id {appointment.employee_id} is already booked "
+                f"by appointment {conflict.id}"
+            )
     uow.appointments.save(appointment)
+    return appointment
 
 
 def find_appointment(
@@ -44,12 +98,24 @@ def find_appointment(
     return appointment
 
 
+def check_version(appointment: domain.Appointment, version: Optional[int]):
+    """Reject a change made on a version of the appointment that is outdated"""
+    if version is not None and version != appointment.version:
+        raise StaleAppointment(
+            f"Appointment with id {appointment.id} is at version "
+            f"{appointment.version}, not {version}"
+        )
+
+
 def complete_appointment(uow: AbstractUnitOfWork, cmd: commands.CompleteAppointment):
     appointment = find_appointment(uow, cmd.appointment_id)
     employee = uow.employees.get(cmd.employee_id)
     if not employee:
         raise EntityNotFound(f"Employee with id {cmd.employee_id} not found")
+    check_version(appointment, cmd.version)
+    before = rollups.contribution(appointment)
     appointment.complete(employee)
+    rollups.record(uow.session, before, rollups.contribution(appointment))
 
 
 def cancel_appointment(uow: AbstractUnitOfWork, cmd: commands.CancelAppointment):
@@ -57,4 +123,76 @@ def cancel_appointment(uow: AbstractUnitOfWork, cmd: commands.CancelAppointment)
     employee = uow.employees.get(cmd.employee_id)
     if not employee:
         raise EntityNotFound(f"Employee with id {cmd.employee_id} not found")
+    check_version(appointment, cmd.version)
+    before = rollups.contribution(appointment)
     appointment.cancel(employee)
+    rollups.record(uow.session, before, rollups.contribution(appointment))
+
+
+def complete_appointments(
+    uow: AbstractUnitOfWork, cmd: commands.CompleteAppointments
+) -> StatusChanges:
+    return _change_statuses(
+        uow, cmd.appointment_ids, cmd.employee_id, domain.AppointmentStatus.COMPLETED
+    )
+
+
+def cancel_appointments(
+    uow: AbstractUnitOfWork, cmd: commands.CancelAppointments
+) -> StatusChanges:
+    return _change_statuses(
+        uow, cmd.appointment_ids, cmd.employee_id, domain.AppointmentStatus.CANCELED
+    )
+
+
+def _change_statuses(
+    uow: AbstractUnitOfWork,
+    ids: Iterable[int],
+    employee_id: int,
+    status: domain.AppointmentStatus,
+) -> StatusChanges:
+    """
+    Apply a status change to many appointments with one query validating
+    them against the rules of the domain and one UPDATE, whatever their
+    number. The appointments it does not apply to are reported, not raised.
+    """
+    employee = uow.employees.get(employee_id)
+    if not employee:
+        raise EntityNotFound(f"Employee with id {employee_id} not found")
+    result = StatusChanges()
+    rows = {row.id: row for row in uow.appointments.states(ids)}
+    updated_at = datetime.now()
+    versions, contributions = {}, []
+    for appointment_id in sorted(ids):
+        row = rows.get(appointment_id)
+        if row is None:
+            message = f"Appointment with id {appointment_id} not found"
+            result.rejected.append(Rejection(appointment_id, message))
+            continue
+        try:
+            domain.check_transition(row.status, status)
+        except AppointmentError as error:
+            result.rejected.append(Rejection(appointment_id, error.message))
+            continue
+        result.changed.append(appointment_id)
+        versions[appointment_id] = row.version
+        moment = row.scheduled_at or row.updated_at
+        contributions.append(
+            (
+                rollups.contribution_of(
+                    row.updated_by_id, row.status, moment, row.total_price
+                ),
+                rollups.contribution_of(
+                    employee.id, status, row.scheduled_at or updated_at, row.total_price
+                ),
+            )
+        )
+    if not result.changed:
+        return result
+    changed = uow.appointments.change_status(versions, status, employee.id, updated_at)
+    if changed != len(versions):
+        # Some were changed by another transaction since they were validated,
+        # the rollup deltas computed from them would be wrong
+        raise StaleAppointment()
+    rollups.record_all(uow.session, contributions)
+    return result
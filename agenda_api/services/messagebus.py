@@ -0,0 +1,78 @@
+import enum
+from typing import Any, Callable, Dict, Iterable, Type
+
+from agenda_api.adapters.base import AbstractUnitOfWork
+from agenda_api.domain.errors import AppointmentError, ServiceError
+from agenda_api.services import commands, handlers
+from agenda_api.services.errors import EntityNotFound, UnknownCommand
+from agenda_api.services.results import CommandResult, CommandStatus, DispatchResult
+
+Handler = Callable[[AbstractUnitOfWork, commands.Command], Any]
+
+HANDLERS: Dict[Type[commands.Command], Handler] = {
+    commands.CreateEmployee: handlers.create_employee,
+    commands.CreateClient: handlers.create_client,
+    commands.CreateService: handlers.create_service,
+    commands.CreateEmployees: handlers.create_employees,
+    commands.CreateClients: handlers.create_clients,
+    commands.CreateServices: handlers.create_services,
+    commands.CreateAppointment: handlers.create_appointment,
+    commands.CompleteAppointment: handlers.complete_appointment,
+    commands.CancelAppointment: handlers.cancel_appointment,
+    commands.CompleteAppointments: handlers.complete_appointments,
+    commands.CancelAppointments: handlers.cancel_appointments,
+}
+
+# Errors reported on the command that raised them, anything else aborts
+COMMAND_ERRORS = (EntityNotFound, ServiceError, AppointmentError)
+
+
+class Mode(str, enum.Enum):
+    # Commit every command or none of them
+    ATOMIC = "atomic"
+    # Commit the commands that succeeded, each failure undone on its own
+    BEST_EFFORT = "best_effort"
+
+
+def handle(uow: AbstractUnitOfWork, cmd: commands.Command) -> Any:
+    """Run the handler of a command, leaving the commit to the caller"""
+    try:
+        handler = HANDLERS[type(cmd)]
+    except KeyError:
+        raise UnknownCommand(f"No handler for {type(cmd).__name__}")
+    return handler(uow, cmd)
+
+
+def dispatch(
+    uow: AbstractUnitOfWork,
+    cmds: Iterable[commands.Command],
+    mode: Mode = Mode.ATOMIC,
+) -> DispatchResult:
+    """
+    Run a list of commands, in order, in the entered unit of work and commit
+    them together. Each command is flushed as soon as it ran, so database
+    errors are reported on the command that caused them.
+    """
+    outcome = DispatchResult([CommandResult(cmd) for cmd in cmds])
+    for result in outcome.results:
+        try:
+            if mode is Mode.BEST_EFFORT:
+                with uow.savepoint():
+                    result.result = handle(uow, result.command)
+            else:
+                result.result = handle(uow, result.command)
+                uow.flush()
+        except COMMAND_ERRORS as error:
+            result.status = CommandStatus.FAILED
+            result.error = error.message
+            if mode is Mode.ATOMIC:
+                uow.rollback()
+                for done in outcome.results:
+                    if done.status is CommandStatus.DONE:
+                        done.status = CommandStatus.ROLLED_BACK
+                return outcome
+        else:
+            result.status = CommandStatus.DONE
+    uow.commit()
+    outcome.committed = True
+    return outcome
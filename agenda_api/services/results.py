@@ -0,0 +1,56 @@
+import enum
+from dataclasses import dataclass, field
+from typing import Any, List, Optional
+
+
+@dataclass(frozen=True)
+class ItemError:
+    index: int
+    message: str
+
+
+@dataclass
+class BatchResult:
+    created: List[Any] = field(default_factory=list)
+    errors: List[ItemError] = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class Rejection:
+    id: int
+    message: str
+
+
+@dataclass
+class StatusChanges:
+    """Ids of the appointments whose status changed, and of those left as is"""
+
+    changed: List[int] = field(default_factory=list)
+    rejected: List[Rejection] = field(default_factory=list)
+
+
+class CommandStatus(str, enum.Enum):
+    DONE = "done"
+    FAILED = "failed"
+    # Ran, then undone because another command of an atomic dispatch failed
+    ROLLED_BACK = "rolled_back"
+    # Not run because an earlier command of an atomic dispatch failed
+    SKIPPED = "skipped"
+
+
+@dataclass
+class CommandResult:
+    command: Any
+    status: CommandStatus = CommandStatus.SKIPPED
+    result: Any = None
+    error: Optional[str] = None
+
+
+@dataclass
+class DispatchResult:
+    results: List[CommandResult] = field(default_factory=list)
+    committed: bool = False
+
+    @property
+    def failed(self) -> List[CommandResult]:
+        return [r for r in self.results if r.status is CommandStatus.FAILED]
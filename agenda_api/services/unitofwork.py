@@ -1,49 +1,306 @@
-from typing import Callable
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
 
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
 
-from agenda_api.adapters.base import AbstractUnitOfWork
-from agenda_api.adapters.orm import DEFAULT_SESSION_FACTORY
+from agenda_api import domain
+from agenda_api.adapters.base import AbstractAsyncUnitOfWork, AbstractUnitOfWork
+from agenda_api.adapters.cache import CachedRepository, EntityCache, LRUCache
+from agenda_api.adapters.database import (
+    DEFAULT_ASYNC_SESSION_FACTORY,
+    DEFAULT_SESSION_FACTORY,
+    pin_to_primary,
+)
+from agenda_api.adapters.orm import APPOINTMENT_OVERLAP_CONSTRAINT
 from agenda_api.adapters.repositories import (
     AppointmentRepository,
+    AsyncAppointmentRepository,
+    AsyncClientRepository,
+    AsyncEmployeeRepository,
+    AsyncServiceRepository,
     ClientRepository,
     EmployeeRepository,
     ServiceRepository,
 )
+from agenda_api.domain import errors
+from agenda_api.settings import CacheSettings
+
+
+def _open_session(session_factory: Callable[[], Any], read_only: bool) -> Any:
+    # Factories without replicas, a bare sessionmaker, only have the primary
+    if read_only and hasattr(session_factory, "read_only"):
+        return session_factory.read_only()
+    return session_factory()
 
 
 class UnitOfWork(AbstractUnitOfWork):
-    def __init__(self, session_factory: Callable[[], Session]):
+    """
+    Unit of work on a session of `session_factory`, opened the first time it
+    or a repository is used. A read-only one reads from a replica when the
+    factory has some, writes still going to the primary.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        caches: Optional[Dict[str, EntityCache]] = None,
+        read_only: bool = False,
+    ):
         self._session_factory = session_factory
+        self._caches = caches or {}
+        self.read_only = read_only
+        self._session: Optional[Session] = None
+        self._repositories: Dict[str, Any] = {}
+
+    @classmethod
+    def over(
+        cls, session: Session, caches: Optional[Dict[str, EntityCache]] = None
+    ) -> "UnitOfWork":
+        """Unit of work on a session opened, and closed, by the caller"""
+        uow = cls(lambda: session, caches)
+        uow.session = session
+        return uow
+
+    @property
+    def session(self) -> Session:
+        if self._session is None:
+            self._session = _open_session(self._session_factory, self.read_only)
+            for cache in self._caches.values():
+                cache.track(self._session)
+        return self._session
+
+    @session.setter
+    def session(self, session: Session):
+        self._session = session
+        self._repositories = {}
+
+    @property
+    def opened(self) -> bool:
+        """Whether the session was used, there is nothing to end otherwise"""
+        return self._session is not None
+
+    def _repository(self, name: str):
+        # Built once per session, wrapped in the cache of its entities if any
+        if name not in self._repositories:
+            repository = REPOSITORIES[name](self.session)
+            cache = self._caches.get(name)
+            self._repositories[name] = (
+                CachedRepository(repository, cache) if cache else repository
+            )
+        return self._repositories[name]
 
     @property
     def employees(self):
-        return EmployeeRepository(self.session)
+        return self._repository("employees")
 
     @property
     def clients(self):
-        return ClientRepository(self.session)
+        return self._repository("clients")
 
     @property
     def services(self):
-        return ServiceRepository(self.session)
+        return self._repository("services")
 
     @property
     def appointments(self):
-        return AppointmentRepository(self.session)
+        return self._repository("appointments")
 
     def __enter__(self):
-        self.session = self._session_factory()
+        # Entered again, the session of the previous use must not leak
+        if self.opened:
+            self._session.close()
+        self.session = None
 
     def __exit__(self, *args):
-        self.session.close()
+        if self.opened:
+            self._session.close()
+            self.session = None
 
     def commit(self):
-        self.session.commit()
+        if not self.opened:
+            return
+        try:
+            self.session.commit()
+        except IntegrityError as error:
+            self.session.rollback()
+            _raise_for_integrity_error(error)
+        except StaleDataError as error:
+            self.session.rollback()
+            raise errors.StaleAppointment() from error
+        # Later reads of the request must see what was just written
+        pin_to_primary()
 
     def rollback(self):
-        self.session.rollback()
+        if self.opened:
+            self.session.rollback()
+
+    def flush(self):
+        if not self.opened:
+            return
+        try:
+            self.session.flush()
+        except IntegrityError as error:
+            _raise_for_integrity_error(error)
+        except StaleDataError as error:
+            raise errors.StaleAppointment() from error
+
+    @contextmanager
+    def savepoint(self) -> Iterator[None]:
+        savepoint = self.session.begin_nested()
+        try:
+            yield
+            self.flush()
+        except Exception:
+            savepoint.rollback()
+            raise
+        savepoint.commit()
+
+
+REPOSITORIES = {
+    "employees": EmployeeRepository,
+    "clients": ClientRepository,
+    "services": ServiceRepository,
+    "appointments": AppointmentRepository,
+}
+
+
+class AsyncUnitOfWork(AbstractAsyncUnitOfWork):
+    """
+    Unit of work on an AsyncSession, opened the first time it is used. The
+    service handlers are shared with UnitOfWork: `run` hands them a
+    synchronous view of the same session, executed in a greenlet so their
+    queries still yield to the event loop.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        caches: Optional[Dict[str, EntityCache]] = None,
+        read_only: bool = False,
+    ):
+        self._session_factory = session_factory
+        self._caches = caches or {}
+        self.read_only = read_only
+        self._session: Optional[AsyncSession] = None
+        self._repositories: Dict[str, Any] = {}
+
+    @property
+    def session(self) -> AsyncSession:
+        if self._session is None:
+            self._session = _open_session(self._session_factory, self.read_only)
+            for cache in self._caches.values():
+                cache.track(self._session.sync_session)
+        return self._session
+
+    @property
+    def opened(self) -> bool:
+        return self._session is not None
+
+    def _repository(self, name: str):
+        if name not in self._repositories:
+            self._repositories[name] = ASYNC_REPOSITORIES[name](self.session)
+        return self._repositories[name]
+
+    @property
+    def employees(self):
+        return self._repository("employees")
+
+    @property
+    def clients(self):
+        return self._repository("clients")
+
+    @property
+    def services(self):
+        return self._repository("services")
+
+    @property
+    def appointments(self):
+        return self._repository("appointments")
+
+    async def __aenter__(self):
+        self._session, self._repositories = None, {}
+
+    async def __aexit__(self, *args):
+        if self.opened:
+            await self._session.close()
+            self._session, self._repositories = None, {}
+
+    async def run(self, handler: Callable[..., Any], *args) -> Any:
+        def call(session: Session):
+            return handler(UnitOfWork.over(session, self._caches), *args)
+
+        return await self.session.run_sync(call)
+
+    async def commit(self):
+        if not self.opened:
+            return
+        try:
+            await self.session.commit()
+        except IntegrityError as error:
+            await self.session.rollback()
+            _raise_for_integrity_error(error)
+        except StaleDataError as error:
+            await self.session.rollback()
+            raise errors.StaleAppointment() from error
+        pin_to_primary()
+
+    async def rollback(self):
+        if self.opened:
+            await self.session.rollback()
+
+
+ASYNC_REPOSITORIES = {
+    "employees": AsyncEmployeeRepository,
+    "clients": AsyncClientRepository,
+    "services": AsyncServiceRepository,
+    "appointments": AsyncAppointmentRepository,
+}
+
+
+def _raise_for_integrity_error(error: IntegrityError):
+    if APPOINTMENT_OVERLAP_CONSTRAINT in str(error.orig):
+        raise errors.AppointmentConflict() from error
+    raise error
+
+
+def build_reference_caches(settings: CacheSettings) -> Dict[str, EntityCache]:
+    """Caches for the rarely changing services and employees"""
+    if not settings.enabled:
+        return {}
+    return {
+        "employees": EntityCache(
+            domain.Employee, LRUCache(settings.maxsize, settings.ttl)
+        ),
+        "services": EntityCache(
+            domain.Service, LRUCache(settings.maxsize, settings.ttl)
+        ),
+    }
+
+
+DEFAULT_CACHES = build_reference_caches(CacheSettings.from_env())
+
+
+def cache_stats() -> Dict[str, Dict[str, float]]:
+    return {
+        name: {
+            "hits": cache.stats.hits,
+            "misses": cache.stats.misses,
+            "hit_ratio": cache.stats.hit_ratio,
+        }
+        for name, cache in DEFAULT_CACHES.items()
+    }
+
+
+def get_default_uow(read_only: bool = False) -> UnitOfWork:
+    return UnitOfWork(
+        DEFAULT_SESSION_FACTORY, caches=DEFAULT_CACHES, read_only=read_only
+    )
 
 
-def get_default_uow() -> UnitOfWork:
-    return UnitOfWork(DEFAULT_SESSION_FACTORY)
+def get_default_async_uow(read_only: bool = False) -> AsyncUnitOfWork:
+    return AsyncUnitOfWork(
+        DEFAULT_ASYNC_SESSION_FACTORY, caches=DEFAULT_CACHES, read_only=read_only
+    )
@@ -0,0 +1,72 @@
+"""
+Read side of the list endpoints. Rows are selected with Core straight into
+named tuples, without the mapped instances and identity map bookkeeping the
+repositories pay for on the write side.
+"""
+from datetime import timedelta
+from typing import Dict, Iterator, List, NamedTuple, Optional, Type, TypeVar
+
+from sqlalchemy import Table, select
+from sqlalchemy.sql import Select
+
+from agenda_api.adapters.base import AbstractUnitOfWork, paginate
+from agenda_api.adapters.orm import clients_table, employees_table, services_table
+
+STREAM_BATCH_SIZE = 500
+
+
+class EmployeeView(NamedTuple):
+    id: int
+    first_name: str
+    last_name: str
+
+
+class ClientView(NamedTuple):
+    id: int
+    first_name: str
+    last_name: str
+
+
+class ServiceView(NamedTuple):
+    id: int
+    name: str
+    price: int
+    duration: timedelta
+
+
+View = TypeVar("View", EmployeeView, ClientView, ServiceView)
+
+TABLES: Dict[type, Table] = {
+    EmployeeView: employees_table,
+    ClientView: clients_table,
+    ServiceView: services_table,
+}
+
+
+def _statement(view: Type[View], limit: Optional[int], after: Optional[int]) -> Select:
+    table = TABLES[view]
+    statement = select(*(table.c[name] for name in view._fields))
+    return paginate(statement, table.c, limit=limit, after=after)
+
+
+def page(
+    uow: AbstractUnitOfWork,
+    view: Type[View],
+    limit: Optional[int] = None,
+    after: Optional[int] = None,
+) -> List[View]:
+    """A page of rows, keyset paginated by id like the repositories"""
+    result = uow.session.connection().execute(_statement(view, limit, after))
+    return list(map(view._make, result))
+
+
+def stream(
+    uow: AbstractUnitOfWork,
+    view: Type[View],
+    limit: Optional[int] = None,
+    after: Optional[int] = None,
+    batch_size: int = STREAM_BATCH_SIZE,
+) -> Iterator[View]:
+    """Same rows as page, fetched from a server side cursor in batches"""
+    statement = _statement(view, limit, after).execution_options(yield_per=batch_size)
+    return map(view._make, uow.session.connection().execute(statement))
@@ -0,0 +1,127 @@
+import os
+from dataclasses import dataclass
+from typing import Mapping, Optional, Tuple
+
+
+def _flag(value: str) -> bool:
+    return value.lower() in ("1", "true", "yes", "on")
+
+
+def get_database_uri(environ: Mapping[str, str] = os.environ) -> str:
+    if environ.get("DATABASE_URL"):
+        return environ["DATABASE_URL"]
+    host = environ.get("POSTGRES_HOST", "agenda-db")
+    port = environ.get("POSTGRES_PORT", "5432")
+    username = environ.get("POSTGRES_USER", "root")
+    password = environ.get("POSTGRES_PASSWORD", "root")
+    db_name = environ.get("POSTGRES_DB", "agenda")
+    return f"postgresql://{username}:{password}@{host}:{port}/{db_name}"
+
+
+@dataclass(frozen=True)
+class DatabaseSettings:
+    url: str
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30.0
+    # Seconds before a pooled connection is replaced, -1 keeps them forever
+    pool_recycle: int = 1800
+    pool_pre_ping: bool = True
+    # Milliseconds, applied to every Postgres connection when set
+    statement_timeout: Optional[int] = None
+    # Read replicas for the read-only units of work, and how each request
+    # picks one of them: round_robin or least_connections
+    replica_urls: Tuple[str, ...] = ()
+    replica_balancing: str = "round_robin"
+
+    @classmethod
+    def from_env(cls, environ: Mapping[str, str] = os.environ) -> "DatabaseSettings":
+        statement_timeout = environ.get("DB_STATEMENT_TIMEOUT")
+        return cls(
+            url=get_database_uri(environ),
+            pool_size=int(environ.get("DB_POOL_SIZE", cls.pool_size)),
+            max_overflow=int(environ.get("DB_MAX_OVERFLOW", cls.max_overflow)),
+            pool_timeout=float(environ.get("DB_POOL_TIMEOUT", cls.pool_timeout)),
+            pool_recycle=int(environ.get("DB_POOL_RECYCLE", cls.pool_recycle)),
+            pool_pre_ping=_flag(
+                environ.get("DB_POOL_PRE_PING", str(cls.pool_pre_ping))
+            ),
+            statement_timeout=int(statement_timeout) if statement_timeout else None,
+            replica_urls=tuple(
+                url.strip()
+                for url in environ.get("DATABASE_REPLICA_URLS", "").split(",")
+                if url.strip()
+            ),
+            replica_balancing=environ.get(
+                "DB_REPLICA_BALANCING", cls.replica_balancing
+            ),
+        )
+
+
+@dataclass(frozen=True)
+class CacheSettings:
+    # Seconds, caching is disabled unless positive
+    ttl: float = 0.0
+    maxsize: int = 1024
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    @classmethod
+    def from_env(cls, environ: Mapping[str, str] = os.environ) -> "CacheSettings":
+        return cls(
+            ttl=float(environ.get("CACHE_TTL", cls.ttl)),
+            maxsize=int(environ.get("CACHE_MAXSIZE", cls.maxsize)),
+        )
+
+
+@dataclass(frozen=True)
+class ResponseCacheSettings:
+    # Responses of the list endpoints kept in memory, keyed by their ETag.
+    # Seconds, caching is disabled unless positive
+    ttl: float = 300.0
+    maxsize: int = 256
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.maxsize > 0
+
+    @classmethod
+    def from_env(
+        cls, environ: Mapping[str, str] = os.environ
+    ) -> "ResponseCacheSettings":
+        return cls(
+            ttl=float(environ.get("RESPONSE_CACHE_TTL", cls.ttl)),
+            maxsize=int(environ.get("RESPONSE_CACHE_MAXSIZE", cls.maxsize)),
+        )
+
+
+@dataclass(frozen=True)
+class MetricsSettings:
+    # Adds an X-Query-Count header with the statements each request issued
+    query_count_header: bool = False
+
+    @classmethod
+    def from_env(cls, environ: Mapping[str, str] = os.environ) -> "MetricsSettings":
+        return cls(
+            query_count_header=_flag(
+                environ.get("METRICS_QUERY_COUNT_HEADER", str(cls.query_count_header))
+            ),
+        )
+
+
+@dataclass(frozen=True)
+class QueryBudgetSettings:
+    # Raise when a query budget is exceeded instead of logging a warning
+    strict: bool = False
+    # Identical statements tolerated in a budgeted block before it is
+    # reported as an N+1 pattern
+    max_repeats: int = 3
+
+    @classmethod
+    def from_env(cls, environ: Mapping[str, str] = os.environ) -> "QueryBudgetSettings":
+        return cls(
+            strict=_flag(environ.get("QUERY_BUDGET_STRICT", str(cls.strict))),
+            max_repeats=int(environ.get("QUERY_BUDGET_MAX_REPEATS", cls.max_repeats)),
+        )
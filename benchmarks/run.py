@@ -0,0 +1,494 @@
+"""
+Benchmarks of the service handlers, repositories and /api endpoints
+against a seeded database. SQLite in a temporary directory is used unless
+--database-url points elsewhere:
+
+    python -m benchmarks.run --clients 100000 --appointments 1000000 \\
+        --output baseline.json
+    python -m benchmarks.run --compare baseline.json --threshold 1.2
+
+An existing database is only reused with --skip-seed. --compare exits
+non-zero when a median is more than --threshold times the one of the
+earlier run.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import sqlalchemy
+from sqlalchemy import func, select
+
+from benchmarks.seed import SLOT, START, Volumes, is_empty, seed
+
+PAGE_SIZE = 100
+BATCH_SIZE = 10
+
+Operation = Callable[[], Any]
+
+
+class Scenario:
+    """Draws the ids and free slots the operations work on"""
+
+    def __init__(self, engine, repeat: int, random_seed: int = 0):
+        from agenda_api import domain
+        from agenda_api.adapters.orm import (
+            appointments_table,
+            clients_table,
+            employees_table,
+            services_table,
+        )
+
+        with engine.connect() as connection:
+
+            def scalar(expression):
+                return connection.execute(select(expression)).scalar() or 0
+
+            self.clients = scalar(func.max(clients_table.c.id))
+            self.employees = scalar(func.max(employees_table.c.id))
+            self.services = scalar(func.max(services_table.c.id))
+            self.appointments = scalar(func.max(appointments_table.c.id))
+            last_end = scalar(func.max(appointments_table.c.ends_at)) or START
+            # Each timed handler and its warm up call takes its own booking,
+            # each bulk status change a batch of them
+            pending = connection.execute(
+                select(appointments_table.c.id)
+                .where(appointments_table.c.status == domain.AppointmentStatus.PENDING)
+                .order_by(appointments_table.c.id)
+                .limit(2 * (1 + BATCH_SIZE) * (repeat + 1))
+            )
+            self._pending = iter([row.id for row in pending])
+        self._horizon = last_end + SLOT
+        self._slots = itertools.count()
+        self.random = random.Random(random_seed)
+
+    def client_id(self) -> int:
+        return self.random.randint(1, self.clients)
+
+    def employee_id(self) -> int:
+        return self.random.randint(1, self.employees)
+
+    def service_id(self) -> int:
+        return self.random.randint(1, self.services)
+
+    def appointment_id(self) -> int:
+        return self.random.randint(1, self.appointments)
+
+    def pending_appointment(self) -> int:
+        try:
+            return next(self._pending)
+        except StopIteration:
+            raise RuntimeError("Not enough pending appointments, lower --repeat")
+
+    def free_slot(self) -> Tuple[int, datetime]:
+        """A slot after every existing booking, never handed out twice"""
+        slot = next(self._slots)
+        employee_id = slot % self.employees + 1
+        return employee_id, self._horizon + slot // self.employees * SLOT
+
+
+def handler_benchmarks(scenario: Scenario) -> Dict[str, Operation]:
+    from agenda_api.services import commands
+    from agenda_api.services.handlers import (
+        cancel_appointment,
+        complete_appointment,
+        create_appointment,
+    )
+    from agenda_api.services.unitofwork import get_default_uow
+
+    def in_transaction(handler, command_factory) -> Operation:
+        def operation():
+            uow = get_default_uow()
+            with uow:
+                handler(uow, command_factory())
+                uow.commit()
+
+        return operation
+
+    def new_appointment():
+        employee_id, scheduled_at = scenario.free_slot()
+        return commands.CreateAppointment(
+            client_id=scenario.client_id(),
+            service_ids={scenario.service_id()},
+            employee_id=employee_id,
+            scheduled_at=scheduled_at,
+        )
+
+    return {
+        "handlers.create_appointment": in_transaction(
+            create_appointment, new_appointment
+        ),
+        "handlers.complete_appointment": in_transaction(
+            complete_appointment,
+            lambda: commands.CompleteAppointment(
+                scenario.pending_appointment(), scenario.employee_id()
+            ),
+        ),
+        "handlers.cancel_appointment": in_transaction(
+            cancel_appointment,
+            lambda: commands.CancelAppointment(
+                scenario.pending_appointment(), scenario.employee_id()
+            ),
+        ),
+    }
+
+
+def repository_benchmarks(scenario: Scenario) -> Dict[str, Operation]:
+    from agenda_api import domain
+    from agenda_api.services import views
+    from agenda_api.services.unitofwork import get_default_uow
+
+    def read(query: Callable[[Any], Any]) -> Operation:
+        def operation():
+            uow = get_default_uow()
+            with uow:
+                query(uow)
+
+        return operation
+
+    return {
+        "repositories.clients.get": read(
+            lambda uow: uow.clients.get(scenario.client_id())
+        ),
+        "repositories.clients.filter": read(
+            lambda uow: uow.clients.filter(
+                limit=PAGE_SIZE, after=scenario.client_id()
+            ).all()
+        ),
+        "views.clients.page": read(
+            lambda uow: views.page(
+                uow, views.ClientView, limit=PAGE_SIZE, after=scenario.client_id()
+            )
+        ),
+        "repositories.employees.get": read(
+            lambda uow: uow.employees.get(scenario.employee_id())
+        ),
+        "repositories.services.get_many": read(
+            lambda uow: uow.services.get_many({scenario.service_id() for _ in range(3)})
+        ),
+        "repositories.appointments.get": read(
+            lambda uow: uow.appointments.get(scenario.appointment_id())
+        ),
+        "repositories.appointments.filter": read(
+            lambda uow: uow.appointments.filter(client_id=scenario.client_id()).all()
+        ),
+        "repositories.appointments.find": read(
+            lambda uow: list(
+                uow.appointments.find(
+                    status=domain.AppointmentStatus.PENDING,
+                    limit=PAGE_SIZE,
+                    after=scenario.appointment_id(),
+                )
+            )
+        ),
+    }
+
+
+def endpoint_benchmarks(
+    client, scenario: Scenario
+) -> Dict[str, Tuple[str, Callable[[], str], Callable[[], Any]]]:
+    """Method, path factory and body factory of a request to each endpoint"""
+
+    def person(index: int = 0) -> Dict[str, str]:
+        return {"first_name": f"Bench {index}", "last_name": "Run"}
+
+    def service(index: int = 0) -> Dict[str, Any]:
+        return {"name": f"Bench {index}", "price": 1000}
+
+    def day() -> str:
+        return (
+            (START + timedelta(days=scenario.random.randint(0, 30))).date().isoformat()
+        )
+
+    def period() -> str:
+        """A month of the seeded schedule"""
+        start = START.date() + timedelta(days=scenario.random.randint(0, 30))
+        return f"start={start.isoformat()}&end={start + timedelta(days=30)}"
+
+    def commands() -> Dict[str, Any]:
+        employee_id, scheduled_at = scenario.free_slot()
+        return {
+            "commands": [
+                {"type": "CreateClient", **person()},
+                {
+                    "type": "CreateAppointment",
+                    "client_id": scenario.client_id(),
+                    "service_ids": [scenario.service_id()],
+                    "employee_id": employee_id,
+                    "scheduled_at": scheduled_at.isoformat(),
+                },
+            ]
+        }
+
+    def status_change() -> Dict[str, Any]:
+        return {
+            "appointment_ids": [
+                scenario.pending_appointment() for _ in range(BATCH_SIZE)
+            ],
+            "employee_id": scenario.employee_id(),
+        }
+
+    def none():
+        return None
+
+    return {
+        "GET /api/clients": (
+            "GET",
+            lambda: f"/api/clients?limit={PAGE_SIZE}&after={scenario.client_id()}",
+            none,
+        ),
+        "GET /api/clients/search": (
+            "GET",
+            lambda: f"/api/clients/search?q=client+{scenario.client_id() // 10}",
+            none,
+        ),
+        "POST /api/clients": ("POST", lambda: "/api/clients", person),
+        "POST /api/clients:batch": (
+            "POST",
+            lambda: "/api/clients:batch",
+            lambda: [person(index) for index in range(BATCH_SIZE)],
+        ),
+        "GET /api/employees": (
+            "GET",
+            lambda: f"/api/employees?limit={PAGE_SIZE}",
+            none,
+        ),
+        "POST /api/employees": ("POST", lambda: "/api/employees", person),
+        "POST /api/employees:batch": (
+            "POST",
+            lambda: "/api/employees:batch",
+            lambda: [person(index) for index in range(BATCH_SIZE)],
+        ),
+        "GET /api/employees/next-slot": (
+            "GET",
+            lambda: f"/api/employees/next-slot?duration=60&after={START.isoformat()}",
+            none,
+        ),
+        "GET /api/employees/<id>/next-slot": (
+            "GET",
+            lambda: (
+                f"/api/employees/{scenario.employee_id()}/next-slot"
+                f"?duration=60&after={START.isoformat()}"
+            ),
+            none,
+        ),
+        "GET /api/services": ("GET", lambda: f"/api/services?limit={PAGE_SIZE}", none),
+        "POST /api/services": ("POST", lambda: "/api/services", service),
+        "POST /api/services:batch": (
+            "POST",
+            lambda: "/api/services:batch",
+            lambda: [service(index) for index in range(BATCH_SIZE)],
+        ),
+        "GET /api/reports/revenue": (
+            "GET",
+            lambda: f"/api/reports/revenue?{period()}",
+            none,
+        ),
+        "GET /api/appointments": (
+            "GET",
+            lambda: (
+                f"/api/appointments?status=pending&limit={PAGE_SIZE}"
+                f"&after={scenario.appointment_id()}"
+            ),
+            none,
+        ),
+        "GET /api/appointments?client_id": (
+            "GET",
+            lambda: f"/api/appointments?client_id={scenario.client_id()}",
+            none,
+        ),
+        "GET /api/appointments?date": (
+            "GET",
+            lambda: f"/api/appointments?date={day()}&limit={PAGE_SIZE}",
+            none,
+        ),
+        "POST /api/appointments:complete": (
+            "POST",
+            lambda: "/api/appointments:complete",
+            status_change,
+        ),
+        "POST /api/appointments:cancel": (
+            "POST",
+            lambda: "/api/appointments:cancel",
+            status_change,
+        ),
+        "POST /api/commands": ("POST", lambda: "/api/commands", commands),
+    }
+
+
+def request_operation(client, name: str, method: str, path, body) -> Operation:
+    def operation():
+        response = client.open(path(), method=method, json=body())
+        if response.status_code >= 400:
+            raise RuntimeError(
+                f"{name} answered {response.status_code}: {response.get_data(True)}"
+            )
+
+    return operation
+
+
+def uncovered_endpoints(app, requests) -> List[str]:
+    """The /api endpoints of the application no benchmark requests"""
+    adapter = app.url_map.bind("localhost")
+    covered = {
+        adapter.match(path().split("?")[0], method=method)[0]
+        for method, path, _ in requests.values()
+    }
+    endpoints = {
+        rule.endpoint
+        for rule in app.url_map.iter_rules()
+        if rule.rule.startswith("/api/")
+    }
+    return sorted(endpoints - covered)
+
+
+def measure(operation: Operation, repeat: int) -> List[float]:
+    operation()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        operation()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    median = statistics.median(ordered)
+    return {
+        "runs": len(ordered),
+        "median_ms": round(median * 1000, 3),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "p95_ms": round(ordered[int(0.95 * (len(ordered) - 1))] * 1000, 3),
+        "min_ms": round(ordered[0] * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+        "ops_per_second": round(1 / median, 1) if median else None,
+    }
+
+
+def compare(baseline: dict, report: dict, threshold: float) -> List[str]:
+    """Describe the benchmarks whose median regressed beyond the threshold"""
+    regressions = []
+    for name, current in report["benchmarks"].items():
+        previous = baseline.get("benchmarks", {}).get(name)
+        if not previous or not previous["median_ms"]:
+            continue
+        ratio = current["median_ms"] / previous["median_ms"]
+        if ratio > threshold:
+            regressions.append(
+                f"{name}: {previous['median_ms']}ms -> {current['median_ms']}ms "
+                f"({ratio:.2f}x)"
+            )
+    return regressions
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], check=True, capture_output=True, text=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="benchmarks.run")
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--clients", type=int, default=Volumes.clients)
+    parser.add_argument("--appointments", type=int, default=Volumes.appointments)
+    parser.add_argument("--employees", type=int, default=Volumes.employees)
+    parser.add_argument("--services", type=int, default=Volumes.services)
+    parser.add_argument("--skip-seed", action="store_true")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the id draws")
+    parser.add_argument("--output", default="-", help="JSON report, - for stdout")
+    parser.add_argument("--compare", help="Earlier JSON report to compare with")
+    parser.add_argument("--threshold", type=float, default=1.2)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    with tempfile.TemporaryDirectory() as directory:
+        url = args.database_url or f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        # Read by the default session factory the application uses
+        os.environ["DATABASE_URL"] = url
+        return run(args)
+
+
+def run(args: argparse.Namespace) -> int:
+    from agenda_api.adapters.database import DEFAULT_SESSION_FACTORY
+    from agenda_api.adapters.orm import ensure_mappers
+    from agenda_api.app import create_app
+
+    engine = DEFAULT_SESSION_FACTORY.engine
+    volumes = Volumes(args.clients, args.appointments, args.employees, args.services)
+    seed_seconds = None
+    if not args.skip_seed:
+        if not is_empty(engine):
+            print("The database is not empty, use --skip-seed", file=sys.stderr)
+            return 2
+        print(f"Seeding {asdict(volumes)}", file=sys.stderr)
+        seed_seconds = round(seed(engine, volumes), 3)
+
+    ensure_mappers()
+    app = create_app(lazy=False)
+    client = app.test_client()
+    scenario = Scenario(engine, args.repeat, args.seed)
+    requests = endpoint_benchmarks(client, scenario)
+    operations = {
+        **handler_benchmarks(scenario),
+        **repository_benchmarks(scenario),
+        **{
+            name: request_operation(client, name, *request)
+            for name, request in requests.items()
+        },
+    }
+    results = {}
+    for name, operation in operations.items():
+        results[name] = summarize(measure(operation, args.repeat))
+        print(f"{name}: {results[name]['median_ms']}ms", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "dialect": engine.dialect.name,
+            "python": platform.python_version(),
+            "sqlalchemy": sqlalchemy.__version__,
+            "volumes": asdict(volumes),
+            "seeded": not args.skip_seed,
+            "seed_seconds": seed_seconds,
+            "repeat": args.repeat,
+        },
+        "benchmarks": results,
+        "uncovered_endpoints": uncovered_endpoints(app, requests),
+    }
+    output = json.dumps(report, indent=2)
+    if args.output == "-":
+        print(output)
+    else:
+        with open(args.output, "w") as stream:
+            stream.write(output + "\n")
+
+    if args.compare:
+        with open(args.compare) as stream:
+            regressions = compare(json.load(stream), report, args.threshold)
+        for regression in regressions:
+            print(f"Regression {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
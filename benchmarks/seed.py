@@ -0,0 +1,123 @@
+"""
+Synthetic data for the benchmarks, streamed through the bulk loader.
+
+Every employee is booked for eight one hour slots a day, so the seeded
+bookings never overlap and new ones can be made after the last of them.
+"""
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Iterator
+
+from sqlalchemy import func, inspect, select
+from sqlalchemy.engine import Engine
+
+from agenda_api import domain
+from agenda_api.adapters import bulkload, rollups
+from agenda_api.adapters.bulkload import Record
+from agenda_api.adapters.orm import clients_table, metadata
+
+START = datetime(2026, 1, 5, 9)
+SLOT = timedelta(hours=1)
+SLOTS_PER_DAY = 8
+
+
+@dataclass(frozen=True)
+class Volumes:
+    clients: int = 100_000
+    appointments: int = 1_000_000
+    employees: int = 100
+    services: int = 20
+
+
+def slot_start(slot: int) -> datetime:
+    """Start of the nth booked slot of an employee"""
+    return START + timedelta(days=slot // SLOTS_PER_DAY) + slot % SLOTS_PER_DAY * SLOT
+
+
+def employees(volumes: Volumes) -> Iterator[Record]:
+    for employee_id in range(1, volumes.employees + 1):
+        yield {
+            "id": employee_id,
+            "first_name": f"Employee {employee_id}",
+            "last_name": "Bench",
+        }
+
+
+def clients(volumes: Volumes) -> Iterator[Record]:
+    for client_id in range(1, volumes.clients + 1):
+        yield {
+            "id": client_id,
+            "first_name": f"Client {client_id}",
+            "last_name": "Bench",
+        }
+
+
+def services(volumes: Volumes) -> Iterator[Record]:
+    for service_id in range(1, volumes.services + 1):
+        yield {
+            "id": service_id,
+            "name": f"Service {service_id}",
+            "price": 1000 + 500 * (service_id % 10),
+            # 15 or 30 minutes, so two services still fit in a slot
+            "duration": 900 * (1 + service_id % 2),
+        }
+
+
+def appointments(volumes: Volumes) -> Iterator[Record]:
+    for index in range(volumes.appointments):
+        if index % 10 == 0:
+            status = domain.AppointmentStatus.COMPLETED
+        elif index % 10 == 1:
+            status = domain.AppointmentStatus.CANCELED
+        else:
+            status = domain.AppointmentStatus.PENDING
+        employee_id = index % volumes.employees + 1
+        yield {
+            "id": index + 1,
+            "client_id": index % volumes.clients + 1,
+            "status": status.name,
+            "employee_id": employee_id,
+            "scheduled_at": slot_start(index // volumes.employees).isoformat(),
+            "updated_by_id": (
+                employee_id if status != domain.AppointmentStatus.PENDING else None
+            ),
+        }
+
+
+def appointment_services(volumes: Volumes) -> Iterator[Record]:
+    for index in range(volumes.appointments):
+        service_id = index % volumes.services + 1
+        yield {"appointment_id": index + 1, "service_id": service_id}
+        if index % 3 == 0 and volumes.services > 1:
+            yield {
+                "appointment_id": index + 1,
+                "service_id": service_id % volumes.services + 1,
+            }
+
+
+def is_empty(engine: Engine) -> bool:
+    if not inspect(engine).has_table(clients_table.name):
+        return True
+    with engine.connect() as connection:
+        return not connection.execute(
+            select(func.count()).select_from(clients_table)
+        ).scalar()
+
+
+def seed(engine: Engine, volumes: Volumes) -> float:
+    """Create the tables and fill them, returning the seconds it took"""
+    started = time.perf_counter()
+    metadata.create_all(engine)
+    with engine.begin() as connection:
+        for table, records in (
+            ("employees", employees(volumes)),
+            ("clients", clients(volumes)),
+            ("services", services(volumes)),
+            ("appointments", appointments(volumes)),
+            ("appointment_services", appointment_services(volumes)),
+        ):
+            bulkload.load(connection, bulkload.TABLES[table], records)
+        bulkload.refresh_appointment_totals(connection)
+        rollups.rebuild(connection)
+    return time.perf_counter() - started
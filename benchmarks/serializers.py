@@ -0,0 +1,120 @@
+"""
+Per item cost of the response serializers against dataclasses.asdict and
+jsonify, the way the endpoints used to build their bodies:
+
+    python -m benchmarks.serializers --items 10000 --repeat 20
+
+asdict copies the sets of services as they are and Flask's JSON provider
+cannot encode them, nor enums and durations, so the baseline falls back to
+a list of dictionaries, the value and the string for them.
+"""
+import argparse
+import enum
+import json
+import sys
+import time
+from dataclasses import asdict
+from datetime import timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from flask import Flask, jsonify
+
+from agenda_api import domain, serializers
+from benchmarks.seed import slot_start
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, timedelta):
+        return str(value)
+    if isinstance(value, set):
+        return [asdict(item) for item in value]
+    return Flask.json_provider_class.default(value)
+
+
+def samples(count: int) -> Dict[type, List[Any]]:
+    """Domain objects as the repositories return them, ids included"""
+    employees, clients, services, appointments = [], [], [], []
+    for index in range(1, count + 1):
+        employee = domain.Employee(f"Employee {index}", "Bench")
+        employee.id = index
+        employees.append(employee)
+        client = domain.Client(f"Client {index}", "Bench")
+        client.id = index
+        clients.append(client)
+        service = domain.Service(
+            f"Service {index}", 1000, timedelta(minutes=15 * (1 + index % 2))
+        )
+        service.id = index
+        services.append(service)
+    for index in range(1, count + 1):
+        appointment = domain.Appointment(
+            client_id=index,
+            services={services[index - 1], services[index % count]},
+            employee_id=index,
+            scheduled_at=slot_start(index),
+        )
+        appointment.id = index
+        appointment.complete(employees[index - 1])
+        appointments.append(appointment)
+    return {
+        domain.Employee: employees,
+        domain.Client: clients,
+        domain.Service: services,
+        domain.Appointment: appointments,
+    }
+
+
+def best_of(operation: Callable[[], Any], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        operation()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def compare(items: List[Any], repeat: int) -> Dict[str, float]:
+    serialize = serializers.SERIALIZERS.register(type(items[0]))
+    baseline = best_of(lambda: jsonify([asdict(item) for item in items]), repeat)
+    compiled = best_of(
+        lambda: serializers.json_response([serialize(item) for item in items]),
+        repeat,
+    )
+    return {
+        "asdict_jsonify_us": round(baseline / len(items) * 1e6, 3),
+        "compiled_us": round(compiled / len(items) * 1e6, 3),
+        "speedup": round(baseline / compiled, 2),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="benchmarks.serializers")
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    app = Flask(__name__)
+    app.json.default = _default
+    with app.app_context():
+        results = {
+            cls.__name__: compare(items, args.repeat)
+            for cls, items in samples(args.items).items()
+        }
+    print(
+        json.dumps(
+            {
+                "items": args.items,
+                "repeat": args.repeat,
+                "backend": serializers.JSON_BACKEND,
+                "results": results,
+            },
+            indent=2,
+        )
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
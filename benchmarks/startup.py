@@ -0,0 +1,56 @@
+"""
+Cold start benchmark of create_app().
+
+Every sample runs in a fresh interpreter so nothing is imported yet:
+
+    python -m benchmarks.startup --runs 10 --target-ms 350
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from typing import List, Optional
+
+SNIPPET = """
+import json, sys, time
+started = time.perf_counter()
+from agenda_api.app import create_app
+create_app()
+elapsed = time.perf_counter() - started
+print(json.dumps({"seconds": elapsed, "sqlalchemy": "sqlalchemy" in sys.modules}))
+"""
+
+
+def sample() -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", SNIPPET], check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="benchmarks.startup")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--target-ms", type=float, default=350.0)
+    args = parser.parse_args(argv)
+
+    samples = [sample() for _ in range(args.runs)]
+    timings = [result["seconds"] * 1000 for result in samples]
+    median = statistics.median(timings)
+    print(
+        json.dumps(
+            {
+                "runs": args.runs,
+                "median_ms": round(median, 1),
+                "max_ms": round(max(timings), 1),
+                "target_ms": args.target_ms,
+                "sqlalchemy_imported": any(result["sqlalchemy"] for result in samples),
+            }
+        )
+    )
+    return 0 if median <= args.target_ms else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,21 @@
+import os
+
 import pytest
 from sqlalchemy import create_engine, orm
+from sqlalchemy.pool import NullPool
 
+from agenda_api.adapters.database import async_url, enable_sqlite_savepoints
 from agenda_api.adapters.orm import metadata, start_mappers
 from agenda_api.adapters.repositories import EmployeeRepository
 
+# Exceeded query budgets fail the tests instead of logging a warning
+os.environ.setdefault("QUERY_BUDGET_STRICT", "true")
+
 
 @pytest.fixture
 def in_memory_db():
     engine = create_engine("sqlite://", connect_args={"check_same_thread": False})
+    enable_sqlite_savepoints(engine)
     metadata.create_all(engine)
     return engine
 
@@ -24,6 +32,19 @@ def session(session_factory):
     orm.clear_mappers()
 
 
+@pytest.fixture
+def async_session_factory(tmp_path, session):
+    pytest.importorskip("aiosqlite")
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+    # aiosqlite connections cannot share an in-memory database, nor outlive
+    # the event loop of each asyncio.run
+    url = f"sqlite:///{tmp_path / 'agenda.db'}"
+    metadata.create_all(create_engine(url))
+    engine = create_async_engine(async_url(url), poolclass=NullPool)
+    return lambda: AsyncSession(bind=engine, expire_on_commit=False)
+
+
 @pytest.fixture
 def user_repository(session_factory):
     return EmployeeRepository(session=session_factory())
@@ -1,8 +1,14 @@
+import subprocess
+import sys
+from datetime import datetime, timedelta
+
 import pytest
-from flask import Flask
+from flask import Flask, request
+from sqlalchemy import event
 
-from agenda_api import domain
+from agenda_api import domain, instrumentation
 from agenda_api.app import create_app
+from agenda_api.resources.employees import MAX_SLOT_SEARCH_DAYS
 from agenda_api.services.unitofwork import UnitOfWork
 
 
@@ -97,3 +103,539 @@ def test_create_service(client, session_factory):
     assert res.json["id"]
     assert res.json["name"] == "haircut"
     assert res.json["price"] == 5000
+
+
+def test_list_clients_paginated(client, session_factory, clients):
+    res = client.get("api/clients?limit=1")
+    assert res.status_code == 200
+    assert len(res.json) == 1
+    cursor = res.headers["X-Next-Cursor"]
+    assert cursor == str(res.json[0]["id"])
+
+    res = client.get(f"api/clients?limit=1&after={cursor}")
+    assert res.status_code == 200
+    assert [item["first_name"] for item in res.json] == ["Jorah"]
+
+    res = client.get(f"api/clients?limit=1&after={res.json[0]['id']}")
+    assert res.json == []
+    assert "X-Next-Cursor" not in res.headers
+
+
+def test_list_employees_stream(client, session_factory, employees):
+    res = client.get("api/employees?stream=true")
+    assert res.status_code == 200
+    assert res.is_streamed
+    assert [item["first_name"] for item in res.json] == ["Jon", "Ygritte"]
+
+
+def test_list_services_stream_empty(client, session_factory):
+    res = client.get("api/services?stream=1")
+    assert res.status_code == 200
+    assert res.json == []
+
+
+def test_next_slot(client, session_factory, employees):
+    res = client.get("api/employees/1/next-slot?duration=90&after=2026-10-18T09:00")
+    assert res.status_code == 200
+    assert res.json == {
+        "employee_id": 1,
+        "start": "2026-10-18T09:00:00",
+        "end": "2026-10-18T10:30:00",
+    }
+
+
+def test_next_slot_caps_days_searched(client, session_factory, employees, mocker):
+    find_next_slot = mocker.patch(
+        "agenda_api.resources.employees.find_next_slot", return_value=None
+    )
+    res = client.get("api/employees/1/next-slot?days=100000")
+    assert res.status_code == 404
+    assert find_next_slot.call_args.kwargs["days"] == MAX_SLOT_SEARCH_DAYS
+
+
+def test_next_slot_employee_not_found(client, session_factory):
+    res = client.get("api/employees/99/next-slot?after=2026-10-18T09:00")
+    assert res.status_code == 404
+    assert res.json["message"] == "Employee with id 99 not found"
+
+
+def test_create_clients_batch(client, session_factory):
+    res = client.post(
+        "api/clients:batch",
+        json=[
+            {"first_name": "Samwell", "last_name": "Tarly"},
+            {"first_name": "Jorah", "last_name": "Mormont"},
+        ],
+    )
+    assert res.status_code == 201
+    assert res.json["errors"] == []
+    assert [item["first_name"] for item in res.json["created"]] == ["Samwell", "Jorah"]
+    assert all(item["id"] for item in res.json["created"])
+
+    res = client.get("api/clients")
+    assert len(res.json) == 2
+
+
+def test_create_employees_batch_reports_invalid_items(client, session_factory):
+    res = client.post(
+        "api/employees:batch",
+        json=[{"first_name": "Jon"}, {"first_name": "Jon", "last_name": "Snow"}],
+    )
+    assert res.status_code == 207
+    assert len(res.json["created"]) == 1
+    assert [error["index"] for error in res.json["errors"]] == [0]
+
+
+def test_create_services_batch_reports_domain_errors(client, session_factory):
+    res = client.post(
+        "api/services:batch",
+        json=[
+            {"name": "haircut", "price": -1},
+            {"name": "Beard", "price": 2500},
+            {"name": "Shave", "price": 0},
+        ],
+    )
+    assert res.status_code == 207
+    assert [item["name"] for item in res.json["created"]] == ["Beard"]
+    assert res.json["errors"] == [
+        {"index": 0, "message": "Cannot create service with negative price"},
+        {"index": 2, "message": "Cannot create service with negative price"},
+    ]
+
+
+def test_create_clients_batch_reports_null_fields(client, session_factory):
+    res = client.post(
+        "api/clients:batch",
+        json=[
+            {"first_name": None, "last_name": "Tarly"},
+            {"first_name": "Jorah", "last_name": "Mormont"},
+        ],
+    )
+    assert res.status_code == 207
+    assert [item["first_name"] for item in res.json["created"]] == ["Jorah"]
+    assert res.json["errors"] == [{"index": 0, "message": "first_name is required"}]
+
+
+def test_create_services_batch_coerces_fields(client, session_factory):
+    res = client.post(
+        "api/services:batch",
+        json=[
+            {"name": "haircut", "price": "10"},
+            {"name": "Beard", "price": 2500, "duration": 3600},
+            {"name": "Shave", "price": 1500, "duration": "forever"},
+        ],
+    )
+    assert res.status_code == 207
+    assert [(item["name"], item["duration"]) for item in res.json["created"]] == [
+        ("Beard", "1:00:00")
+    ]
+    assert res.json["errors"] == [
+        {"index": 0, "message": "price must be an integer"},
+        {"index": 2, "message": "could not convert string to float: 'forever'"},
+    ]
+
+
+def test_create_batch_requires_array(client, session_factory):
+    res = client.post("api/clients:batch", json={"first_name": "Samwell"})
+    assert res.status_code == 400
+
+
+def add_appointments(session_factory, count: int):
+    session = session_factory()
+    jon = domain.Employee("Jon", "Snow")
+    clients = [domain.Client("Samwell", "Tarly"), domain.Client("Jorah", "Mormont")]
+    haircut = domain.Service("haircut", 5000)
+    beard = domain.Service("Beard", 2500, duration=timedelta(minutes=30))
+    session.add_all([jon, haircut, beard, *clients])
+    session.flush()
+    for index in range(count):
+        appointment = domain.Appointment(
+            client_id=clients[index % 2].id,
+            services={haircut, beard},
+            scheduled_at=datetime(2026, 10, 18 + index % 2, 9),
+        )
+        if index % 3 == 0:
+            appointment.complete(jon)
+        session.add(appointment)
+    session.commit()
+
+
+@pytest.fixture
+def statements(in_memory_db):
+    executed = []
+
+    def capture(conn, cursor, statement, *args):
+        executed.append(statement)
+
+    event.listen(in_memory_db, "before_cursor_execute", capture)
+    yield executed
+    event.remove(in_memory_db, "before_cursor_execute", capture)
+
+
+def test_list_appointments(client, session_factory):
+    add_appointments(session_factory, 2)
+    res = client.get("api/appointments")
+    assert res.status_code == 200
+    first = res.json[0]
+    assert first["status"] == "completed"
+    assert first["updated_by"]["first_name"] == "Jon"
+    assert first["scheduled_at"] == "2026-10-18T09:00:00"
+    assert [service["name"] for service in first["services"]] == ["haircut", "Beard"]
+    assert first["total_price"] == 7500
+    assert first["total_duration"] == "1:30:00"
+    assert res.json[1]["updated_by"] is None
+
+
+def test_list_appointments_filters(client, session_factory):
+    add_appointments(session_factory, 6)
+    res = client.get("api/appointments?status=completed")
+    assert [item["id"] for item in res.json] == [1, 4]
+    res = client.get("api/appointments?client_id=2&date=2026-10-19")
+    assert [item["id"] for item in res.json] == [2, 4, 6]
+    res = client.get("api/appointments?status=unknown")
+    assert res.status_code == 400
+
+
+@pytest.mark.parametrize("count", [3, 30])
+def test_list_appointments_query_count(client, session_factory, statements, count):
+    add_appointments(session_factory, count)
+    statements.clear()
+    res = client.get(f"api/appointments?limit={count}")
+    assert len(res.json) == count
+    # The appointments and their services, and the archived appointments
+    assert len(statements) == 3
+    statements.clear()
+    client.get(f"api/appointments?limit={count}&status=pending")
+    # Pending appointments are never archived
+    assert len(statements) == 2
+
+
+def test_list_appointments_by_total_price(client, session_factory):
+    add_appointments(session_factory, 2)
+    res = client.get("api/appointments?min_price=7500&max_price=7500")
+    assert len(res.json) == 2
+    res = client.get("api/appointments?min_price=7501")
+    assert res.json == []
+
+
+def test_create_app_defers_database_setup():
+    snippet = (
+        "import sys\n"
+        "from agenda_api.app import create_app\n"
+        "app = create_app()\n"
+        "assert 'sqlalchemy' not in sys.modules\n"
+        "assert 'agenda_api.resources.clients' not in sys.modules\n"
+        "assert not any(rule.endpoint.startswith('clients') "
+        "for rule in app.url_map.iter_rules())\n"
+    )
+    subprocess.run([sys.executable, "-c", snippet], check=True)
+
+
+def test_create_app_registers_resources_on_first_request(session):
+    app = create_app()
+    assert "clients" not in app.blueprints
+    app.test_client().get("/invalid_path")
+    assert set(app.blueprints) == {
+        "clients",
+        "employees",
+        "services",
+        "appointments",
+        "reports",
+        "commands",
+    }
+
+
+def test_create_app_eager_setup(session):
+    app = create_app(resources=["agenda_api.resources.services"], lazy=False)
+    assert set(app.blueprints) == {"services"}
+
+
+def test_dispatch_commands(client, session_factory):
+    res = client.post(
+        "/api/commands",
+        json={
+            "commands": [
+                {"type": "CreateClient", "first_name": "Jon", "last_name": "Snow"},
+                {"type": "CreateService", "name": "haircut", "price": 5000},
+                {"type": "CreateAppointment", "client_id": 1, "service_ids": [1]},
+            ]
+        },
+    )
+    assert res.status_code == 200
+    assert res.json["committed"]
+    results = res.json["results"]
+    assert [result["status"] for result in results] == ["done"] * 3
+    assert results[2]["result"]["services"][0]["name"] == "haircut"
+
+
+def test_dispatch_commands_best_effort(client, session_factory):
+    res = client.post(
+        "/api/commands",
+        json={
+            "mode": "best_effort",
+            "commands": [
+                {"type": "CreateClient", "first_name": "Jon", "last_name": "Snow"},
+                {"type": "CancelAppointment", "appointment_id": 1, "employee_id": 1},
+            ],
+        },
+    )
+    assert res.status_code == 207
+    assert [r["status"] for r in res.json["results"]] == ["done", "failed"]
+    assert res.json["results"][1]["error"] == "Appointment with id 1 not found"
+
+
+def test_dispatch_commands_rejects_unknown_types(client):
+    res = client.post("/api/commands", json={"commands": [{"type": "DropTables"}]})
+    assert res.status_code == 400
+
+
+def test_metrics_record_queries_per_route(client, employees):
+    instrumentation.METRICS.reset()
+    client.get("/api/employees")
+    client.get("/api/employees")
+
+    # Both read the table versions, the second is then served from memory
+    queries = instrumentation.REQUEST_QUERIES.snapshot(
+        method="GET", route="/api/employees"
+    )
+    assert queries == {"sum": 3, "count": 2}
+    res = client.get("/metrics")
+    assert res.status_code == 200
+    body = res.get_data(as_text=True)
+    assert (
+        'agenda_http_request_duration_seconds_count{method="GET",'
+        'route="/api/employees",status="200"} 2'
+    ) in body
+    assert (
+        'agenda_http_request_queries_sum{method="GET",route="/api/employees"} 3' in body
+    )
+
+
+def test_query_count_header(session, session_factory, mocker, monkeypatch):
+    mocker.patch(
+        "agenda_api.services.unitofwork.DEFAULT_SESSION_FACTORY", session_factory
+    )
+    monkeypatch.setenv("METRICS_QUERY_COUNT_HEADER", "true")
+    res = create_app().test_client().get("/api/clients")
+    assert res.headers["X-Query-Count"] == "1"
+
+    monkeypatch.delenv("METRICS_QUERY_COUNT_HEADER")
+    res = create_app().test_client().get("/api/clients")
+    assert "X-Query-Count" not in res.headers
+
+
+def test_list_answers_if_none_match_without_the_query(client, employees, statements):
+    res = client.get("/api/employees")
+    etag = res.headers["ETag"]
+    assert res.headers["Cache-Control"] == "no-cache"
+
+    statements.clear()
+    res = client.get("/api/employees", headers={"If-None-Match": etag})
+    assert res.status_code == 304
+    assert res.headers["ETag"] == etag
+    assert res.data == b""
+    # Only the table versions were read
+    assert len(statements) == 1
+
+
+def test_list_etag_changes_with_the_table(client, session_factory, employees):
+    etag = client.get("/api/employees").headers["ETag"]
+    assert client.get("/api/services").headers["ETag"] != etag
+    client.post("/api/services", json={"name": "haircut", "price": 5000})
+    assert client.get("/api/employees").headers["ETag"] == etag
+
+    session = session_factory()
+    session.add(domain.Employee("Arya", "Stark"))
+    session.commit()
+    res = client.get("/api/employees", headers={"If-None-Match": etag})
+    assert res.status_code == 200
+    assert res.headers["ETag"] != etag
+    assert len(res.json) == 3
+
+
+def test_unchanged_list_is_served_from_memory(client, employees, statements):
+    res = client.get("/api/employees?limit=1")
+    statements.clear()
+    cached = client.get("/api/employees?limit=1")
+    assert len(statements) == 1
+    assert cached.json == res.json
+    assert cached.headers["X-Next-Cursor"] == res.headers["X-Next-Cursor"]
+    assert cached.headers["Content-Type"] == "application/json"
+    assert client.get("/api/employees?limit=2").json != res.json
+
+
+def test_search_clients(client):
+    for first_name, last_name in (("Jon", "Snow"), ("Arya", "Stark")):
+        client.post(
+            "/api/clients", json={"first_name": first_name, "last_name": last_name}
+        )
+    res = client.get("/api/clients/search?q=sno")
+    assert res.status_code == 200
+    assert [item["first_name"] for item in res.json] == ["Jon"]
+    res = client.get("/api/clients/search?q=tar&fuzzy=true")
+    assert [item["first_name"] for item in res.json] == ["Arya"]
+    assert client.get("/api/clients/search?q=tar").json == []
+    assert client.get("/api/clients/search?q=%20").status_code == 400
+
+
+def test_revenue_report(client):
+    client.post(
+        "/api/commands",
+        json={
+            "commands": [
+                {"type": "CreateEmployee", "first_name": "Jon", "last_name": "Snow"},
+                {"type": "CreateClient", "first_name": "Arya", "last_name": "Stark"},
+                {"type": "CreateService", "name": "haircut", "price": 5000},
+                {
+                    "type": "CreateAppointment",
+                    "client_id": 1,
+                    "service_ids": [1],
+                    "scheduled_at": "2026-01-05T09:00:00",
+                },
+                {"type": "CompleteAppointment", "appointment_id": 1, "employee_id": 1},
+            ]
+        },
+    )
+
+    res = client.get("/api/reports/revenue?start=2026-01-01&end=2026-01-31")
+    assert res.status_code == 200
+    assert res.json["days"] == [
+        {
+            "employee_id": 1,
+            "day": "2026-01-05",
+            "completed": 1,
+            "canceled": 0,
+            "revenue": 5000,
+        }
+    ]
+    assert res.json["total"] == {"completed": 1, "canceled": 0, "revenue": 5000}
+    res = client.get("/api/reports/revenue?start=2026-02-01&end=2026-02-28")
+    assert res.json["days"] == []
+    assert client.get("/api/reports/revenue?start=2026-01-01").status_code == 400
+    res = client.get("/api/reports/revenue?start=2026-01-01&end=2027-06-01")
+    assert res.status_code == 400
+
+
+def test_status_change_on_outdated_version(client):
+    res = client.post(
+        "/api/commands",
+        json={
+            "commands": [
+                {"type": "CreateEmployee", "first_name": "Jon", "last_name": "Snow"},
+                {"type": "CreateClient", "first_name": "Arya", "last_name": "Stark"},
+                {"type": "CreateService", "name": "haircut", "price": 5000},
+                {"type": "CreateAppointment", "client_id": 1, "service_ids": [1]},
+            ]
+        },
+    )
+    assert res.json["results"][3]["result"]["version"] == 1
+
+    complete = {"type": "CompleteAppointment", "appointment_id": 1, "employee_id": 1}
+    res = client.post("/api/commands", json={"commands": [{**complete, "version": 1}]})
+    assert res.status_code == 200
+    res = client.post("/api/commands", json={"commands": [{**complete, "version": 1}]})
+    assert res.status_code == 400
+    assert res.json["results"][0]["error"] == (
+        "Appointment with id 1 is at version 2, not 1"
+    )
+
+
+def test_complete_appointments(client):
+    client.post(
+        "/api/commands",
+        json={
+            "commands": [
+                {"type": "CreateEmployee", "first_name": "Jon", "last_name": "Snow"},
+                {"type": "CreateClient", "first_name": "Arya", "last_name": "Stark"},
+                {"type": "CreateService", "name": "haircut", "price": 5000},
+                {"type": "CreateAppointment", "client_id": 1, "service_ids": [1]},
+                {"type": "CreateAppointment", "client_id": 1, "service_ids": [1]},
+                {"type": "CancelAppointment", "appointment_id": 2, "employee_id": 1},
+            ]
+        },
+    )
+
+    res = client.post(
+        "/api/appointments:complete", json={"appointment_ids": [1], "employee_id": 1}
+    )
+    assert res.status_code == 200
+    assert res.json == {"changed": [1], "rejected": []}
+    res = client.post(
+        "/api/appointments:complete",
+        json={"appointment_ids": [1, 2], "employee_id": 1},
+    )
+    assert res.status_code == 207
+    assert res.json["rejected"] == [
+        {"id": 2, "message": "Cannot complete an appointment with status canceled"}
+    ]
+    res = client.post(
+        "/api/appointments:complete", json={"appointment_ids": [2], "employee_id": 1}
+    )
+    assert res.status_code == 400
+    res = client.post(
+        "/api/appointments:complete", json={"appointment_ids": [1], "employee_id": 9}
+    )
+    assert res.status_code == 404
+    res = client.post("/api/appointments:complete", json={"appointment_ids": ["1"]})
+    assert res.status_code == 400
+
+
+def test_request_opens_one_session_on_first_use(session, session_factory, mocker):
+    opened = []
+
+    def open_session():
+        opened.append(session_factory())
+        return opened[-1]
+
+    mocker.patch("agenda_api.services.unitofwork.DEFAULT_SESSION_FACTORY", open_session)
+    client = create_app(debug=True).test_client()
+
+    assert client.get("/api/clients/search").status_code == 400
+    assert opened == []
+    # The ETag check and the listing share the session of the request
+    assert client.get("/api/clients").status_code == 200
+    assert len(opened) == 1
+    assert not opened[0].in_transaction()
+
+
+def test_request_unit_of_work_ends_with_the_request(session, session_factory, mocker):
+    from agenda_api.resources._uow import request_uow
+    from agenda_api.services.errors import EntityNotFound
+
+    mocker.patch(
+        "agenda_api.services.unitofwork.DEFAULT_SESSION_FACTORY", session_factory
+    )
+    app = create_app(debug=True, lazy=False)
+
+    @app.route("/api/clients:import", methods=["POST"])
+    def import_client():
+        request_uow().clients.save(domain.Client(**request.json))
+        if request.args.get("fail"):
+            raise EntityNotFound()
+        return {}, 201
+
+    @app.route("/api/appointments:import", methods=["POST"])
+    def import_appointments():
+        # Overlapping, which only the commit finds out
+        uow = request_uow()
+        service = domain.Service("haircut", 5000)
+        for hour in (9, 9):
+            uow.appointments.save(
+                domain.Appointment(
+                    client_id=1,
+                    services={service},
+                    employee_id=1,
+                    scheduled_at=datetime(2026, 10, 18, hour),
+                )
+            )
+        return {}, 201
+
+    client = app.test_client()
+    body = {"first_name": "Arya", "last_name": "Stark"}
+    assert client.post("/api/clients:import?fail=1", json=body).status_code == 404
+    assert client.post("/api/clients:import", json=body).status_code == 201
+    assert [item["first_name"] for item in client.get("/api/clients").json] == ["Arya"]
+
+    res = client.post("/api/appointments:import")
+    assert res.status_code == 409
+    assert client.get("/api/appointments").json == []
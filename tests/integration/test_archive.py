@@ -0,0 +1,149 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, func, select
+
+from agenda_api import domain
+from agenda_api.adapters import archive, rollups
+from agenda_api.adapters.orm import (
+    appointment_services_table,
+    appointments_archive_table,
+    appointments_table,
+    metadata,
+)
+from agenda_api.cli import main
+from agenda_api.serializers import serialize_appointment
+from agenda_api.services import commands
+from agenda_api.services.handlers import complete_appointment
+from agenda_api.services.unitofwork import UnitOfWork
+
+CUTOFF = datetime(2025, 1, 1)
+
+
+@pytest.fixture
+def appointments(session):
+    employee = domain.Employee("Jon", "Snow")
+    client = domain.Client("Arya", "Stark")
+    haircut, beard = domain.Service("haircut", 5000), domain.Service("beard", 2000)
+    session.add_all([employee, client, haircut, beard])
+    session.flush()
+    scheduled = [
+        (datetime(2024, 3, 1, 9), domain.AppointmentStatus.COMPLETED),
+        (datetime(2024, 4, 1, 9), domain.AppointmentStatus.CANCELED),
+        (datetime(2024, 5, 1, 9), domain.AppointmentStatus.PENDING),
+        (datetime(2025, 6, 1, 9), domain.AppointmentStatus.COMPLETED),
+    ]
+    appointments = []
+    for scheduled_at, status in scheduled:
+        appointment = domain.Appointment(
+            client_id=client.id,
+            services={haircut, beard},
+            employee_id=employee.id,
+            scheduled_at=scheduled_at,
+        )
+        if status is domain.AppointmentStatus.COMPLETED:
+            appointment.complete(employee)
+        elif status is domain.AppointmentStatus.CANCELED:
+            appointment.cancel(employee)
+        appointments.append(appointment)
+    session.add_all(appointments)
+    session.commit()
+    return appointments
+
+
+def _count(connection, table) -> int:
+    return connection.execute(select(func.count()).select_from(table)).scalar()
+
+
+def _find(session_factory, **filters):
+    uow = UnitOfWork(session_factory)
+    with uow:
+        return [
+            serialize_appointment(item) for item in uow.appointments.find(**filters)
+        ]
+
+
+def test_archive_moves_finished_appointments(in_memory_db, appointments):
+    with in_memory_db.begin() as connection:
+        assert archive.archive_batch(connection, CUTOFF, batch_size=1) == 1
+        assert archive.archive_batch(connection, CUTOFF) == 1
+        assert archive.archive_batch(connection, CUTOFF) == 0
+
+        assert _count(connection, appointments_table) == 2
+        assert _count(connection, appointment_services_table) == 4
+        archived = connection.execute(
+            select(appointments_archive_table).order_by(appointments_archive_table.c.id)
+        ).all()
+    assert [row.id for row in archived] == [appointments[0].id, appointments[1].id]
+    assert [service["name"] for service in archived[0].services] == [
+        "haircut",
+        "beard",
+    ]
+    assert archived[0].total_price == 7000
+
+
+def test_find_merges_archived_appointments(in_memory_db, session_factory, appointments):
+    before = _find(session_factory)
+    with in_memory_db.begin() as connection:
+        archive.archive_batch(connection, CUTOFF)
+
+    assert _find(session_factory) == before
+    assert _find(session_factory, limit=2, after=appointments[0].id) == before[1:3]
+    assert _find(session_factory, day=date(2024, 3, 1)) == before[:1]
+    completed = _find(session_factory, status=domain.AppointmentStatus.COMPLETED)
+    assert [item["id"] for item in completed] == [
+        appointments[0].id,
+        appointments[3].id,
+    ]
+    pending = _find(session_factory, status=domain.AppointmentStatus.PENDING)
+    assert [item["id"] for item in pending] == [appointments[2].id]
+
+
+def test_get_restores_archived_appointment(in_memory_db, session_factory, appointments):
+    with in_memory_db.begin() as connection:
+        archive.archive_batch(connection, CUTOFF)
+    employee_id = appointments[0].updated_by.id
+
+    uow = UnitOfWork(session_factory)
+    with uow:
+        complete_appointment(
+            uow, commands.CompleteAppointment(appointments[0].id, employee_id)
+        )
+        uow.commit()
+
+    with in_memory_db.connect() as connection:
+        assert _count(connection, appointments_archive_table) == 1
+    uow = UnitOfWork(session_factory)
+    with uow:
+        restored = uow.appointments.get(appointments[0].id)
+        assert {service.name for service in restored.services} == {"haircut", "beard"}
+        assert restored.status == domain.AppointmentStatus.COMPLETED
+
+
+def test_rollup_rebuild_counts_archived_appointments(in_memory_db, appointments):
+    with in_memory_db.begin() as connection:
+        rollups.rebuild(connection)
+        expected = rollups.report(connection, date(2024, 1, 1), date(2025, 12, 31))
+        archive.archive_batch(connection, CUTOFF)
+        rollups.rebuild(connection)
+        assert (
+            rollups.report(connection, date(2024, 1, 1), date(2025, 12, 31)) == expected
+        )
+    assert len(expected) == 3
+
+
+def test_cli_archive(tmp_path, capsys):
+    database_url = f"sqlite:///{tmp_path / 'agenda.db'}"
+    metadata.create_all(create_engine(database_url))
+
+    assert main(["--database-url", database_url, "archive"]) == 0
+    before = date.today() - timedelta(days=365)
+    assert f"Archived 0 appointments scheduled before {before}" in (
+        capsys.readouterr().err
+    )
+
+
+def test_month_partition_bounds():
+    assert archive.month_start(date(2024, 12, 31)) == date(2024, 12, 1)
+    assert archive.next_month(date(2024, 12, 31)) == date(2025, 1, 1)
+    assert archive.next_month(date(2024, 1, 31)) == date(2024, 2, 1)
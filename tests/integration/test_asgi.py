@@ -0,0 +1,208 @@
+import asyncio
+import json
+
+import pytest
+
+from agenda_api import domain
+from agenda_api.asgi import AgendaApp
+
+
+@pytest.fixture
+def app(async_session_factory, mocker):
+    mocker.patch(
+        "agenda_api.services.unitofwork.DEFAULT_ASYNC_SESSION_FACTORY",
+        async_session_factory,
+    )
+    return AgendaApp()
+
+
+async def request(app, method, path, query="", body=None, headers=None):
+    messages = [
+        {
+            "type": "http.request",
+            "body": json.dumps(body).encode() if body is not None else b"",
+        }
+    ]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "query_string": query.encode(),
+        "headers": [
+            (name.lower().encode(), value.encode())
+            for name, value in (headers or {}).items()
+        ],
+    }
+    await app(scope, receive, send)
+    start, response = sent
+    headers = {name.decode(): value.decode() for name, value in start["headers"]}
+    body = json.loads(response["body"]) if response["body"] else None
+    return start["status"], headers, body
+
+
+def call(app, method, path, query="", body=None, headers=None):
+    return asyncio.run(request(app, method, path, query, body, headers))
+
+
+def test_create_and_list_clients(app):
+    status, _, client = call(
+        app,
+        "POST",
+        "/api/clients",
+        body={"first_name": "Samwell", "last_name": "Tarly"},
+    )
+    assert status == 201
+    assert client["id"]
+
+    status, _, clients = call(app, "GET", "/api/clients")
+    assert status == 200
+    assert clients == [client]
+
+
+def test_list_paginated(app):
+    for name in ("Jon", "Arya", "Bran"):
+        call(
+            app,
+            "POST",
+            "/api/employees",
+            body={"first_name": name, "last_name": "Stark"},
+        )
+
+    status, headers, page = call(app, "GET", "/api/employees", "limit=2")
+    assert status == 200
+    assert [e["first_name"] for e in page] == ["Jon", "Arya"]
+
+    _, _, page = call(app, "GET", "/api/employees", f"after={headers['x-next-cursor']}")
+    assert [e["first_name"] for e in page] == ["Bran"]
+
+
+def test_create_services_batch(app):
+    status, _, body = call(
+        app,
+        "POST",
+        "/api/services:batch",
+        body=[{"name": "haircut", "price": 5000}, {"name": "shave"}],
+    )
+    assert status == 207
+    assert [service["name"] for service in body["created"]] == ["haircut"]
+    assert body["errors"][0]["index"] == 1
+
+
+def test_list_appointments(app, async_session_factory):
+    async def add_appointment():
+        session = async_session_factory()
+        service = domain.Service("haircut", 5000)
+        session.add(domain.Appointment(client_id=1, services={service}))
+        await session.commit()
+        await session.close()
+
+    asyncio.run(add_appointment())
+    status, _, appointments = call(app, "GET", "/api/appointments", "min_price=5000")
+    assert status == 200
+    assert appointments[0]["services"][0]["name"] == "haircut"
+    assert appointments[0]["total_price"] == 5000
+
+
+def test_cancel_appointments(app, async_session_factory):
+    async def add_appointment():
+        session = async_session_factory()
+        session.add(domain.Appointment(client_id=1, services=set()))
+        await session.commit()
+        await session.close()
+
+    asyncio.run(add_appointment())
+    call(app, "POST", "/api/employees", body={"first_name": "Jon", "last_name": "Snow"})
+    status, _, body = call(
+        app,
+        "POST",
+        "/api/appointments:cancel",
+        body={"appointment_ids": [1, 2], "employee_id": 1},
+    )
+    assert status == 207
+    assert body == {
+        "changed": [1],
+        "rejected": [{"id": 2, "message": "Appointment with id 2 not found"}],
+    }
+    status, _, _ = call(
+        app, "POST", "/api/appointments:cancel", body={"appointment_ids": [1]}
+    )
+    assert status == 400
+
+
+def test_invalid_arguments(app):
+    status, _, body = call(app, "GET", "/api/appointments", "status=unknown")
+    assert status == 400
+    status, _, _ = call(app, "POST", "/api/clients", body={"name": "Samwell"})
+    assert status == 400
+
+
+def test_not_found(app):
+    assert call(app, "GET", "/invalid_path")[0] == 404
+    assert call(app, "DELETE", "/api/clients")[0] == 405
+
+
+def test_concurrent_requests(app):
+    async def scenario():
+        return await asyncio.gather(
+            *(request(app, "GET", "/api/clients") for _ in range(20))
+        )
+
+    responses = asyncio.run(scenario())
+    assert [status for status, _, _ in responses] == [200] * 20
+
+
+def test_list_answers_if_none_match(app):
+    _, headers, _ = call(app, "GET", "/api/services")
+    etag = headers["etag"]
+    status, _, body = call(app, "GET", "/api/services", headers={"If-None-Match": etag})
+    assert (status, body) == (304, None)
+
+    call(app, "POST", "/api/services", body={"name": "haircut", "price": 5000})
+    status, headers, services = call(
+        app, "GET", "/api/services", headers={"If-None-Match": etag}
+    )
+    assert status == 200
+    assert headers["etag"] != etag
+    assert len(services) == 1
+
+
+def test_search_clients(app):
+    call(app, "POST", "/api/clients", body={"first_name": "Jon", "last_name": "Snow"})
+    status, _, clients = call(app, "GET", "/api/clients/search", query="q=jo")
+    assert status == 200
+    assert [client["last_name"] for client in clients] == ["Snow"]
+    status, _, _ = call(app, "GET", "/api/clients/search")
+    assert status == 400
+
+
+def test_revenue_report(app):
+    status, _, report = call(
+        app, "GET", "/api/reports/revenue", query="start=2026-01-01&end=2026-01-31"
+    )
+    assert status == 200
+    assert report["days"] == []
+    assert report["total"] == {"completed": 0, "canceled": 0, "revenue": 0}
+    status, _, _ = call(app, "GET", "/api/reports/revenue", query="start=2026-01-01")
+    assert status == 400
+
+
+def test_websocket_is_closed(app):
+    messages = [{"type": "websocket.connect"}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app({"type": "websocket", "path": "/api/clients"}, receive, send))
+    assert sent == [{"type": "websocket.close", "code": 1008}]
@@ -0,0 +1,46 @@
+import json
+import subprocess
+import sys
+
+
+def test_benchmark_run_reports_every_endpoint(tmp_path):
+    report_path = tmp_path / "report.json"
+    subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "benchmarks.run",
+            "--clients=20",
+            "--appointments=200",
+            "--employees=5",
+            "--services=3",
+            "--repeat=2",
+            f"--output={report_path}",
+        ],
+        check=True,
+        capture_output=True,
+    )
+    report = json.loads(report_path.read_text())
+    assert report["meta"]["volumes"]["appointments"] == 200
+    assert report["uncovered_endpoints"] == []
+    assert "handlers.create_appointment" in report["benchmarks"]
+    assert report["benchmarks"]["GET /api/clients"]["runs"] == 2
+
+
+def test_benchmark_compare_flags_regressions():
+    from benchmarks.run import compare
+
+    baseline = {"benchmarks": {"GET /api/clients": {"median_ms": 2.0}}}
+    report = {"benchmarks": {"GET /api/clients": {"median_ms": 3.0}}}
+    assert compare(baseline, report, threshold=1.2) == [
+        "GET /api/clients: 2.0ms -> 3.0ms (1.50x)"
+    ]
+    assert compare(baseline, report, threshold=2) == []
+
+
+def test_serializer_benchmark_reports_every_domain_class(capsys):
+    from benchmarks.serializers import main
+
+    assert main(["--items=10", "--repeat=1"]) == 0
+    report = json.loads(capsys.readouterr().out)
+    assert set(report["results"]) == {"Employee", "Client", "Service", "Appointment"}
@@ -0,0 +1,205 @@
+import io
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, select
+
+from agenda_api import domain
+from agenda_api.adapters import bulkload
+from agenda_api.adapters.orm import (
+    appointment_services_table,
+    appointments_table,
+    clients_table,
+    employees_table,
+    metadata,
+    services_table,
+)
+from agenda_api.cli import main
+
+
+def test_load_csv(in_memory_db):
+    stream = io.StringIO("first_name,last_name\nJon,Snow\nArya,Stark\nSansa,Stark\n")
+    reports = []
+    with in_memory_db.begin() as connection:
+        report = bulkload.load(
+            connection,
+            clients_table,
+            bulkload.read_records(stream, "csv"),
+            batch_size=2,
+            progress=reports.append,
+        )
+        rows = connection.execute(select(clients_table.c.first_name)).fetchall()
+
+    assert report.rows == 3
+    assert len(reports) == 2
+    assert [row.first_name for row in rows] == ["Jon", "Arya", "Sansa"]
+
+
+def test_load_ndjson_coerces_columns(in_memory_db):
+    services = io.StringIO(
+        '{"id": 7, "name": "haircut", "price": 5000, "duration": "1:30:00"}\n'
+        "\n"
+        '{"id": 8, "name": "Beard", "price": "2500", "duration": 900}\n'
+    )
+    appointments = io.StringIO(
+        '{"id": 1, "client_id": 1, "status": "completed", '
+        '"scheduled_at": "2020-01-02T10:00:00", "updated_by_id": ""}\n'
+        '{"id": 2, "client_id": 1, "status": "CANCELED", "unknown": "ignored"}\n'
+    )
+    with in_memory_db.begin() as connection:
+        bulkload.load(
+            connection, services_table, bulkload.read_records(services, "ndjson")
+        )
+        bulkload.load(
+            connection,
+            appointments_table,
+            bulkload.read_records(appointments, "ndjson"),
+        )
+        services = connection.execute(select(services_table)).fetchall()
+        appointments = connection.execute(select(appointments_table)).fetchall()
+
+    assert [(row.id, row.duration) for row in services] == [
+        (7, timedelta(hours=1, minutes=30)),
+        (8, timedelta(minutes=15)),
+    ]
+    assert [row.status for row in appointments] == [
+        domain.AppointmentStatus.COMPLETED,
+        domain.AppointmentStatus.CANCELED,
+    ]
+    assert appointments[0].scheduled_at == datetime(2020, 1, 2, 10)
+    assert appointments[0].updated_by_id is None
+
+
+def test_load_records_giving_different_columns(in_memory_db):
+    appointments = io.StringIO(
+        '{"id": 1, "client_id": 1, "status": "pending", "version": 3}\n'
+        '{"id": 2, "client_id": 1, "status": "pending", "employee_id": 4, '
+        '"scheduled_at": "2026-01-05T09:00:00"}\n'
+        '{"id": 3, "client_id": 1, "status": "pending", "employee_id": 5}\n'
+    )
+    with in_memory_db.begin() as connection:
+        bulkload.load(
+            connection,
+            appointments_table,
+            bulkload.read_records(appointments, "ndjson"),
+        )
+        rows = connection.execute(
+            select(appointments_table).order_by(appointments_table.c.id)
+        ).fetchall()
+
+    assert [row.employee_id for row in rows] == [None, 4, 5]
+    assert [row.scheduled_at for row in rows] == [
+        None,
+        datetime(2026, 1, 5, 9),
+        None,
+    ]
+    assert [row.version for row in rows] == [3, 1, 1]
+
+
+def test_cli_import(tmp_path, capsys):
+    database_url = f"sqlite:///{tmp_path / 'agenda.db'}"
+    metadata.create_all(create_engine(database_url))
+    path = tmp_path / "employees.csv"
+    path.write_text("first_name,last_name\nJon,Snow\nYgritte,Snow\n")
+
+    assert main(["--database-url", database_url, "import", "employees", str(path)]) == 0
+
+    assert "Loaded 2 rows into employees" in capsys.readouterr().err
+    with create_engine(database_url).connect() as connection:
+        count = connection.exec_driver_sql("SELECT COUNT(*) FROM employees").scalar()
+    assert count == 2
+
+
+def test_refresh_appointment_totals(in_memory_db):
+    with in_memory_db.begin() as connection:
+        bulkload.load(
+            connection,
+            services_table,
+            [
+                {"id": 1, "name": "haircut", "price": 5000, "duration": 3600},
+                {"id": 2, "name": "Beard", "price": 2500, "duration": 1800},
+            ],
+        )
+        bulkload.load(
+            connection,
+            appointments_table,
+            [
+                {
+                    "id": 1,
+                    "client_id": 1,
+                    "status": "completed",
+                    "scheduled_at": "2020-01-02T10:00:00",
+                },
+                {"id": 2, "client_id": 1, "status": "completed"},
+            ],
+        )
+        bulkload.load(
+            connection,
+            appointment_services_table,
+            [
+                {"appointment_id": 1, "service_id": 1},
+                {"appointment_id": 1, "service_id": 2},
+            ],
+        )
+        assert bulkload.refresh_appointment_totals(connection) == 1
+        rows = connection.execute(
+            select(appointments_table).order_by(appointments_table.c.id)
+        ).fetchall()
+
+    assert rows[0].total_price == 7500
+    assert rows[0].total_duration == timedelta(hours=1, minutes=30)
+    assert rows[0].ends_at == datetime(2020, 1, 2, 11, 30)
+    assert rows[1].total_price is None
+
+
+def test_copy_appointments_before_their_totals():
+    url = os.environ.get("AGENDA_TEST_POSTGRES_URL")
+    if not url:
+        pytest.skip("AGENDA_TEST_POSTGRES_URL is not set")
+    engine = create_engine(url)
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+    try:
+        with engine.begin() as connection:
+            bulkload.load(connection, employees_table, [{"id": 1, **_person()}])
+            bulkload.load(connection, clients_table, [{"id": 1, **_person()}])
+            bulkload.load(
+                connection,
+                services_table,
+                [{"id": 1, "name": "haircut", "price": 5000, "duration": 3600}],
+            )
+            # Loaded without ends_at, the bookings must not collide yet
+            bulkload.load(
+                connection,
+                appointments_table,
+                [
+                    {
+                        "id": index,
+                        "client_id": 1,
+                        "employee_id": 1,
+                        "status": "pending",
+                        "scheduled_at": f"2026-01-05T{hour:02}:00:00",
+                    }
+                    for index, hour in ((1, 9), (2, 10))
+                ],
+            )
+            bulkload.load(
+                connection,
+                appointment_services_table,
+                [
+                    {"appointment_id": 1, "service_id": 1},
+                    {"appointment_id": 2, "service_id": 1},
+                ],
+            )
+            assert bulkload.refresh_appointment_totals(connection) == 2
+            ends = connection.execute(
+                select(appointments_table.c.ends_at).order_by(appointments_table.c.id)
+            ).scalars()
+            assert list(ends) == [datetime(2026, 1, 5, 10), datetime(2026, 1, 5, 11)]
+    finally:
+        metadata.drop_all(engine)
+
+
+def _person():
+    return {"first_name": "Jon", "last_name": "Snow"}
@@ -0,0 +1,94 @@
+import pytest
+from sqlalchemy import event
+
+from agenda_api import domain
+from agenda_api.adapters.cache import EntityCache
+from agenda_api.adapters.repositories import ClientRepository, ServiceRepository
+from agenda_api.services import commands
+from agenda_api.services.handlers import create_appointment
+from agenda_api.services.unitofwork import UnitOfWork
+
+
+@pytest.fixture
+def caches(session):
+    return {
+        "employees": EntityCache(domain.Employee),
+        "services": EntityCache(domain.Service),
+    }
+
+
+@pytest.fixture
+def statements(in_memory_db):
+    executed = []
+
+    def capture(conn, cursor, statement, *args):
+        executed.append(statement)
+
+    event.listen(in_memory_db, "before_cursor_execute", capture)
+    yield executed
+    event.remove(in_memory_db, "before_cursor_execute", capture)
+
+
+@pytest.fixture
+def haircut(session_factory) -> domain.Service:
+    repo = ServiceRepository(session=session_factory())
+    service = domain.Service("haircut", 5000)
+    repo.save(service)
+    repo.commit()
+    return service
+
+
+def test_get_reads_through_cache(session_factory, caches, haircut, statements):
+    uow = UnitOfWork(session_factory, caches=caches)
+    with uow:
+        assert uow.services.get(haircut.id).name == "haircut"
+    with uow:
+        statements.clear()
+        service = uow.services.get(haircut.id)
+        assert service.name == "haircut"
+        assert service in uow.session
+        assert statements == []
+
+    stats = caches["services"].stats
+    assert (stats.hits, stats.misses) == (1, 1)
+
+
+def test_create_appointment_uses_cached_services(
+    session_factory, caches, haircut, statements
+):
+    client = domain.Client("Jon", "Snow")
+    repo = ClientRepository(session=session_factory())
+    repo.save(client)
+    repo.commit()
+
+    uow = UnitOfWork(session_factory, caches=caches)
+    for _ in range(2):
+        with uow:
+            statements.clear()
+            cmd = commands.CreateAppointment(
+                client_id=client.id, service_ids={haircut.id}
+            )
+            create_appointment(uow, cmd)
+            uow.commit()
+
+    assert not any("FROM services" in statement for statement in statements)
+    assert caches["services"].stats.hits == 1
+
+    repo = ServiceRepository(session=session_factory())
+    assert repo.filter().count() == 1
+
+
+def test_cache_invalidated_on_commit(session_factory, caches, haircut):
+    uow = UnitOfWork(session_factory, caches=caches)
+    with uow:
+        uow.services.get(haircut.id).price = 6000
+        uow.commit()
+    assert caches["services"].backend.get(haircut.id) is None
+    with uow:
+        assert uow.services.get(haircut.id).price == 6000
+
+    with uow:
+        uow.services.get(haircut.id).price = 7000
+        uow.rollback()
+    with uow:
+        assert uow.services.get(haircut.id).price == 6000
@@ -0,0 +1,159 @@
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import create_engine
+
+from agenda_api import domain
+from agenda_api.adapters import rollups
+from agenda_api.adapters.orm import metadata
+from agenda_api.adapters.repositories import AppointmentRepository
+from agenda_api.cli import main
+from agenda_api.domain.errors import StaleAppointment
+from agenda_api.services import commands
+from agenda_api.services.handlers import (
+    cancel_appointment,
+    cancel_appointments,
+    complete_appointment,
+    complete_appointments,
+)
+from agenda_api.services.unitofwork import UnitOfWork
+
+DAY = date(2026, 1, 5)
+
+
+def _setup(session):
+    jon, arya = domain.Employee("Jon", "Snow"), domain.Employee("Arya", "Stark")
+    haircut = domain.Service("haircut", 5000)
+    client = domain.Client("Sansa", "Stark")
+    session.add_all([jon, arya, haircut, client])
+    session.flush()
+    appointments = [
+        domain.Appointment(
+            client_id=client.id,
+            services={haircut},
+            scheduled_at=datetime(2026, 1, 5, hour),
+        )
+        for hour in (9, 11, 14)
+    ]
+    session.add_all(appointments)
+    session.commit()
+    return jon, arya, appointments
+
+
+def _run(session_factory, handler, cmd):
+    uow = UnitOfWork(session_factory)
+    with uow:
+        handler(uow, cmd)
+        uow.commit()
+
+
+def _report(in_memory_db):
+    with in_memory_db.connect() as connection:
+        return rollups.report(connection, DAY, DAY)
+
+
+def test_status_changes_update_the_rollup(session, session_factory, in_memory_db):
+    jon, arya, (first, second, third) = _setup(session)
+
+    for appointment in (first, second):
+        _run(
+            session_factory,
+            complete_appointment,
+            commands.CompleteAppointment(appointment.id, jon.id),
+        )
+    _run(
+        session_factory,
+        cancel_appointment,
+        commands.CancelAppointment(third.id, arya.id),
+    )
+    assert _report(in_memory_db) == [
+        rollups.DailyRevenue(jon.id, DAY, 2, 0, 10000),
+        rollups.DailyRevenue(arya.id, DAY, 0, 1, 0),
+    ]
+
+    # Completing again moves the appointment to the other employee
+    _run(
+        session_factory,
+        complete_appointment,
+        commands.CompleteAppointment(second.id, arya.id),
+    )
+    incremental = _report(in_memory_db)
+    assert incremental == [
+        rollups.DailyRevenue(jon.id, DAY, 1, 0, 5000),
+        rollups.DailyRevenue(arya.id, DAY, 1, 1, 5000),
+    ]
+    with in_memory_db.begin() as connection:
+        assert rollups.rebuild(connection) == 2
+    assert _report(in_memory_db) == incremental
+
+
+def test_failed_status_change_leaves_the_rollup(session, session_factory, in_memory_db):
+    jon, _, (appointment, _, _) = _setup(session)
+    _run(
+        session_factory,
+        complete_appointment,
+        commands.CompleteAppointment(appointment.id, jon.id),
+    )
+    uow = UnitOfWork(session_factory)
+    with uow:
+        complete_appointment(uow, commands.CompleteAppointment(appointment.id, jon.id))
+        uow.rollback()
+
+    assert _report(in_memory_db) == [rollups.DailyRevenue(jon.id, DAY, 1, 0, 5000)]
+
+
+def test_bulk_status_changes_update_the_rollup(session, session_factory, in_memory_db):
+    jon, arya, (first, second, third) = _setup(session)
+    _run(
+        session_factory,
+        complete_appointments,
+        commands.CompleteAppointments({first.id, second.id}, jon.id),
+    )
+    # The completed second appointment cannot be canceled and stays with Jon
+    _run(
+        session_factory,
+        cancel_appointments,
+        commands.CancelAppointments({second.id, third.id}, arya.id),
+    )
+    incremental = _report(in_memory_db)
+    assert incremental == [
+        rollups.DailyRevenue(jon.id, DAY, 2, 0, 10000),
+        rollups.DailyRevenue(arya.id, DAY, 0, 1, 0),
+    ]
+    with in_memory_db.begin() as connection:
+        rollups.rebuild(connection)
+    assert _report(in_memory_db) == incremental
+
+
+def test_bulk_status_change_raced_by_another_is_stale(
+    session, session_factory, in_memory_db, mocker
+):
+    jon, arya, (appointment, _, _) = _setup(session)
+    states = AppointmentRepository.states
+
+    def states_then_raced(repository, ids):
+        rows = states(repository, ids)
+        _run(
+            session_factory,
+            complete_appointment,
+            commands.CompleteAppointment(appointment.id, arya.id),
+        )
+        return rows
+
+    mocker.patch.object(AppointmentRepository, "states", states_then_raced)
+    uow = UnitOfWork(session_factory)
+    with pytest.raises(StaleAppointment), uow:
+        complete_appointments(
+            uow, commands.CompleteAppointments({appointment.id}, jon.id)
+        )
+    mocker.stopall()
+
+    assert _report(in_memory_db) == [rollups.DailyRevenue(arya.id, DAY, 1, 0, 5000)]
+
+
+def test_cli_rebuild_revenue(tmp_path, capsys):
+    database_url = f"sqlite:///{tmp_path / 'agenda.db'}"
+    metadata.create_all(create_engine(database_url))
+
+    assert main(["--database-url", database_url, "rebuild-revenue"]) == 0
+    assert "Rebuilt 0 daily revenue rows" in capsys.readouterr().err
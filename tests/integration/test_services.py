@@ -1,25 +1,36 @@
+import asyncio
+from datetime import datetime, timedelta
 from typing import Set
 
 import pytest
+from sqlalchemy import event
 
 from agenda_api import domain
+from agenda_api.adapters import bulkload
+from agenda_api.adapters.orm import appointments_table
 from agenda_api.adapters.repositories import (
     AppointmentRepository,
     ClientRepository,
     EmployeeRepository,
     ServiceRepository,
 )
-from agenda_api.services import commands
+from agenda_api.domain.errors import AppointmentConflict, StaleAppointment
+from agenda_api.services import commands, messagebus, views
+from agenda_api.services.availability import find_next_slot
 from agenda_api.services.errors import EntityNotFound
 from agenda_api.services.handlers import (
     cancel_appointment,
     complete_appointment,
+    complete_appointments,
     create_appointment,
     create_client,
+    create_clients,
     create_employee,
     create_service,
+    create_services,
 )
-from agenda_api.services.unitofwork import UnitOfWork
+from agenda_api.services.results import CommandStatus, ItemError, Rejection
+from agenda_api.services.unitofwork import AsyncUnitOfWork, UnitOfWork
 
 
 @pytest.fixture
@@ -182,3 +193,540 @@ def test_cancel_appointment(session, session_factory, appointment, employee):
     assert appointments.count() == 1
     appointment_found = appointments.first()
     assert appointment_found.status == domain.AppointmentStatus.CANCELED
+
+
+def test_concurrent_status_change_is_rejected(
+    session, session_factory, appointment, employee
+):
+    stale, other = UnitOfWork(session_factory), UnitOfWork(session_factory)
+    with stale, other:
+        # Read before the other unit of work changes the appointment
+        read = stale.appointments.get(appointment.id)
+        assert read.version == 1
+        complete_appointment(
+            other, commands.CompleteAppointment(appointment.id, employee.id)
+        )
+        other.commit()
+
+        cancel_appointment(
+            stale, commands.CancelAppointment(appointment.id, employee.id)
+        )
+        with pytest.raises(StaleAppointment):
+            stale.commit()
+
+    found = AppointmentRepository(session=session_factory()).get(appointment.id)
+    assert found.status == domain.AppointmentStatus.COMPLETED
+    assert found.version == 2
+
+
+def test_status_change_on_outdated_version_is_rejected(
+    session, session_factory, appointment, employee
+):
+    uow = UnitOfWork(session_factory)
+    with uow:
+        complete_appointment(
+            uow, commands.CompleteAppointment(appointment.id, employee.id, version=1)
+        )
+        uow.commit()
+        with pytest.raises(StaleAppointment) as error:
+            cancel_appointment(
+                uow, commands.CancelAppointment(appointment.id, employee.id, version=1)
+            )
+    assert error.value.message == (
+        f"Appointment with id {appointment.id} is at version 2, not 1"
+    )
+
+
+def test_create_appointment_scheduled(
+    session, session_factory, client, services, employee
+):
+    scheduled_at = datetime(2026, 10, 18, 10)
+    uow = UnitOfWork(session_factory=session_factory)
+    with uow:
+        cmd = commands.CreateAppointment(
+            client_id=client.id,
+            service_ids={service.id for service in services},
+            employee_id=employee.id,
+            scheduled_at=scheduled_at,
+        )
+        create_appointment(uow, cmd)
+        uow.commit()
+
+    repo = AppointmentRepository(session=session_factory())
+    appointment = repo.filter().first()
+    assert appointment.employee_id == employee.id
+    assert appointment.scheduled_at == scheduled_at
+
+
+def test_cannot_create_appointment_employee_not_found(
+    session, session_factory, client, services
+):
+    uow = UnitOfWork(session_factory=session_factory)
+    with pytest.raises(EntityNotFound) as e, uow:
+        cmd = commands.CreateAppointment(
+            client_id=client.id,
+            service_ids={service.id for service in services},
+            employee_id=99,
+        )
+        create_appointment(uow, cmd)
+
+    assert e.value.message == "Employee with id 99 not found"
+
+
+def test_find_next_slot(session, session_factory, client, services, employee):
+    uow = UnitOfWork(session_factory=session_factory)
+    with uow:
+        for hour in (9, 11):
+            cmd = commands.CreateAppointment(
+                client_id=client.id,
+                service_ids={service.id for service in services},
+                employee_id=employee.id,
+                scheduled_at=datetime(2026, 10, 18, hour),
+            )
+            create_appointment(uow, cmd)
+        uow.commit()
+
+    with uow:
+        slot = find_next_slot(
+            uow,
+            timedelta(minutes=90),
+            not_before=datetime(2026, 10, 18, 9),
+            employee_id=employee.id,
+        )
+    assert slot.employee_id == employee.id
+    assert slot.start == datetime(2026, 10, 18, 12)
+
+
+def book(uow, client, services, employee, scheduled_at):
+    cmd = commands.CreateAppointment(
+        client_id=client.id,
+        service_ids={service.id for service in services},
+        employee_id=employee.id,
+        scheduled_at=scheduled_at,
+    )
+    return create_appointment(uow, cmd)
+
+
+def test_cannot_create_overlapping_appointment(
+    session, session_factory, client, services, employee
+):
+    uow = UnitOfWork(session_factory=session_factory)
+    with uow:
+        book(uow, client, services, employee, datetime(2026, 10, 18, 10))
+        uow.commit()
+
+    with pytest.raises(AppointmentConflict), uow:
+        book(uow, client, services, employee, datetime(2026, 10, 18, 10, 30))
+
+    with uow:
+        book(uow, client, services, employee, datetime(2026, 10, 18, 11))
+        book(uow, client, services, employee, datetime(2026, 10, 18, 9))
+        uow.commit()
+
+    repo = AppointmentRepository(session=session_factory())
+    assert repo.filter().count() == 3
+
+
+def test_canceled_appointment_frees_slot(
+    session, session_factory, client, services, employee
+):
+    uow = UnitOfWork(session_factory=session_factory)
+    with uow:
+        appointment = book(uow, client, services, employee, datetime(2026, 10, 18, 10))
+        uow.commit()
+        cancel_appointment(uow, commands.CancelAppointment(appointment.id, employee.id))
+        book(uow, client, services, employee, datetime(2026, 10, 18, 10))
+        uow.commit()
+
+
+def test_overlap_rejected_by_database(
+    session, session_factory, client, services, employee
+):
+    uow = UnitOfWork(session_factory=session_factory)
+    with uow:
+        book(uow, client, services, employee, datetime(2026, 10, 18, 10))
+        uow.commit()
+
+    # Skips the handler check, as a concurrent request would
+    with pytest.raises(AppointmentConflict), uow:
+        appointment = domain.Appointment(
+            client_id=client.id,
+            services=services,
+            employee_id=employee.id,
+            scheduled_at=datetime(2026, 10, 18, 9, 30),
+        )
+        uow.appointments.save(appointment)
+        uow.commit()
+
+
+def import_booking(in_memory_db, client, employee, scheduled_at):
+    """An appointment loaded without services, which leaves it without an end"""
+    with in_memory_db.begin() as connection:
+        bulkload.load(
+            connection,
+            appointments_table,
+            [
+                {
+                    "client_id": client.id,
+                    "employee_id": employee.id,
+                    "status": "pending",
+                    "scheduled_at": scheduled_at.isoformat(),
+                }
+            ],
+        )
+
+
+def test_imported_booking_without_end_takes_no_time(
+    session, session_factory, in_memory_db, client, services, employee
+):
+    import_booking(in_memory_db, client, employee, datetime(2026, 10, 18, 9))
+    uow = UnitOfWork(session_factory=session_factory)
+    with uow:
+        book(uow, client, services, employee, datetime(2026, 10, 18, 12))
+        book(uow, client, services, employee, datetime(2026, 10, 18, 9))
+        uow.commit()
+
+    repo = AppointmentRepository(session=session_factory())
+    assert repo.filter().count() == 3
+
+
+def test_booking_without_end_does_not_hide_overlaps(
+    session, session_factory, in_memory_db, client, services, employee
+):
+    uow = UnitOfWork(session_factory=session_factory)
+    with uow:
+        book(uow, client, services, employee, datetime(2026, 10, 18, 9))
+        uow.commit()
+    import_booking(in_memory_db, client, employee, datetime(2026, 10, 18, 9, 30))
+
+    with pytest.raises(AppointmentConflict), uow:
+        book(uow, client, services, employee, datetime(2026, 10, 18, 9, 45))
+    # Skips the handler check, as a concurrent request would
+    with pytest.raises(AppointmentConflict), uow:
+        appointment = domain.Appointment(
+            client_id=client.id,
+            services=services,
+            employee_id=employee.id,
+            scheduled_at=datetime(2026, 10, 18, 9, 45),
+        )
+        uow.appointments.save(appointment)
+        uow.commit()
+
+
+def test_find_conflict_is_one_index_probe(
+    session, session_factory, in_memory_db, employee
+):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    repo = AppointmentRepository(session=session_factory())
+    event.listen(in_memory_db, "before_cursor_execute", capture)
+    try:
+        start = datetime(2026, 10, 18, 10)
+        repo.find_conflict(employee.id, start, start + timedelta(hours=1))
+    finally:
+        event.remove(in_memory_db, "before_cursor_execute", capture)
+
+    assert len(statements) == 1
+    statement, parameters = statements[0]
+    plan = repo.session.connection().exec_driver_sql(
+        f"EXPLAIN QUERY PLAN {statement}", parameters
+    )
+    steps = [step[-1] for step in plan]
+    assert steps == [
+        "SEARCH appointments USING INDEX ix_appointments_employee_schedule "
+        "(employee_id=? AND scheduled_at<?)"
+    ]
+
+
+def test_complete_appointments_in_one_update(
+    session, session_factory, in_memory_db, client, services, employee
+):
+    uow = UnitOfWork(session_factory=session_factory)
+    with uow:
+        first, canceled, last = (
+            book(uow, client, services, employee, datetime(2026, 10, 18, hour))
+            for hour in (9, 11, 13)
+        )
+        cancel_appointment(uow, commands.CancelAppointment(canceled.id, employee.id))
+        uow.commit()
+    ids = {first.id, canceled.id, last.id, 99}
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(in_memory_db, "before_cursor_execute", capture)
+    try:
+        with uow:
+            result = complete_appointments(
+                uow, commands.CompleteAppointments(ids, employee.id)
+            )
+            uow.commit()
+    finally:
+        event.remove(in_memory_db, "before_cursor_execute", capture)
+
+    assert result.changed == [first.id, last.id]
+    assert result.rejected == [
+        Rejection(canceled.id, "Cannot complete an appointment with status canceled"),
+        Rejection(99, "Appointment with id 99 not found"),
+    ]
+    updates = [sql for sql in statements if sql.startswith("UPDATE appointments")]
+    assert len(updates) == 1
+    repo = AppointmentRepository(session=session_factory())
+    for appointment_id in result.changed:
+        found = repo.get(appointment_id)
+        assert found.status == domain.AppointmentStatus.COMPLETED
+        assert found.updated_by == employee
+        assert found.version == 2
+
+
+def test_unit_of_work_opens_its_session_on_first_use(session, session_factory):
+    opened = []
+
+    def open_session():
+        opened.append(session_factory())
+        return opened[-1]
+
+    uow = UnitOfWork(open_session)
+    with uow:
+        uow.commit()
+        assert opened == []
+        assert uow.clients is uow.clients
+        assert uow.employees.session is uow.clients.session
+        assert len(opened) == 1
+    assert not uow.opened
+
+
+def test_unit_of_work_entered_again_closes_its_session(
+    session, session_factory, mocker
+):
+    uow = UnitOfWork(session_factory)
+    uow.__enter__()
+    first = uow.session
+    close = mocker.spy(first, "close")
+    with uow:
+        assert uow.session is not first
+    close.assert_called_once()
+
+
+def test_create_clients(session, session_factory):
+    uow = UnitOfWork(session_factory=session_factory)
+    with uow:
+        cmd = commands.CreateClients(
+            (
+                commands.CreateClient("Jon", "Snow"),
+                commands.CreateClient("Arya", "Stark"),
+            )
+        )
+        result = create_clients(uow, cmd)
+        uow.commit()
+
+    assert result.errors == []
+    assert [client.id for client in result.created] == [1, 2]
+    repo = ClientRepository(session=session_factory())
+    assert repo.get(2).first_name == "Arya"
+
+
+def test_create_services_reports_errors(session, session_factory):
+    uow = UnitOfWork(session_factory=session_factory)
+    with uow:
+        cmd = commands.CreateServices(
+            (
+                commands.CreateService(name="haircut", price=5000),
+                commands.CreateService(name="Beard", price=-1),
+                commands.CreateService(name="Shave", price="10"),
+            )
+        )
+        result = create_services(uow, cmd)
+        uow.commit()
+
+    assert [service.name for service in result.created] == ["haircut"]
+    assert result.errors[0] == ItemError(1, "Cannot create service with negative price")
+    assert result.errors[1].index == 2
+    repo = ServiceRepository(session=session_factory())
+    assert repo.filter().count() == 1
+
+
+def test_async_unit_of_work_runs_handlers(async_session_factory):
+    async def scenario():
+        uow = AsyncUnitOfWork(async_session_factory)
+        async with uow:
+            client = await uow.run(
+                create_client, commands.CreateClient("Samwell", "Tarly")
+            )
+            service = await uow.run(
+                create_service, commands.CreateService("haircut", 5000)
+            )
+            await uow.commit()
+        async with uow:
+            appointment = await uow.run(
+                create_appointment,
+                commands.CreateAppointment(client.id, {service.id}),
+            )
+            await uow.commit()
+        async with uow:
+            return appointment, await uow.appointments.find(client_id=client.id)
+
+    appointment, found = asyncio.run(scenario())
+    assert [apt.id for apt in found] == [appointment.id]
+    assert found[0].total_price == 5000
+    assert [service.name for service in found[0].services] == ["haircut"]
+
+
+def test_async_unit_of_work_translates_overlaps(async_session_factory):
+    async def scenario():
+        uow = AsyncUnitOfWork(async_session_factory)
+        async with uow:
+            client = await uow.run(create_client, commands.CreateClient("Jon", "Snow"))
+            employee = await uow.run(
+                create_employee, commands.CreateEmployee("Arya", "Stark")
+            )
+            service = await uow.run(
+                create_service, commands.CreateService("haircut", 5000)
+            )
+            await uow.commit()
+        for minute in (0, 15):
+            async with uow:
+                uow.appointments.save(
+                    domain.Appointment(
+                        client_id=client.id,
+                        services={service},
+                        employee_id=employee.id,
+                        scheduled_at=datetime(2026, 10, 18, 10, minute),
+                    )
+                )
+                await uow.commit()
+
+    with pytest.raises(AppointmentConflict):
+        asyncio.run(scenario())
+
+
+def test_dispatch_commits_commands_together(session, session_factory, client, services):
+    uow = UnitOfWork(session_factory=session_factory)
+    service_ids = {service.id for service in services}
+    with uow:
+        outcome = messagebus.dispatch(
+            uow,
+            [
+                commands.CreateClient("Arya", "Stark"),
+                commands.CreateAppointment(client.id, service_ids),
+                commands.CreateAppointment(client.id, service_ids),
+            ],
+        )
+
+    assert outcome.committed
+    assert [r.status for r in outcome.results] == [CommandStatus.DONE] * 3
+    repo = AppointmentRepository(session=session_factory())
+    assert repo.filter().count() == 2
+
+
+def test_atomic_dispatch_rolls_back_on_failure(session, session_factory, client):
+    uow = UnitOfWork(session_factory=session_factory)
+    with uow:
+        outcome = messagebus.dispatch(
+            uow,
+            [
+                commands.CreateClient("Arya", "Stark"),
+                commands.CreateAppointment(client.id, {999}),
+                commands.CreateClient("Bran", "Stark"),
+            ],
+        )
+
+    assert not outcome.committed
+    assert [r.status for r in outcome.results] == [
+        CommandStatus.ROLLED_BACK,
+        CommandStatus.FAILED,
+        CommandStatus.SKIPPED,
+    ]
+    assert outcome.results[1].error == "Services not found"
+    repo = ClientRepository(session=session_factory())
+    assert repo.filter().count() == 1
+
+
+def test_best_effort_dispatch_keeps_successful_commands(
+    session, session_factory, client, services
+):
+    uow = UnitOfWork(session_factory=session_factory)
+    with uow:
+        outcome = messagebus.dispatch(
+            uow,
+            [
+                commands.CreateClient("Arya", "Stark"),
+                commands.CreateService("shave", -1),
+                commands.CreateClient("Bran", "Stark"),
+            ],
+            mode=messagebus.Mode.BEST_EFFORT,
+        )
+
+    assert outcome.committed
+    assert [r.status for r in outcome.results] == [
+        CommandStatus.DONE,
+        CommandStatus.FAILED,
+        CommandStatus.DONE,
+    ]
+    repo = ClientRepository(session=session_factory())
+    assert [c.first_name for c in repo.filter()] == ["Jon", "Arya", "Bran"]
+    assert ServiceRepository(session=session_factory()).filter().count() == 1
+
+
+def test_savepoint_reports_database_conflicts(
+    session, session_factory, client, services, employee
+):
+    uow = UnitOfWork(session_factory=session_factory)
+    scheduled_at = datetime(2026, 10, 18, 10)
+    with uow:
+        book(uow, client, services, employee, scheduled_at)
+        uow.commit()
+        # Skips the handler check, as a concurrent request would
+        with pytest.raises(AppointmentConflict), uow.savepoint():
+            uow.appointments.save(
+                domain.Appointment(
+                    client_id=client.id,
+                    services=services,
+                    employee_id=employee.id,
+                    scheduled_at=scheduled_at,
+                )
+            )
+        create_client(uow, commands.CreateClient("Arya", "Stark"))
+        uow.commit()
+
+    assert AppointmentRepository(session=session_factory()).filter().count() == 1
+    assert ClientRepository(session=session_factory()).filter().count() == 2
+
+
+def test_views_page_rows_without_mapped_instances(session, session_factory, services):
+    uow = UnitOfWork(session_factory=session_factory)
+    with uow:
+        create_clients(
+            uow,
+            commands.CreateClients(
+                tuple(
+                    commands.CreateClient(name, "Stark")
+                    for name in ("Arya", "Bran", "Sansa")
+                )
+            ),
+        )
+        uow.commit()
+
+    with uow:
+        rows = views.page(uow, views.ClientView, limit=2, after=1)
+        assert not uow.session.identity_map
+        [service] = views.page(uow, views.ServiceView)
+    assert rows == [views.ClientView(2, "Bran", "Stark"), (3, "Sansa", "Stark")]
+    assert service.duration == timedelta(hours=1)
+
+
+def test_views_stream_every_row(session, session_factory):
+    uow = UnitOfWork(session_factory=session_factory)
+    with uow:
+        for index in range(5):
+            create_employee(uow, commands.CreateEmployee(f"Employee {index}", "Bench"))
+        uow.commit()
+
+    with uow:
+        rows = list(views.stream(uow, views.EmployeeView, after=1, batch_size=2))
+    assert [row.id for row in rows] == [2, 3, 4, 5]
@@ -0,0 +1,87 @@
+import pytest
+from sqlalchemy import select
+
+from agenda_api import domain
+from agenda_api.adapters import bulkload, versions
+from agenda_api.adapters.orm import employees_table, table_versions_table
+from agenda_api.services import commands
+from agenda_api.services.handlers import (
+    create_clients,
+    create_employees,
+    create_service,
+)
+from agenda_api.services.unitofwork import UnitOfWork
+
+
+def table_versions(session_factory, *tables):
+    with session_factory() as session:
+        return versions.get(session.connection(), tables)
+
+
+def test_commit_bumps_the_tables_it_changed(session, session_factory):
+    assert table_versions(session_factory, "services", "employees") == {
+        "employees": 0,
+        "services": 0,
+    }
+    uow = UnitOfWork(session_factory)
+    with uow:
+        create_service(uow, commands.CreateService("haircut", 5000))
+        uow.commit()
+        create_employees(
+            uow,
+            commands.CreateEmployees((commands.CreateEmployee("Jon", "Snow"),)),
+        )
+        uow.commit()
+        service = uow.services.filter().one()
+        service.price = 6000
+        uow.commit()
+        uow.commit()
+
+    assert table_versions(session_factory, "services", "employees") == {
+        "employees": 1,
+        "services": 2,
+    }
+
+
+def test_only_watched_tables_are_versioned(session, session_factory):
+    uow = UnitOfWork(session_factory)
+    with uow:
+        create_clients(
+            uow,
+            commands.CreateClients((commands.CreateClient("Jon", "Snow"),)),
+        )
+        uow.commit()
+    rows = session.execute(select(table_versions_table)).all()
+    assert rows == []
+    with pytest.raises(ValueError, match="clients are not versioned"):
+        table_versions(session_factory, "clients")
+
+
+def test_rollback_discards_the_changed_tables(session, session_factory):
+    uow = UnitOfWork(session_factory)
+    with uow:
+        create_service(uow, commands.CreateService("haircut", 5000))
+        uow.flush()
+        uow.rollback()
+        uow.commit()
+    assert table_versions(session_factory, "services") == {"services": 0}
+
+
+def test_savepoints_keep_the_changes_around_them(session, session_factory):
+    uow = UnitOfWork(session_factory)
+    with uow:
+        create_service(uow, commands.CreateService("haircut", 5000))
+        with pytest.raises(domain.errors.ServiceError), uow.savepoint():
+            uow.clients.save(domain.Client("Jon", "Snow"))
+            raise domain.errors.ServiceError("Rolled back")
+        uow.commit()
+    assert table_versions(session_factory, "services")["services"] == 1
+
+
+def test_bulk_load_bumps_the_table(in_memory_db, session_factory):
+    with in_memory_db.begin() as connection:
+        bulkload.load(
+            connection, employees_table, [{"first_name": "Jon", "last_name": "Snow"}]
+        )
+        bulkload.load(connection, employees_table, [])
+    assert table_versions(session_factory, "employees") == {"employees": 1}
@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+
+from agenda_api.services.availability import AvailabilityIndex, EmployeeSchedule
+
+DAY_START = datetime(2026, 10, 18, 9)
+DAY_END = datetime(2026, 10, 18, 18)
+
+
+def at(hour: int, minute: int = 0) -> datetime:
+    return DAY_START.replace(hour=hour, minute=minute)
+
+
+def test_schedule_merges_busy_intervals():
+    schedule = EmployeeSchedule(
+        DAY_START,
+        DAY_END,
+        [(at(10), at(11)), (at(10, 30), at(12)), (at(12), at(13)), (at(17), at(19))],
+    )
+    assert schedule.gaps == [(at(9), at(10)), (at(13), at(17))]
+
+
+def test_schedule_next_slot_skips_short_gaps():
+    schedule = EmployeeSchedule(
+        DAY_START, DAY_END, [(at(10), at(11)), (at(12), at(14)), (at(15), at(16))]
+    )
+    assert schedule.next_slot(timedelta(hours=1)) == at(9)
+    assert schedule.next_slot(timedelta(minutes=90)) == at(16)
+    assert schedule.next_slot(timedelta(hours=3)) is None
+
+
+def test_schedule_next_slot_not_before():
+    schedule = EmployeeSchedule(DAY_START, DAY_END, [(at(12), at(13))])
+    assert schedule.next_slot(timedelta(hours=1), not_before=at(10, 30)) == at(10, 30)
+    assert schedule.next_slot(timedelta(hours=2), not_before=at(10, 30)) == at(13)
+    assert schedule.next_slot(timedelta(hours=1), not_before=at(17, 30)) is None
+
+
+def test_schedule_fully_booked():
+    schedule = EmployeeSchedule(DAY_START, DAY_END, [(at(8), at(19))])
+    assert schedule.gaps == []
+    assert schedule.next_slot(timedelta(minutes=1)) is None
+
+
+def test_index_first_available_across_employees():
+    index = AvailabilityIndex(
+        DAY_START,
+        DAY_END,
+        employee_ids=[1, 2],
+        bookings=[(1, at(9), at(12)), (2, at(9), at(10, 30))],
+    )
+    slot = index.first_available(timedelta(minutes=90))
+    assert slot.employee_id == 2
+    assert slot.start == at(10, 30)
+    assert slot.end == at(12)
+    assert index.next_slot(1, timedelta(minutes=90)).start == at(12)
@@ -0,0 +1,47 @@
+from agenda_api.adapters.cache import CacheStats, LRUCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set(1, "haircut")
+    cache.set(2, "Beard")
+    assert cache.get(1) == "haircut"
+    cache.set(3, "Shave")
+    assert cache.get(2) is None
+    assert cache.get(1) == "haircut"
+    assert cache.get(3) == "Shave"
+    assert len(cache) == 2
+
+
+def test_lru_cache_expires_entries():
+    clock = FakeClock()
+    cache = LRUCache(ttl=10, clock=clock)
+    cache.set(1, "haircut")
+    clock.now = 9.9
+    assert cache.get(1) == "haircut"
+    clock.now = 10
+    assert cache.get(1) is None
+
+
+def test_lru_cache_delete_and_clear():
+    cache = LRUCache()
+    cache.set(1, "haircut")
+    cache.set(2, "Beard")
+    cache.delete(1)
+    cache.delete(42)
+    assert cache.get(1) is None
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_cache_stats_hit_ratio():
+    assert CacheStats().hit_ratio == 0
+    assert CacheStats(hits=3, misses=1).hit_ratio == 0.75
@@ -0,0 +1,172 @@
+import contextvars
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import Column, MetaData, String, Table, create_engine, select
+from sqlalchemy.pool import QueuePool
+
+from agenda_api.adapters.database import (
+    LazySessionFactory,
+    ReplicaSet,
+    RoutingSession,
+    async_url,
+    create_engine_from_settings,
+    start_request_routing,
+)
+from agenda_api.adapters.orm import metadata
+from agenda_api.services.unitofwork import UnitOfWork
+from agenda_api.settings import DatabaseSettings
+
+servers = Table("servers", MetaData(), Column("name", String))
+
+
+def test_session_factory_creates_engine_on_first_session(tmp_path):
+    loaded = []
+
+    def load_settings():
+        loaded.append(True)
+        return DatabaseSettings(url=f"sqlite:///{tmp_path / 'agenda.db'}")
+
+    factory = LazySessionFactory(load_settings)
+    assert factory.pool_status() == {}
+    assert loaded == []
+
+    session = factory()
+    assert session.execute("SELECT 1").scalar() == 1
+    session.close()
+    factory()
+    assert loaded == [True]
+
+    factory.dispose()
+
+
+def test_engine_pool_follows_settings():
+    settings = DatabaseSettings(
+        url="sqlite:///agenda.db",
+        pool_size=3,
+        max_overflow=0,
+        pool_recycle=60,
+    )
+    engine = create_engine_from_settings(settings)
+    assert engine.pool._recycle == 60
+    assert engine.pool._pre_ping
+
+
+def test_pool_status(tmp_path):
+    factory = LazySessionFactory(
+        lambda: DatabaseSettings(url=f"sqlite:///{tmp_path / 'agenda.db'}")
+    )
+    factory.engine.pool = QueuePool(factory.engine.pool._creator, pool_size=2)
+    session = factory()
+    session.execute("SELECT 1")
+    assert factory.pool_status()["checked_out"] == 1
+    session.close()
+    assert factory.pool_status() == {
+        "size": 2,
+        "checked_in": 1,
+        "checked_out": 0,
+        "overflow": -1,
+    }
+
+
+@pytest.mark.parametrize(
+    "url,expected",
+    [
+        (
+            "postgresql://root:root@db:5432/agenda",
+            "postgresql+asyncpg://root:root@db:5432/agenda",
+        ),
+        (
+            "postgresql+psycopg2://root:root@db/agenda",
+            "postgresql+asyncpg://root:root@db/agenda",
+        ),
+        (
+            "postgresql+asyncpg://root:root@db/agenda",
+            "postgresql+asyncpg://root:root@db/agenda",
+        ),
+        ("sqlite:///agenda.db", "sqlite+aiosqlite:///agenda.db"),
+    ],
+)
+def test_async_url_uses_asyncio_driver(url, expected):
+    assert async_url(url) == expected
+
+
+def test_async_url_rejects_unknown_backend():
+    with pytest.raises(ValueError):
+        async_url("mysql://root:root@db/agenda")
+
+
+def test_replica_set_balancing():
+    round_robin = ReplicaSet(["a", "b", "c"])
+    assert [round_robin.pick() for _ in range(4)] == [0, 1, 2, 0]
+
+    def engine(checked_out: int):
+        return SimpleNamespace(pool=SimpleNamespace(checkedout=lambda: checked_out))
+
+    least_connections = ReplicaSet(
+        [engine(3), engine(1), engine(2)], balancing="least_connections"
+    )
+    assert least_connections.pick() == 1
+    with pytest.raises(ValueError):
+        ReplicaSet([], balancing="random")
+
+
+@pytest.fixture
+def replicated_factory(tmp_path):
+    urls = {}
+    for name in ("primary", "replica-1", "replica-2"):
+        urls[name] = f"sqlite:///{tmp_path / name}.db"
+        engine = create_engine(urls[name])
+        metadata.create_all(engine)
+        servers.create(engine)
+        with engine.begin() as connection:
+            connection.execute(servers.insert(), {"name": name})
+    factory = LazySessionFactory(
+        lambda: DatabaseSettings(
+            url=urls["primary"], replica_urls=(urls["replica-1"], urls["replica-2"])
+        )
+    )
+    yield factory
+    factory.dispose()
+
+
+def _server(session) -> str:
+    return session.execute(select(servers.c.name)).scalar()
+
+
+def test_read_only_sessions_read_from_replicas(replicated_factory):
+    assert _server(replicated_factory()) == "primary"
+    read = [_server(replicated_factory.read_only()) for _ in range(3)]
+    assert read == ["replica-1", "replica-2", "replica-1"]
+
+
+def test_read_only_session_writes_to_primary(replicated_factory):
+    session = replicated_factory.read_only()
+    assert isinstance(session, RoutingSession)
+    assert _server(session) == "replica-1"
+    session.execute(servers.delete())
+    assert _server(session) is None
+    session.commit()
+    assert _server(replicated_factory()) is None
+    assert _server(replicated_factory.read_only()) == "replica-2"
+
+
+def test_request_sticks_to_primary_after_write(replicated_factory):
+    def request(write: bool):
+        start_request_routing()
+        first = _server(replicated_factory.read_only())
+        if write:
+            uow = UnitOfWork(replicated_factory)
+            with uow:
+                uow.session.execute(servers.insert().values(name="primary"))
+                uow.commit()
+        return first, _server(replicated_factory.read_only())
+
+    assert contextvars.copy_context().run(request, False) == (
+        "replica-1",
+        "replica-1",
+    )
+    assert contextvars.copy_context().run(request, True) == ("replica-2", "primary")
+    uow = UnitOfWork(replicated_factory, read_only=True)
+    with uow:
+        assert _server(uow.session) == "replica-1"
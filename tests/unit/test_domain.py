@@ -1,4 +1,4 @@
-from datetime import timedelta
+from datetime import datetime, timedelta
 
 import pytest
 
@@ -75,6 +75,7 @@ def test_complete_appointment(sample_appointment, employee):
     sample_appointment.complete(employee)
     assert sample_appointment.status == domain.AppointmentStatus.COMPLETED
     assert sample_appointment.updated_by == employee
+    assert sample_appointment.updated_at
 
 
 def test_cancel_appointment(sample_appointment, employee):
@@ -122,3 +123,17 @@ def test_cannot_cancel_appointment_completed(sample_appointment, employee):
         e.value.message
         == f"Cannot cancel an appointment with status {sample_appointment.status.value}"
     )
+
+
+def test_appointment_totals_follow_services(sample_appointment):
+    beard = domain.Service("Beard", 2500, duration=timedelta(minutes=30))
+    beard.id = 2
+    sample_appointment.scheduled_at = datetime(2026, 10, 18, 9)
+    sample_appointment.add_service(beard)
+    assert sample_appointment.total_price == 7500
+    assert sample_appointment.total_duration == timedelta(hours=1, minutes=30)
+    assert sample_appointment.ends_at == datetime(2026, 10, 18, 10, 30)
+
+    sample_appointment.remove_service(beard)
+    assert sample_appointment.total_price == 5000
+    assert sample_appointment.ends_at == datetime(2026, 10, 18, 10)
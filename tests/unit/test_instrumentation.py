@@ -0,0 +1,63 @@
+from sqlalchemy import create_engine, text
+
+from agenda_api import instrumentation
+from agenda_api.adapters.database import InstrumentedQueuePool
+from agenda_api.instrumentation import MetricsRegistry
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("queries", "Statements per request", (1, 5))
+    histogram.observe(1, route="/api/clients")
+    histogram.observe(3, route="/api/clients")
+    histogram.observe(8, route="/api/clients")
+
+    assert registry.render().splitlines() == [
+        "# HELP queries Statements per request",
+        "# TYPE queries histogram",
+        'queries_bucket{route="/api/clients",le="1"} 1',
+        'queries_bucket{route="/api/clients",le="5"} 2',
+        'queries_bucket{route="/api/clients",le="+Inf"} 3',
+        'queries_sum{route="/api/clients"} 12',
+        'queries_count{route="/api/clients"} 3',
+    ]
+
+
+def test_gauge_collects_on_render():
+    registry = MetricsRegistry()
+    registry.gauge("pool", "Connections", lambda: {(("state", "idle"),): 2})
+    assert 'pool{state="idle"} 2' in registry.render()
+
+
+def test_label_values_are_escaped():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("latency", "Latency", (1,))
+    histogram.observe(0.5, route='/a"b\\')
+    assert 'latency_count{route="/a\\"b\\\\"} 1' in registry.render()
+
+
+def test_recording_counts_statements(in_memory_db):
+    instrumentation.install_query_hooks()
+    with in_memory_db.connect() as connection:
+        connection.execute(text("SELECT 1"))
+        with instrumentation.recording() as stats:
+            connection.execute(text("SELECT 1"))
+            connection.execute(text("SELECT 2"))
+        connection.execute(text("SELECT 3"))
+
+    assert stats.count == 2
+    assert stats.seconds > 0
+
+
+def test_instrumented_pool_records_checkout_wait(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'agenda.db'}", poolclass=InstrumentedQueuePool
+    )
+    before = instrumentation.POOL_CHECKOUT_SECONDS.snapshot() or {"count": 0}
+    with instrumentation.recording() as stats, engine.connect():
+        pass
+
+    assert instrumentation.POOL_CHECKOUT_SECONDS.snapshot()["count"] == (
+        before["count"] + 1
+    )
+    assert stats.pool_wait_seconds > 0
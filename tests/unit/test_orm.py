@@ -1,3 +1,5 @@
+from datetime import timedelta
+
 from sqlalchemy.orm import session
 
 from agenda_api import domain
@@ -49,3 +51,42 @@ def test_can_create_appointment(session):
     assert appointment.client_id == 1
     assert not appointment.updated_at
     assert not appointment.updated_by
+
+
+def test_appointment_totals_are_stored(session):
+    haircut = domain.Service("haircut", 5000)
+    beard = domain.Service("Beard", 2500, duration=timedelta(minutes=30))
+    appointment = domain.Appointment(client_id=1, services={haircut})
+    session.add_all([appointment, beard])
+    session.commit()
+
+    appointment.services.add(beard)
+    session.commit()
+
+    row = session.execute(
+        "SELECT total_price, total_duration FROM appointments"
+    ).fetchone()
+    assert row.total_price == 7500
+    expensive = session.query(domain.Appointment).filter(
+        domain.Appointment.total_price > 7000
+    )
+    assert expensive.one().total_duration == timedelta(hours=1, minutes=30)
+
+
+def test_appointments_inserted_without_version_start_at_one(session):
+    # As COPY and raw SQL loads do, leaving the version to the database
+    session.execute(
+        "INSERT INTO clients (id, first_name, last_name) VALUES (1, 'Jon', 'Snow')"
+    )
+    session.execute(
+        "INSERT INTO appointments (id, client_id, status) VALUES (1, 1, 'PENDING')"
+    )
+    session.execute(
+        "INSERT INTO appointments_archive (id, scheduled_at, client_id, status, "
+        "services) VALUES (2, '2024-01-01 09:00:00', 1, 'COMPLETED', '[]')"
+    )
+    versions = session.execute(
+        "SELECT version FROM appointments UNION ALL "
+        "SELECT version FROM appointments_archive"
+    ).scalars()
+    assert list(versions) == [1, 1]
@@ -0,0 +1,71 @@
+import logging
+
+import pytest
+
+from agenda_api import domain
+from agenda_api.querybudget import QueryBudget, QueryBudgetExceeded
+from agenda_api.services.unitofwork import UnitOfWork
+
+
+@pytest.fixture
+def appointments(session):
+    services = [domain.Service(f"service {index}", 1000) for index in range(5)]
+    client = domain.Client("Jon", "Snow")
+    session.add(client)
+    session.flush()
+    for service in services:
+        session.add(domain.Appointment(client_id=client.id, services={service}))
+    session.commit()
+
+
+def test_budget_counts_queries(session, session_factory, appointments):
+    uow = UnitOfWork(session_factory)
+    with QueryBudget(1) as stats, uow:
+        uow.clients.filter().all()
+    assert stats.count == 1
+
+    with pytest.raises(QueryBudgetExceeded, match="issued 2 queries, its budget is 1"):
+        with QueryBudget(1), uow:
+            uow.clients.filter().all()
+            uow.services.filter().all()
+
+
+def test_budget_flags_lazy_loads_in_a_loop(session, session_factory, appointments):
+    uow = UnitOfWork(session_factory)
+    with pytest.raises(QueryBudgetExceeded, match="repeated 5 times") as error:
+        with QueryBudget(name="appointment services"), uow:
+            for appointment in uow.appointments.filter():
+                appointment.services
+
+    assert str(error.value).startswith("appointment services: ")
+
+
+def test_budget_allows_eager_loading(session, session_factory, appointments):
+    uow = UnitOfWork(session_factory)
+    with QueryBudget(3), uow:
+        for appointment in uow.appointments.find():
+            appointment.services
+
+
+def test_budget_decorates_functions(session, session_factory, appointments):
+    uow = UnitOfWork(session_factory)
+
+    @QueryBudget(0)
+    def list_clients():
+        with uow:
+            return uow.clients.filter().all()
+
+    with pytest.raises(QueryBudgetExceeded, match="list_clients"):
+        list_clients()
+
+
+def test_budget_logs_when_not_strict(
+    session, session_factory, appointments, monkeypatch, caplog
+):
+    monkeypatch.setenv("QUERY_BUDGET_STRICT", "false")
+    uow = UnitOfWork(session_factory)
+    with caplog.at_level(logging.WARNING), QueryBudget(0), uow:
+        uow.clients.filter().all()
+
+    assert "issued 1 queries, its budget is 0" in caplog.text
+    assert "FROM clients" in caplog.text
@@ -1,3 +1,5 @@
+import pytest
+
 from agenda_api import domain
 from agenda_api.adapters.repositories import (
     AppointmentRepository,
@@ -58,3 +60,77 @@ def test_repo_create_appointment(session, session_factory):
     repo = AppointmentRepository(session=session_factory())
     appointments = repo.filter()
     assert appointments.count() == 1
+
+
+def test_repo_filter_keyset_pagination(session, session_factory):
+    repo = ClientRepository(session=session_factory())
+    for first_name in ("Samwell", "Jorah", "Arya"):
+        repo.save(domain.Client(first_name, "Stark"))
+    repo.commit()
+
+    repo = ClientRepository(session=session_factory())
+    first_page = repo.filter(limit=2).all()
+    assert [client.first_name for client in first_page] == ["Samwell", "Jorah"]
+
+    next_page = repo.filter(limit=2, after=first_page[-1].id).all()
+    assert [client.first_name for client in next_page] == ["Arya"]
+
+
+def test_repo_filter_services_keyset_pagination(session, session_factory):
+    repo = ServiceRepository(session=session_factory())
+    repo.save(domain.Service("haircut", 5000))
+    repo.save(domain.Service("Beard", 2500))
+    repo.commit()
+
+    repo = ServiceRepository(session=session_factory())
+    first, second = repo.filter().order_by(domain.Service.id).all()
+    services = repo.filter(ids={first.id, second.id}, after=first.id).all()
+    assert services == [second]
+
+
+@pytest.fixture
+def clients(session, session_factory):
+    repo = ClientRepository(session=session_factory())
+    for first_name, last_name in (
+        ("Jon", "Snow"),
+        ("Jonathan", "Stark"),
+        ("Arya", "Stark"),
+        ("Mary Ann", "Smith"),
+        ("Alys", "Jonas"),
+    ):
+        repo.save(domain.Client(first_name, last_name))
+    repo.commit()
+
+
+def test_repo_search_clients_by_prefix(session_factory, clients):
+    repo = ClientRepository(session=session_factory())
+
+    def names(term, **kwargs):
+        return [client.name for client in repo.search(term, **kwargs)]
+
+    assert names("JO") == ["Jon Snow", "Alys Jonas", "Jonathan Stark"]
+    assert names("st") == ["Jonathan Stark", "Arya Stark"]
+    assert names(" jon  s") == ["Jon Snow"]
+    assert names("mary ann sm") == ["Mary Ann Smith"]
+    assert names("jo", limit=1) == ["Jon Snow"]
+    assert names("now") == []
+    assert names(" ") == []
+
+
+def test_repo_search_clients_fuzzy(session_factory, clients):
+    repo = ClientRepository(session=session_factory())
+    found = repo.search("tar", fuzzy=True)
+    assert [client.name for client in found] == ["Jonathan Stark", "Arya Stark"]
+    # Too short for trigrams, searched by prefix
+    assert [client.name for client in repo.search("ar", fuzzy=True)] == ["Arya Stark"]
+
+
+def test_repo_search_follows_renamed_clients(session_factory, clients):
+    repo = ClientRepository(session=session_factory())
+    client = repo.search("arya")[0]
+    client.first_name = "Nymeria"
+    repo.commit()
+    assert repo.search("arya", fuzzy=True) == []
+    assert [client.name for client in repo.search("nymer", fuzzy=True)] == [
+        "Nymeria Stark"
+    ]
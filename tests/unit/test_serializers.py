@@ -0,0 +1,87 @@
+import json
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Optional
+
+import pytest
+
+from agenda_api import domain, serializers
+from agenda_api.services import views
+
+
+def test_serializer_of_service():
+    service = domain.Service("haircut", 5000, timedelta(minutes=30))
+    service.id = 1
+    assert serializers.serialize_service(service) == {
+        "id": 1,
+        "name": "haircut",
+        "price": 5000,
+        "duration": "0:30:00",
+    }
+
+
+def test_serializer_of_appointment_nests_services_and_employee():
+    beard, haircut = domain.Service("beard", 2000), domain.Service("haircut", 5000)
+    beard.id, haircut.id = 2, 1
+    employee = domain.Employee("Jon", "Snow")
+    employee.id = 3
+    appointment = domain.Appointment(
+        client_id=4,
+        services={beard, haircut},
+        employee_id=3,
+        scheduled_at=datetime(2026, 1, 5, 9),
+    )
+    appointment.id = 5
+    appointment.complete(employee)
+    appointment.updated_at = datetime(2026, 1, 5, 11, 30)
+
+    assert serializers.serialize_appointment(appointment) == {
+        "id": 5,
+        "client_id": 4,
+        "status": "completed",
+        "employee_id": 3,
+        "scheduled_at": "2026-01-05T09:00:00",
+        "ends_at": "2026-01-05T11:00:00",
+        "updated_at": "2026-01-05T11:30:00",
+        "updated_by": {"id": 3, "first_name": "Jon", "last_name": "Snow"},
+        "services": [
+            {"id": 1, "name": "haircut", "price": 5000, "duration": "1:00:00"},
+            {"id": 2, "name": "beard", "price": 2000, "duration": "1:00:00"},
+        ],
+        "total_price": 7000,
+        "total_duration": "2:00:00",
+        "version": 0,
+    }
+
+
+def test_serializer_of_read_model():
+    row = views.ServiceView(1, "haircut", 5000, timedelta(minutes=30))
+    assert serializers.serialize_service_view(row) == {
+        "id": 1,
+        "name": "haircut",
+        "price": 5000,
+        "duration": "0:30:00",
+    }
+
+
+def test_registry_compiles_once():
+    @dataclass
+    class Reminder:
+        sent_at: Optional[datetime] = None
+        delay: timedelta = field(default=timedelta(hours=1))
+
+    registry = serializers.SerializerRegistry()
+    serialize = registry.register(Reminder)
+    assert registry.register(Reminder) is serialize
+    assert Reminder in registry
+    assert registry.serialize(Reminder()) == {"sent_at": None, "delay": "1:00:00"}
+
+    with pytest.raises(TypeError):
+        registry.register(dict)
+
+
+def test_dumps_is_compact_json():
+    body = serializers.dumps([{"id": 1, "name": "haircut"}])
+    assert isinstance(body, bytes)
+    assert json.loads(body) == [{"id": 1, "name": "haircut"}]
+    assert b" " not in body.replace(b"haircut", b"")
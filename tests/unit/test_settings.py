@@ -0,0 +1,63 @@
+from agenda_api.settings import (
+    CacheSettings,
+    DatabaseSettings,
+    ResponseCacheSettings,
+    get_database_uri,
+)
+
+
+def test_database_uri_from_postgres_settings():
+    environ = {"POSTGRES_HOST": "db", "POSTGRES_PORT": "6432", "POSTGRES_DB": "test"}
+    assert get_database_uri(environ) == "postgresql://root:root@db:6432/test"
+
+
+def test_database_url_overrides_postgres_settings():
+    environ = {"DATABASE_URL": "sqlite://", "POSTGRES_HOST": "db"}
+    assert get_database_uri(environ) == "sqlite://"
+
+
+def test_database_settings_from_env():
+    settings = DatabaseSettings.from_env(
+        {
+            "DB_POOL_SIZE": "20",
+            "DB_MAX_OVERFLOW": "0",
+            "DB_POOL_RECYCLE": "-1",
+            "DB_POOL_PRE_PING": "false",
+            "DB_STATEMENT_TIMEOUT": "5000",
+        }
+    )
+    assert settings.pool_size == 20
+    assert settings.max_overflow == 0
+    assert settings.pool_recycle == -1
+    assert settings.pool_pre_ping is False
+    assert settings.statement_timeout == 5000
+    assert settings.pool_timeout == 30
+
+
+def test_database_replica_settings_from_env():
+    assert DatabaseSettings.from_env({}).replica_urls == ()
+    settings = DatabaseSettings.from_env(
+        {
+            "DATABASE_REPLICA_URLS": "postgresql://db-1/agenda, postgresql://db-2/agenda",
+            "DB_REPLICA_BALANCING": "least_connections",
+        }
+    )
+    assert settings.replica_urls == (
+        "postgresql://db-1/agenda",
+        "postgresql://db-2/agenda",
+    )
+    assert settings.replica_balancing == "least_connections"
+
+
+def test_cache_settings_from_env():
+    assert not CacheSettings.from_env({}).enabled
+    settings = CacheSettings.from_env({"CACHE_TTL": "60", "CACHE_MAXSIZE": "10"})
+    assert settings.enabled
+    assert settings.maxsize == 10
+
+
+def test_response_cache_settings_from_env():
+    assert ResponseCacheSettings.from_env({}).enabled
+    assert not ResponseCacheSettings.from_env({"RESPONSE_CACHE_TTL": "0"}).enabled
+    settings = ResponseCacheSettings.from_env({"RESPONSE_CACHE_MAXSIZE": "10"})
+    assert settings.maxsize == 10